@@ -22,7 +22,7 @@ from sqlmodel import SQLModel  # noqa
 from app.core.config import settings # noqa
 
 # Import all models from each module
-from app.modules.care_facilities.models import CareFacility, CareFacilityContactRequest  # noqa
+from app.modules.care_facilities.models import CareFacility, CareFacilityContactRequest, ZipCodeCentroid  # noqa
 target_metadata = SQLModel.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -35,6 +35,14 @@ def get_url():
     return str(settings.SQLALCHEMY_DATABASE_URI)
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Skip indexes created on another dialect only, see Index.ddl_if()
+    ddl_if = getattr(object, "_ddl_if", None)
+    if not reflected and ddl_if is not None and ddl_if.dialect is not None:
+        return ddl_if.dialect == context.get_context().dialect.name
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -49,7 +57,8 @@ def run_migrations_offline():
     """
     url = get_url()
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True, compare_type=True, render_as_batch=True
+        url=url, target_metadata=target_metadata, literal_binds=True, compare_type=True, render_as_batch=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -73,7 +82,8 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata, compare_type=True, render_as_batch=True
+            connection=connection, target_metadata=target_metadata, compare_type=True, render_as_batch=True,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,33 @@
+"""care facility service area index
+
+Revision ID: 3b9d6e2a41c7
+Revises: 527d39e218d1
+Create Date: 2026-10-18 10:15:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9d6e2a41c7'
+down_revision = '527d39e218d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Compound index for service area searches, for queries like:
+    # SELECT * FROM carefacility
+    # WHERE from_zip_code <= 12345
+    # AND to_zip_code >= 12345
+    op.create_index(
+        'ix_care_facility_from_zip_code_to_zip_code',
+        'carefacility',
+        ['from_zip_code', 'to_zip_code']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_care_facility_from_zip_code_to_zip_code', table_name='carefacility')
@@ -0,0 +1,36 @@
+"""care facility updated at
+
+Revision ID: 9a4c1e7d2f60
+Revises: 3b9d6e2a41c7
+Create Date: 2026-10-18 13:40:27.815532
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c1e7d2f60'
+down_revision = '3b9d6e2a41c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('carefacility', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Existing facilities count as modified now, so clients revalidate them once.
+    # Bound rather than CURRENT_TIMESTAMP, which is the server's local time on
+    # Postgres, while updated_at is naive UTC
+    carefacility = sa.table('carefacility', sa.column('updated_at', sa.DateTime()))
+    op.execute(
+        carefacility.update().values(
+            updated_at=datetime.now(timezone.utc).replace(tzinfo=None)
+        )
+    )
+
+
+def downgrade():
+    op.drop_column('carefacility', 'updated_at')
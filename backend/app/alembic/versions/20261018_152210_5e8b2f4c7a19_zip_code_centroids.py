@@ -0,0 +1,43 @@
+"""zip code centroids and care facility coordinates
+
+Revision ID: 5e8b2f4c7a19
+Revises: 9a4c1e7d2f60
+Create Date: 2026-10-18 15:22:10.631904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b2f4c7a19'
+down_revision = '9a4c1e7d2f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Loaded with python -m app.modules.care_facilities.zip_code_centroids
+    op.create_table(
+        'zipcodecentroid',
+        sa.Column('zip_code', sa.Integer(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('zip_code')
+    )
+    op.add_column('carefacility', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('carefacility', sa.Column('longitude', sa.Float(), nullable=True))
+    # Bounding box of geographic searches
+    op.create_index(
+        'ix_care_facility_latitude_longitude',
+        'carefacility',
+        ['latitude', 'longitude']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_care_facility_latitude_longitude', table_name='carefacility')
+    op.drop_column('carefacility', 'longitude')
+    op.drop_column('carefacility', 'latitude')
+    op.drop_table('zipcodecentroid')
@@ -0,0 +1,60 @@
+"""care facility partial indexes
+
+Revision ID: c41f8a2d6e35
+Revises: 5e8b2f4c7a19
+Create Date: 2026-10-18 17:14:03.518264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f8a2d6e35'
+down_revision = '5e8b2f4c7a19'
+branch_labels = None
+depends_on = None
+
+CARE_TYPES = ['stationary_care', 'day_care', 'ambulatory_care']
+
+
+def upgrade():
+    # Partial indexes replace the (has_X_care, zip_code) ones, for queries like:
+    # SELECT id, name, address, zip_code, available_capacity, slug
+    # FROM carefacility
+    # WHERE has_day_care = true
+    # AND zip_code BETWEEN 12245 AND 12445
+    # Every column read is in the index, so the search is an index-only scan
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for care_type in CARE_TYPES:
+        column = f'has_{care_type}'
+        op.drop_index(f'ix_care_facility_{column}_zip_code', table_name='carefacility')
+        if postgresql:
+            op.create_index(
+                f'ix_care_facility_{care_type}_zip_code',
+                'carefacility',
+                ['zip_code'],
+                postgresql_include=['available_capacity', 'id', 'name', 'address', 'slug'],
+                postgresql_where=sa.text(column),
+            )
+        else:
+            # No INCLUDE on SQLite, which only covers when the WHERE column
+            # is indexed too
+            op.create_index(
+                f'ix_care_facility_{care_type}_zip_code',
+                'carefacility',
+                ['zip_code', 'available_capacity', 'id', 'name', 'address', 'slug', column],
+                sqlite_where=sa.text(f'{column} = 1'),
+            )
+
+
+def downgrade():
+    for care_type in CARE_TYPES:
+        column = f'has_{care_type}'
+        op.drop_index(f'ix_care_facility_{care_type}_zip_code', table_name='carefacility')
+        op.create_index(
+            f'ix_care_facility_{column}_zip_code',
+            'carefacility',
+            [column, 'zip_code']
+        )
@@ -0,0 +1,32 @@
+"""care facility updated at index
+
+Revision ID: 7d2e5b9c1a48
+Revises: c41f8a2d6e35
+Create Date: 2026-10-18 19:05:12.264871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e5b9c1a48'
+down_revision = 'c41f8a2d6e35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # For the polls of every worker process, for queries like:
+    # SELECT * FROM carefacility
+    # WHERE updated_at >= '2026-10-18 19:05:12'
+    op.create_index(
+        'ix_care_facility_updated_at',
+        'carefacility',
+        ['updated_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_care_facility_updated_at', table_name='carefacility')
@@ -1,14 +1,192 @@
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple, Protocol
+
 from posthog import Posthog
 
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AnalyticsEvent(NamedTuple):
+    uid: str
+    event_name: str
+    properties: dict
+    timestamp: datetime
+
+
+class AnalyticsSink(Protocol):
+    """Where flushed analytics events are delivered"""
+
+    def send(self, events: list[AnalyticsEvent]) -> None: ...
+
+    def close(self) -> None: ...
 
-class PosthogAnalytics:
+
+class PosthogSink:
     def __init__(self, posthog: Posthog):
         self.posthog = posthog
 
-    def track_event(self, uid: str | None, event_name: str, properties: dict = None):
-        if not self.posthog:
+    def send(self, events: list[AnalyticsEvent]) -> None:
+        # The client batches the actual HTTP requests on its own thread
+        for event in events:
+            self.posthog.capture(
+                event.uid,
+                event.event_name,
+                event.properties,
+                timestamp=event.timestamp,
+            )
+
+    def close(self) -> None:
+        self.posthog.shutdown()
+
+
+class JsonlSink:
+    """Appends events to a local JSON lines file, e.g. for development and tests"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def send(self, events: list[AnalyticsEvent]) -> None:
+        with self.path.open("a", encoding="utf-8") as file:
+            for event in events:
+                record = {
+                    "uid": event.uid,
+                    "event": event.event_name,
+                    "properties": event.properties,
+                    "timestamp": event.timestamp.isoformat(),
+                }
+                file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self) -> None:
+        pass
+
+
+# (window start, uid, event name, sorted property items)
+_AggregateKey = tuple[int, str, str, tuple]
+
+
+class Analytics:
+    """
+    Buffers tracked events in a bounded in-memory queue and hands them to the
+    sink in batches, so tracking never blocks a request.
+
+    When the queue is full the oldest events are dropped. One instance is
+    created per application by the lifespan in `app.main`, which runs
+    `flush_periodically` and calls `shutdown` on exit.
+
+    With `aggregation_window_seconds` set, events tracked with `aggregate=True`
+    are rolled up instead: identical events within a window are sent once,
+    timestamped at the window start, with a `count` property.
+    """
+
+    def __init__(
+        self,
+        sink: AnalyticsSink | None,
+        max_queue_size: int = 10_000,
+        batch_size: int = 100,
+        aggregation_window_seconds: int | None = None,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.aggregation_window_seconds = aggregation_window_seconds
+        self.dropped = 0
+        self._queue: deque[AnalyticsEvent] = deque(maxlen=max_queue_size)
+        self._aggregates: Counter[_AggregateKey] = Counter()
+        self._aggregates_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._batch_ready = asyncio.Event()
+
+    def track_event(
+        self,
+        uid: str | None,
+        event_name: str,
+        properties: dict = None,
+        aggregate: bool = False,
+    ):
+        if not self.sink:
             return
+        properties = dict(properties or {})
         if not uid:
             properties["$process_person_profile"] = False
             uid = "anonymous"
-        self.posthog.capture(uid, event_name, properties)
+        if aggregate and self.aggregation_window_seconds:
+            with contextlib.suppress(TypeError):  # Unhashable properties
+                self._aggregate(uid, event_name, properties)
+                return
+        self._enqueue(
+            AnalyticsEvent(uid, event_name, properties, datetime.now(timezone.utc))
+        )
+        if len(self._queue) >= self.batch_size:
+            self._batch_ready.set()
+
+    def _aggregate(self, uid: str, event_name: str, properties: dict) -> None:
+        window = self.aggregation_window_seconds
+        window_start = int(time.time()) // window * window
+        key = (window_start, uid, event_name, tuple(sorted(properties.items())))
+        with self._aggregates_lock:
+            self._aggregates[key] += 1
+
+    def _enqueue(self, event: AnalyticsEvent) -> None:
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(event)
+
+    def _enqueue_aggregates(self, include_open_windows: bool) -> None:
+        closed_before = time.time() - self.aggregation_window_seconds
+        with self._aggregates_lock:
+            keys = [
+                key
+                for key in self._aggregates
+                if include_open_windows or key[0] <= closed_before
+            ]
+            counts = [(key, self._aggregates.pop(key)) for key in keys]
+        for (window_start, uid, event_name, items), count in sorted(
+            counts, key=lambda item: item[0][0]
+        ):
+            properties = {**dict(items), "count": count}
+            timestamp = datetime.fromtimestamp(window_start, timezone.utc)
+            self._enqueue(AnalyticsEvent(uid, event_name, properties, timestamp))
+
+    def flush(self, include_open_windows: bool = False) -> int:
+        """Sends every queued event (and closed aggregate) to the sink, returns how many"""
+        if not self.sink:
+            return 0
+        flushed = 0
+        with self._flush_lock:
+            if self.aggregation_window_seconds:
+                self._enqueue_aggregates(include_open_windows)
+            while self._queue:
+                batch = [
+                    self._queue.popleft()
+                    for _ in range(min(self.batch_size, len(self._queue)))
+                ]
+                self.sink.send(batch)
+                flushed += len(batch)
+        return flushed
+
+    async def flush_periodically(self, interval_seconds: float) -> None:
+        """Flushes every `interval_seconds`, or sooner once a batch is queued"""
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._batch_ready.wait(), interval_seconds)
+            self._batch_ready.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Error flushing analytics events: {e}", exc_info=True)
+
+    def shutdown(self) -> None:
+        """Flushes everything, including open aggregate windows, and closes the sink"""
+        self.flush(include_open_windows=True)
+        if self.sink:
+            self.sink.close()
+        if self.dropped:
+            logger.warning(f"Dropped {self.dropped} analytics events, queue was full")
@@ -1,10 +1,13 @@
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
 from datetime import datetime, timezone
-from typing import Generic, TypeVar
+from typing import Any, ClassVar, Generic, TypeVar
 from uuid import UUID
 
 from pydantic import BaseModel
+from sqlalchemy import ColumnElement
 from sqlalchemy.orm import Session
-from sqlmodel import SQLModel, select
+from sqlmodel import SQLModel, delete, insert, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 TModel = TypeVar("TModel", bound=SQLModel)
 TCreateSchema = TypeVar("TCreateSchema", bound=BaseModel)
@@ -12,8 +15,58 @@ TUpdateSchema = TypeVar("TUpdateSchema", bound=BaseModel)
 TOutputSchema = TypeVar("TOutputSchema", bound=BaseModel)
 TID = TypeVar("TID", int, str, UUID)  # Support different ID types
 
+# Ids per statement of the bulk operations, to stay below SQLite's variable limit
+BULK_BATCH_SIZE = 1_000
+
+
+def _batches(
+    items: Sequence[Any], size: int = BULK_BATCH_SIZE
+) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _page_statement(
+    model: type[TModel],
+    filters: Iterable[ColumnElement[bool]],
+    after: Any | None,
+    limit: int | None,
+):
+    """Keyset pagination on the primary key: WHERE id > :after ORDER BY id"""
+    statement = select(model).where(*filters).order_by(model.id).limit(limit)
+    if after is not None:
+        statement = statement.where(model.id > after)
+    return statement
+
+
+def _update_many_statements(
+    model: type[TModel], changes: dict[Any, dict[str, Any]], returning: bool
+):
+    """One UPDATE ... WHERE id IN (...) per distinct set of values and id batch"""
+    ids_by_values: dict[tuple, list] = {}
+    for id, values in changes.items():
+        ids_by_values.setdefault(tuple(sorted(values.items())), []).append(id)
+    updated_at = datetime.now(timezone.utc)
+    for values, ids in ids_by_values.items():
+        values = dict(values)
+        if "updated_at" in model.model_fields:
+            values["updated_at"] = updated_at
+        for batch in _batches(ids):
+            statement = update(model).where(model.id.in_(batch)).values(**values)
+            yield statement.returning(model) if returning else statement
+
+
+def _delete_many_statements(model: type[TModel], ids: Sequence[Any], returning: bool):
+    for batch in _batches(ids):
+        statement = delete(model).where(model.id.in_(batch))
+        yield statement.returning(model) if returning else statement
+
 
 class BaseRepository(Generic[TModel, TCreateSchema, TUpdateSchema, TOutputSchema]):
+    # Set on repositories that override the _after_commit hooks, so that bulk
+    # updates and deletes fetch the affected rows (RETURNING) to pass to them
+    after_commit_needs_rows: ClassVar[bool] = False
+
     def __init__(self, model: type[TModel], db: Session):
         self.model = model
         self.db = db
@@ -22,6 +75,26 @@ class BaseRepository(Generic[TModel, TCreateSchema, TUpdateSchema, TOutputSchema
         statement = select(self.model)
         return self.db.exec(statement).all()
 
+    def get_page(
+        self,
+        after: TID | None = None,
+        limit: int = 100,
+        filters: Iterable[ColumnElement[bool]] = (),
+    ) -> list[TModel]:
+        """
+        Up to `limit` rows ordered by id, starting after the id `after`. Pass
+        the last id of a page to get the next one; unlike OFFSET, every page
+        costs the same.
+        """
+        return self.db.exec(_page_statement(self.model, filters, after, limit)).all()
+
+    def stream(
+        self, filters: Iterable[ColumnElement[bool]] = (), batch_size: int = 1_000
+    ) -> Iterator[TModel]:
+        """Every matching row ordered by id, fetched `batch_size` rows at a time"""
+        statement = _page_statement(self.model, filters, None, None)
+        yield from self.db.exec(statement.execution_options(yield_per=batch_size))
+
     def get_by_id(self, id: TID) -> TModel:
         """Gets a model instance by its ID"""
         statement = select(self.model).where(self.model.id == id)
@@ -36,6 +109,7 @@ class BaseRepository(Generic[TModel, TCreateSchema, TUpdateSchema, TOutputSchema
         self.db.add(db_data)
         self.db.commit()
         self.db.refresh(db_data)
+        self._after_commit(db_data)
         return db_data
 
     def update(self, id: TID, data: TUpdateSchema) -> TModel:
@@ -43,6 +117,7 @@ class BaseRepository(Generic[TModel, TCreateSchema, TUpdateSchema, TOutputSchema
         db_data = self.get_by_id(id)  # Now using the get_by_id method
 
         update_dict = data.model_dump(exclude_unset=True)
+        columns = frozenset(update_dict)
 
         # Update updated_at if the model has this field
         if hasattr(db_data, "updated_at"):
@@ -54,6 +129,7 @@ class BaseRepository(Generic[TModel, TCreateSchema, TUpdateSchema, TOutputSchema
         self.db.add(db_data)
         self.db.commit()
         self.db.refresh(db_data)
+        self._after_commit(db_data, columns=columns)
         return db_data
 
     def delete(self, id: TID) -> None:
@@ -61,3 +137,236 @@ class BaseRepository(Generic[TModel, TCreateSchema, TUpdateSchema, TOutputSchema
         db_data = self.get_by_id(id)
         self.db.delete(db_data)
         self.db.commit()
+        self._after_commit(db_data, deleted=True)
+
+    def create_many(self, data: Sequence[TCreateSchema]) -> list[TModel]:
+        """Inserts every row with multi-row INSERTs and a single commit"""
+        db_data = [self.model(**item.model_dump()) for item in data]
+        if db_data:
+            self.db.exec(insert(self.model), params=[d.model_dump() for d in db_data])
+            self.db.commit()
+            self._after_commit_many(db_data)
+        return db_data
+
+    def update_many(
+        self, changes: dict[TID, dict[str, Any]], returning: bool = False
+    ) -> list[TModel] | int:
+        """
+        Applies a partial update per id with a single commit. Ids sharing the
+        same values are updated together, by one UPDATE ... WHERE id IN (...).
+
+        Returns the updated models with `returning`, otherwise how many rows
+        were updated.
+        """
+        fetch_rows = returning or self.after_commit_needs_rows
+        db_data, updated = [], 0
+        for statement in _update_many_statements(self.model, changes, fetch_rows):
+            result = self.db.exec(statement)
+            if fetch_rows:
+                db_data.extend(result.scalars().all())
+            else:
+                updated += result.rowcount
+        # Detached, so committing doesn't expire what was just returned
+        for item in db_data:
+            self.db.expunge(item)
+        self.db.commit()
+        if fetch_rows:
+            columns = frozenset().union(*changes.values())
+            self._after_commit_many(db_data, columns=columns)
+        return db_data if returning else (len(db_data) if fetch_rows else updated)
+
+    def delete_many(
+        self, ids: Sequence[TID], returning: bool = False
+    ) -> list[TModel] | int:
+        """
+        Deletes every id with a single commit. Returns the deleted models with
+        `returning`, otherwise how many rows were deleted.
+        """
+        fetch_rows = returning or self.after_commit_needs_rows
+        db_data, deleted = [], 0
+        for statement in _delete_many_statements(self.model, ids, fetch_rows):
+            result = self.db.exec(statement)
+            if fetch_rows:
+                db_data.extend(result.scalars().all())
+            else:
+                deleted += result.rowcount
+        # Detached, so committing doesn't expire what was just returned
+        for item in db_data:
+            self.db.expunge(item)
+        self.db.commit()
+        if fetch_rows:
+            self._after_commit_many(db_data, deleted=True)
+        return db_data if returning else (len(db_data) if fetch_rows else deleted)
+
+    def _after_commit(
+        self,
+        db_data: TModel,
+        deleted: bool = False,
+        columns: frozenset[str] | None = None,
+    ) -> None:
+        """Called after a create, update or delete is committed.
+
+        Override to keep derived state (indexes, caches) in sync with the table.
+        `columns` are those an update set, None for creates and deletes.
+        """
+        pass
+
+    def _after_commit_many(
+        self,
+        db_data: list[TModel],
+        deleted: bool = False,
+        columns: frozenset[str] | None = None,
+    ) -> None:
+        """Called after a bulk create, update or delete is committed"""
+        for item in db_data:
+            self._after_commit(item, deleted, columns)
+
+
+class AsyncBaseRepository(Generic[TModel, TCreateSchema, TUpdateSchema, TOutputSchema]):
+    """Same operations as BaseRepository, awaiting the database through an AsyncSession"""
+
+    after_commit_needs_rows: ClassVar[bool] = False
+
+    def __init__(self, model: type[TModel], db: AsyncSession):
+        self.model = model
+        self.db = db
+
+    async def get_all(self) -> list[TModel]:
+        statement = select(self.model)
+        return (await self.db.exec(statement)).all()
+
+    async def get_page(
+        self,
+        after: TID | None = None,
+        limit: int = 100,
+        filters: Iterable[ColumnElement[bool]] = (),
+    ) -> list[TModel]:
+        """See BaseRepository.get_page"""
+        statement = _page_statement(self.model, filters, after, limit)
+        return (await self.db.exec(statement)).all()
+
+    async def stream(
+        self, filters: Iterable[ColumnElement[bool]] = (), batch_size: int = 1_000
+    ) -> AsyncIterator[TModel]:
+        """See BaseRepository.stream, rows come from a server-side cursor"""
+        statement = _page_statement(self.model, filters, None, None)
+        result = await self.db.stream_scalars(
+            statement.execution_options(yield_per=batch_size)
+        )
+        async for item in result:
+            yield item
+
+    async def get_by_id(self, id: TID) -> TModel:
+        """Gets a model instance by its ID"""
+        statement = select(self.model).where(self.model.id == id)
+        result = await self.db.exec(statement)
+        model = result.first()
+        if not model:
+            raise ValueError(f"{self.model.__name__} not found")
+        return model
+
+    async def create(self, data: TCreateSchema) -> TModel:
+        db_data = self.model(**data.model_dump())
+        self.db.add(db_data)
+        await self.db.commit()
+        await self.db.refresh(db_data)
+        self._after_commit(db_data)
+        return db_data
+
+    async def update(self, id: TID, data: TUpdateSchema) -> TModel:
+        """Generic update method that handles updated_at if it exists"""
+        db_data = await self.get_by_id(id)
+
+        update_dict = data.model_dump(exclude_unset=True)
+        columns = frozenset(update_dict)
+
+        # Update updated_at if the model has this field
+        if hasattr(db_data, "updated_at"):
+            update_dict["updated_at"] = datetime.now(timezone.utc)
+
+        for key, value in update_dict.items():
+            setattr(db_data, key, value)
+
+        self.db.add(db_data)
+        await self.db.commit()
+        await self.db.refresh(db_data)
+        self._after_commit(db_data, columns=columns)
+        return db_data
+
+    async def delete(self, id: TID) -> None:
+        """Deletes a model instance by its ID"""
+        db_data = await self.get_by_id(id)
+        await self.db.delete(db_data)
+        await self.db.commit()
+        self._after_commit(db_data, deleted=True)
+
+    async def create_many(self, data: Sequence[TCreateSchema]) -> list[TModel]:
+        """See BaseRepository.create_many"""
+        db_data = [self.model(**item.model_dump()) for item in data]
+        if db_data:
+            await self.db.exec(
+                insert(self.model), params=[d.model_dump() for d in db_data]
+            )
+            await self.db.commit()
+            self._after_commit_many(db_data)
+        return db_data
+
+    async def update_many(
+        self, changes: dict[TID, dict[str, Any]], returning: bool = False
+    ) -> list[TModel] | int:
+        """See BaseRepository.update_many"""
+        fetch_rows = returning or self.after_commit_needs_rows
+        db_data, updated = [], 0
+        for statement in _update_many_statements(self.model, changes, fetch_rows):
+            result = await self.db.exec(statement)
+            if fetch_rows:
+                db_data.extend(result.scalars().all())
+            else:
+                updated += result.rowcount
+        # Detached, so committing doesn't expire what was just returned
+        for item in db_data:
+            self.db.expunge(item)
+        await self.db.commit()
+        if fetch_rows:
+            columns = frozenset().union(*changes.values())
+            self._after_commit_many(db_data, columns=columns)
+        return db_data if returning else (len(db_data) if fetch_rows else updated)
+
+    async def delete_many(
+        self, ids: Sequence[TID], returning: bool = False
+    ) -> list[TModel] | int:
+        """See BaseRepository.delete_many"""
+        fetch_rows = returning or self.after_commit_needs_rows
+        db_data, deleted = [], 0
+        for statement in _delete_many_statements(self.model, ids, fetch_rows):
+            result = await self.db.exec(statement)
+            if fetch_rows:
+                db_data.extend(result.scalars().all())
+            else:
+                deleted += result.rowcount
+        # Detached, so committing doesn't expire what was just returned
+        for item in db_data:
+            self.db.expunge(item)
+        await self.db.commit()
+        if fetch_rows:
+            self._after_commit_many(db_data, deleted=True)
+        return db_data if returning else (len(db_data) if fetch_rows else deleted)
+
+    def _after_commit(
+        self,
+        db_data: TModel,
+        deleted: bool = False,
+        columns: frozenset[str] | None = None,
+    ) -> None:
+        """See BaseRepository._after_commit"""
+        pass
+
+    def _after_commit_many(
+        self,
+        db_data: list[TModel],
+        deleted: bool = False,
+        columns: frozenset[str] | None = None,
+    ) -> None:
+        """See BaseRepository._after_commit_many"""
+        for item in db_data:
+            self._after_commit(item, deleted, columns)
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Every named cache, so their stats can be exposed for monitoring
+cache_registry: dict[str, "TTLCache"] = {}
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl_seconds`.
+
+    Once `max_size` entries are stored, setting a new key evicts the least
+    recently used one. Hits, misses, evictions and expirations are counted.
+
+    With `tags`, entries are also indexed by the tags of their key and value,
+    so `invalidate_tagged` removes them without scanning every entry.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        ttl_seconds: float,
+        tags: Callable[[K, V], Iterable[Hashable]] | None = None,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.tags = tags
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._keys_by_tag: dict[Hashable, set[K]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        cache_registry[name] = self
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._delete(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._delete(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            if self.tags is not None:
+                for tag in self.tags(key, value):
+                    self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._delete(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._delete(key)
+
+    def invalidate_where(self, predicate: Callable[[V], bool]) -> None:
+        """Removes every entry whose value matches the predicate"""
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if predicate(v)]:
+                self._delete(key)
+
+    def invalidate_tagged(self, tags: Iterable[Hashable]) -> None:
+        """Removes every entry with any of the tags, see `tags`"""
+        with self._lock:
+            for tag in tags:
+                for key in self._keys_by_tag.get(tag, set()).copy():
+                    self._delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _delete(self, key: K) -> None:
+        """Must be called while holding the lock, with a stored key"""
+        _, value = self._entries.pop(key)
+        if self.tags is None:
+            return
+        for tag in self.tags(key, value):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
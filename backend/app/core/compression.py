@@ -0,0 +1,160 @@
+import gzip
+import zlib
+from collections.abc import Iterable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Optional, see the brotli extra in pyproject.toml
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# Preferred first, when the client accepts several equally
+ENCODINGS: tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_variants(body: bytes, minimum_size: int) -> dict[str, bytes]:
+    """`body` in every supported encoding, or nothing if it's too small"""
+    if len(body) < minimum_size:
+        return {}
+    return {encoding: compress(body, encoding) for encoding in ENCODINGS}
+
+
+def choose_encoding(accept_encoding: str, available: Iterable[str]) -> str | None:
+    """The available encoding the client prefers, as per its Accept-Encoding"""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def weak_etag(etag: str) -> str:
+    # Compressed bytes differ from the identity ones, so the tag can't be strong
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def vary_on_accept_encoding(headers: MutableHeaders) -> None:
+    vary = headers.get("vary", "")
+    if "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+
+class _Compressor:
+    """Incremental compressor, every chunk is flushed so streams keep flowing"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            # wbits 16 + MAX_WBITS writes a gzip header and trailer
+            self._zlib = zlib.compressobj(
+                GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+
+    def compress(self, chunk: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            data = self._brotli.process(chunk)
+            return data + (self._brotli.finish() if final else self._brotli.flush())
+        data = self._zlib.compress(chunk)
+        return data + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with gzip, or brotli when the brotli extra is
+    installed, depending on the request's Accept-Encoding.
+
+    Only responses of the allowed content types are compressed, and only when
+    they are at least `minimum_size` bytes, or streamed. Responses that already
+    have a Content-Encoding, e.g. precompressed cache entries, pass through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, content_types: Iterable[str]):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), ENCODINGS
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        compressor: _Compressor | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if self._compressible(headers):
+                    # Held back until the first body tells whether it's big enough
+                    start = message
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                if compressor is None:
+                    headers = MutableHeaders(scope=start)
+                    vary_on_accept_encoding(headers)
+                    if not more_body and len(body) < self.minimum_size:
+                        await send(start)
+                        start = None
+                        await send(message)
+                        return
+                    compressor = _Compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    if "etag" in headers:
+                        headers["ETag"] = weak_etag(headers["etag"])
+                    del headers["Content-Length"]
+                    if not more_body:
+                        body = compressor.compress(body, final=True)
+                        headers["Content-Length"] = str(len(body))
+                        await send(start)
+                        await send({**message, "body": body})
+                        return
+                    await send(start)
+                await send(
+                    {**message, "body": compressor.compress(body, not more_body)}
+                )
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").partition(";")[0].strip()
+        return content_type in self.content_types
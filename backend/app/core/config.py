@@ -21,6 +21,17 @@ def parse_cors(v: Any) -> list[str] | str:
     raise ValueError(v)
 
 
+def _async_database_url(url: str) -> str:
+    # Same database, through the asyncio driver of each backend
+    scheme, _, rest = url.partition("://")
+    async_schemes = {
+        "sqlite": "sqlite+aiosqlite",
+        "postgresql": "postgresql+psycopg",
+        "postgresql+psycopg2": "postgresql+psycopg",
+    }
+    return f"{async_schemes.get(scheme, scheme)}://{rest}"
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         # Use top level .env file (one level above ./backend/)
@@ -43,9 +54,78 @@ class Settings(BaseSettings):
     ] = []
 
     ZIP_CODE_RANGE_SEARCH: int = 3_000
+    # Default search mode of /care-facilities/nearest, see SearchMode
+    SEARCH_MODE: Literal["distance", "service_area", "geo"] = "distance"
+    # Radius of "geo" searches, around the centroid of the requested zip code
+    SEARCH_RADIUS_KM: float = 50.0
+    # Serve facility searches from a process-local index instead of the database
+    SEARCH_INDEX_ENABLED: bool = True
+    # Reload the index periodically, in case polling missed a write made by
+    # another process, see FACILITY_CHANGES_POLL_INTERVAL_SECONDS
+    SEARCH_INDEX_TTL_SECONDS: int | None = 300
+    # Precompute the best match of every zip code when the search index loads
+    SEARCH_BEST_MATCH_TABLE_ENABLED: bool = False
+    # Score index searches with NumPy column arrays, needs the numpy extra
+    SEARCH_VECTORIZED: bool = False
+
+    # In-process cache of facility detail lookups by slug
+    FACILITY_CACHE_ENABLED: bool = True
+    FACILITY_CACHE_MAX_SIZE: int = 1_024
+    FACILITY_CACHE_TTL_SECONDS: int = 300
+    # In-process cache of serialized best match responses, by care type, zip
+    # code and search mode. Facility writes evict the answers they can affect.
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_MAX_SIZE: int = 10_000
+    SEARCH_CACHE_TTL_SECONDS: int = 60
+    # Cache-Control max-age of facility pages and search results, in seconds
+    FACILITY_CACHE_CONTROL_MAX_AGE: int = 300
+    SEARCH_CACHE_CONTROL_MAX_AGE: int = 60
+
+    # Capacity updates are coalesced in memory and written in batches this often
+    CAPACITY_UPDATE_FLUSH_INTERVAL_SECONDS: float = 1.0
+    # Each worker process polls for the facility writes of the others this often,
+    # and applies them to its search index and caches, see changes.py
+    FACILITY_CHANGES_POLL_INTERVAL_SECONDS: float | None = 2.0
+    # Facilities per capacity flush transaction, and per step of applying polled
+    # writes. Each step updates the search index on the event loop
+    DERIVED_STATE_SYNC_BATCH_SIZE: int = 200
+
+    # Records per transaction of the bulk facility import
+    IMPORT_CHUNK_SIZE: int = 1_000
+
+    # Request timing middleware and GET /metrics
+    METRICS_ENABLED: bool = True
+    # Server-Timing response headers with the spans of each request. They name
+    # internal classes and methods, so only enable them where that's fine
+    SERVER_TIMING_ENABLED: bool = False
+    # GET /metrics only answers requests sending this as a bearer token, as
+    # Prometheus does with its `authorization` scrape config; unset, it's a 404
+    METRICS_TOKEN: str | None = None
+
+    # gzip (or brotli, with the brotli extra) compression of responses of these
+    # content types, from this many bytes. Cached facility payloads are stored
+    # precompressed.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 500
+    COMPRESSION_CONTENT_TYPES: Annotated[
+        list[str] | str, BeforeValidator(parse_cors)
+    ] = [
+        "application/json",
+        "application/x-ndjson",
+        "text/plain",
+    ]
 
     POSTHOG_API_KEY: str | None = None
     POSTHOG_HOST: str | None = None
+    # "posthog" needs POSTHOG_API_KEY and POSTHOG_HOST, "jsonl" appends to a local file
+    ANALYTICS_SINK: Literal["posthog", "jsonl"] = "posthog"
+    ANALYTICS_JSONL_PATH: str = "./analytics.jsonl"
+    # Roll up repeated search miss events into one event per window, if set
+    ANALYTICS_AGGREGATION_WINDOW_SECONDS: int | None = None
+    # Events are queued in memory and handed to the sink in batches
+    ANALYTICS_QUEUE_MAX_SIZE: int = 10_000
+    ANALYTICS_BATCH_SIZE: int = 100
+    ANALYTICS_FLUSH_INTERVAL_SECONDS: float = 5.0
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -56,12 +136,54 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str
     DATABASE_URL: str = "sqlite:///./sql_app.db"
+    # Connection pool of each engine, see app.core.db.create_db_engine. A
+    # recycle of -1 keeps connections open indefinitely.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1_800
+    DB_POOL_PRE_PING: bool = True
+    # Log a warning when a checkout waits this long, i.e. requests queue on the pool
+    DB_POOL_WAIT_WARNING_SECONDS: float = 0.1
+    # Server-side statement timeout, PostgreSQL only. None for no timeout.
+    DB_STATEMENT_TIMEOUT_MS: int | None = None
+    # psycopg prepares a statement server-side once a connection has run it this
+    # many times. None disables it, e.g. behind PgBouncer in transaction mode.
+    DB_PREPARE_THRESHOLD: int | None = 2
 
     @computed_field  # type: ignore[prop-decorator]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         return self.DATABASE_URL
 
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> str:
+        return _async_database_url(self.DATABASE_URL)
+
+    # Pragmas of every connection to a SQLite file. WAL lets reads run while a
+    # write is in progress, and NORMAL synchronous is safe with WAL.
+    SQLITE_JOURNAL_MODE: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5_000
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024
+    # Writes to a SQLite file go through one connection at a time, across the
+    # sync and async engines, reads through a pool of their own
+    SQLITE_SINGLE_WRITER: bool = True
+
+    # Read replicas of DATABASE_URL, comma separated, used round-robin by read
+    # only routes (see ReadSessionDep). Without any, reads use the primary.
+    DATABASE_REPLICA_URLS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    # Replicas failing a health check are skipped until they pass one again
+    DB_REPLICA_HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0
+    DB_REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_ASYNC_REPLICA_URIS(self) -> list[str]:
+        return [_async_database_url(url) for url in self.DATABASE_REPLICA_URLS]
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -1,10 +1,346 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from typing import Any, NoReturn
+
+from sqlalchemy import Engine, event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util import await_only
 from sqlmodel import Session, create_engine
 
 # from app import crud
 from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import Gauge, Histogram
+
+logger = get_logger(__name__)
+
+pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to check a connection out of the pool, by engine",
+    ("engine",),
+)
+
+# Seconds between two "waited for a connection" warnings, so load can't flood logs
+POOL_WAIT_WARNING_INTERVAL_SECONDS = 10.0
+_last_pool_wait_warning = 0.0
+
+
+class _TimedCheckoutMixin:
+    """Times every checkout, and warns when requests queue on the pool"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _observe_checkout(self, time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# Seconds between two tries of an async checkout to take the writer lock
+WRITER_LOCK_POLL_SECONDS = 0.005
+
+# One lock per SQLite file, shared by the sync and async writer engines
+_writer_locks: dict[str, threading.Lock] = {}
+
+
+def _writer_lock(url: str) -> threading.Lock:
+    return _writer_locks.setdefault(
+        os.path.abspath(make_url(url).database), threading.Lock()
+    )
+
+
+class _SingleWriterMixin:
+    """
+    Holds the writer lock of its SQLite file while a connection is checked
+    out, so the sync and async writer engines of a file write one at a time
+    """
+
+    writer_lock: threading.Lock
+
+    def _do_get(self):
+        self._acquire_writer_lock()
+        try:
+            return super()._do_get()
+        except BaseException:
+            self.writer_lock.release()
+            raise
+
+    def _do_return_conn(self, record) -> None:
+        try:
+            super()._do_return_conn(record)
+        finally:
+            self.writer_lock.release()
+
+    def _acquire_writer_lock(self) -> None:
+        if not self.writer_lock.acquire(timeout=self._timeout):
+            _writer_lock_timeout(self)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.writer_lock = self.writer_lock
+        return pool
+
+
+# Checkouts are timed including the wait for the writer lock
+class SingleWriterQueuePool(_TimedCheckoutMixin, _SingleWriterMixin, QueuePool):
+    pass
+
+
+class SingleWriterAsyncAdaptedQueuePool(
+    _TimedCheckoutMixin, _SingleWriterMixin, AsyncAdaptedQueuePool
+):
+    def _acquire_writer_lock(self) -> None:
+        # Polled, as blocking on the lock would block the event loop
+        await_only(self._poll_writer_lock())
+
+    async def _poll_writer_lock(self) -> None:
+        deadline = time.monotonic() + self._timeout
+        while not self.writer_lock.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                _writer_lock_timeout(self)
+            await asyncio.sleep(WRITER_LOCK_POLL_SECONDS)
+
+
+def _writer_lock_timeout(pool: QueuePool) -> NoReturn:
+    raise exc.TimeoutError(
+        f"Timed out after {pool._timeout}s waiting for the {pool.logging_name} "
+        "SQLite writer, another engine of the file is writing"
+    )
+
+
+def _observe_checkout(pool: QueuePool, wait: float) -> None:
+    global _last_pool_wait_warning
+    pool_checkout_wait.observe(wait, pool.logging_name or "default")
+    if wait < settings.DB_POOL_WAIT_WARNING_SECONDS:
+        return
+    now = time.monotonic()
+    if now - _last_pool_wait_warning >= POOL_WAIT_WARNING_INTERVAL_SECONDS:
+        _last_pool_wait_warning = now
+        logger.warning(
+            f"Waited {wait:.3f}s for a {pool.logging_name} database connection, "
+            f"consider raising DB_POOL_SIZE or DB_MAX_OVERFLOW: {pool.status()}"
+        )
+
+
+# Engines by name, for the pool gauges
+_engines: dict[str, Engine] = {}
+
+
+def _collect_pool_connections() -> dict[tuple[str, ...], float]:
+    connections = {}
+    for name, db_engine in _engines.items():
+        pool = db_engine.pool
+        if isinstance(pool, QueuePool):
+            connections[(name, "checked_out")] = pool.checkedout()
+            connections[(name, "idle")] = pool.checkedin()
+            connections[(name, "overflow")] = max(pool.overflow(), 0)
+    return connections
+
+
+Gauge(
+    "db_pool_connections",
+    "Connections of each engine's pool, by state",
+    ("engine", "state"),
+    _collect_pool_connections,
+)
+
+
+def _engine_options(
+    url: str, name: str, is_async: bool, writer: bool = False
+) -> dict[str, Any]:
+    """create_engine keyword arguments for `url`, as configured in Settings"""
+    backend = make_url(url).get_backend_name()
+    connect_args: dict[str, Any] = {}
+    if backend == "sqlite":
+        connect_args["check_same_thread"] = False
+    elif backend == "postgresql":
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["options"] = (
+                f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+            )
+        if make_url(url).get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = settings.DB_PREPARE_THRESHOLD
+    options: dict[str, Any] = {
+        "connect_args": connect_args,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_logging_name": name,
+    }
+    # In-memory SQLite databases live in a single connection, keep their pool
+    if backend != "sqlite" or not _is_memory_database(url):
+        options.update(
+            poolclass=(
+                InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool
+            ),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        )
+        if writer and _is_sqlite_file(url) and settings.SQLITE_SINGLE_WRITER:
+            # SQLite allows one writer at a time, waiting on the writer lock
+            # beats waiting on the database lock, and waits as long
+            options.update(
+                poolclass=(
+                    SingleWriterAsyncAdaptedQueuePool
+                    if is_async
+                    else SingleWriterQueuePool
+                ),
+                pool_size=1,
+                max_overflow=0,
+                pool_timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            )
+    return options
+
+
+def _is_memory_database(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in url
+
+
+def _is_sqlite_file(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite" and not _is_memory_database(url)
+
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    """Tunes every new SQLite connection, see the SQLITE_* settings"""
+    cursor = dbapi_connection.cursor()
+    for pragma in (
+        f"journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"mmap_size={settings.SQLITE_MMAP_SIZE_BYTES}",
+        # Negative sizes are in KiB rather than pages
+        f"cache_size=-{settings.SQLITE_CACHE_SIZE_KIB}",
+        "temp_store=MEMORY",
+    ):
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+def create_db_engine(url: str, name: str, writer: bool = False) -> Engine:
+    """
+    An engine with the pool settings of Settings, whose pool is instrumented.
+    SQLite connections get the SQLITE_* pragmas. When SQLITE_SINGLE_WRITER is
+    set, `writer` engines of a SQLite file, sync or async, share one writer
+    lock: only one of their connections is checked out at a time.
+    """
+    db_engine = create_engine(url, **_engine_options(url, name, False, writer))
+    if _is_sqlite_file(url):
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    _register(db_engine, url, name)
+    return db_engine
+
+
+def create_async_db_engine(url: str, name: str, writer: bool = False) -> AsyncEngine:
+    """Like `create_db_engine`, through an asyncio driver"""
+    db_engine = create_async_engine(url, **_engine_options(url, name, True, writer))
+    if _is_sqlite_file(url):
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    _register(db_engine.sync_engine, url, name)
+    return db_engine
+
+
+def _register(db_engine: Engine, url: str, name: str) -> None:
+    if isinstance(db_engine.pool, _SingleWriterMixin):
+        db_engine.pool.writer_lock = _writer_lock(url)
+    _engines[name] = db_engine
+
+
+engine = create_db_engine(settings.SQLALCHEMY_DATABASE_URI, "sync", writer=True)
+
+# Used by async routes, so queries don't block the event loop
+async_engine = create_async_db_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI, "async", writer=True
+)
+
+# Reads of the primary database. A pool of its own on a single writer SQLite
+# file, so reads never wait for the writer connection.
+if _is_sqlite_file(settings.DATABASE_URL) and settings.SQLITE_SINGLE_WRITER:
+    async_read_engine = create_async_db_engine(
+        settings.SQLALCHEMY_ASYNC_DATABASE_URI, "async_read"
+    )
+else:
+    async_read_engine = async_engine
+
+
+class ReplicaSet:
+    """
+    Read replica engines, handed out round-robin by `next_engine`.
+
+    Replicas failing a health check (see `check_health`) are skipped until
+    they pass one again. Without any healthy replica, reads use `primary`.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: list[AsyncEngine]):
+        self.primary = primary
+        self.replicas = replicas
+        self._healthy = list(replicas)
+        self._turns = itertools.count()
+
+    @property
+    def healthy(self) -> list[AsyncEngine]:
+        return list(self._healthy)
+
+    def next_engine(self) -> AsyncEngine:
+        healthy = self._healthy
+        if not healthy:
+            return self.primary
+        return healthy[next(self._turns) % len(healthy)]
+
+    async def check_health(self, timeout_seconds: float) -> None:
+        results = await asyncio.gather(
+            *(self._is_healthy(replica, timeout_seconds) for replica in self.replicas)
+        )
+        healthy = [r for r, ok in zip(self.replicas, results, strict=True) if ok]
+        for replica in set(self._healthy) - set(healthy):
+            logger.warning(f"Read replica {replica.url!r} is unhealthy, skipping it")
+        for replica in set(healthy) - set(self._healthy):
+            logger.info(f"Read replica {replica.url!r} is healthy again")
+        self._healthy = healthy
+
+    async def check_health_periodically(
+        self, interval_seconds: float, timeout_seconds: float
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await self.check_health(timeout_seconds)
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.dispose()
+
+    @staticmethod
+    async def _is_healthy(replica: AsyncEngine, timeout_seconds: float) -> bool:
+        async def ping() -> None:
+            async with replica.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        try:
+            await asyncio.wait_for(ping(), timeout_seconds)
+        except Exception:
+            return False
+        return True
+
 
-engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URI, connect_args={"check_same_thread": False}
+replica_set = ReplicaSet(
+    async_read_engine,
+    [
+        create_async_db_engine(url, f"replica_{i}")
+        for i, url in enumerate(settings.SQLALCHEMY_ASYNC_REPLICA_URIS)
+    ],
 )
 
 
@@ -1,14 +1,16 @@
-from collections.abc import Generator
+import secrets
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, Security
-from fastapi.security import APIKeyHeader
-from posthog import Posthog
+from fastapi import Depends, HTTPException, Request, Security
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.analytics import PosthogAnalytics
+from app.core.analytics import Analytics
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import async_engine, engine, replica_set
 from app.core.email import EmailService
 
 
@@ -20,6 +22,49 @@ def get_db() -> Generator[Session, None, None]:
 SessionDep = Annotated[Session, Depends(get_db)]
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+
+# Request header forcing reads onto the primary, e.g. right after a write
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+
+def reads_own_writes(request: Request) -> bool:
+    return request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() in ("1", "true")
+
+
+def read_engine(request: Request) -> AsyncEngine:
+    """
+    The next healthy read replica, or the primary if there is none or the
+    request asks to read its own writes
+    """
+    if reads_own_writes(request):
+        return replica_set.primary
+    return replica_set.next_engine()
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """A session on `read_engine`. Only for reads, writes belong on AsyncSessionDep"""
+    async with AsyncSession(read_engine(request), expire_on_commit=False) as session:
+        yield session
+
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
+
+
+async def get_primary_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """A session reading the primary, never a replica that may lag behind it"""
+    async with AsyncSession(replica_set.primary, expire_on_commit=False) as session:
+        yield session
+
+
+PrimaryReadSessionDep = Annotated[AsyncSession, Depends(get_primary_read_db)]
+
+
 def get_email_service() -> EmailService:
     return EmailService()
 
@@ -42,12 +87,30 @@ async def validate_admin_api_key(api_key: str = Security(api_key_header)) -> Non
 AdminAPIKeyDep = Annotated[None, Depends(validate_admin_api_key)]
 
 
-def get_posthog() -> PosthogAnalytics | None:
-    if not settings.POSTHOG_API_KEY or not settings.POSTHOG_HOST:
-        return None
-    return PosthogAnalytics(
-        Posthog(settings.POSTHOG_API_KEY, host=settings.POSTHOG_HOST)
-    )
+metrics_bearer = HTTPBearer(auto_error=False)
+
+
+async def validate_metrics_token(
+    credentials: HTTPAuthorizationCredentials | None = Security(metrics_bearer),
+) -> None:
+    """Validate the metrics scrape token, hiding the endpoint if none is set"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials, settings.METRICS_TOKEN
+    ):
+        raise HTTPException(
+            status_code=403,
+            detail="Invalid metrics token",
+        )
+
+
+MetricsTokenDep = Annotated[None, Depends(validate_metrics_token)]
+
+
+def get_analytics(request: Request) -> Analytics:
+    """The application-wide analytics client, created by the lifespan"""
+    return request.app.state.analytics
 
 
-PostHogDep = Annotated[Posthog | None, Depends(get_posthog)]
+AnalyticsDep = Annotated[Analytics, Depends(get_analytics)]
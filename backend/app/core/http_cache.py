@@ -0,0 +1,101 @@
+import hashlib
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.core.compression import choose_encoding, weak_etag
+from app.core.metrics import span
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body, stable across processes"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have a one second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes, which are always stored in UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def conditional_response(
+    request: Request,
+    content: BaseModel | bytes,
+    max_age: int,
+    last_modified: datetime | None = None,
+    compressed: Mapping[str, bytes] | None = None,
+    vary: Iterable[str] = (),
+) -> Response:
+    """
+    JSON response carrying ETag, Cache-Control and (optionally) Last-Modified
+    headers, or an empty 304 when the client's copy is still current.
+
+    If-None-Match takes precedence over If-Modified-Since, as per RFC 9110.
+    `content` is either a model or its already serialized JSON, `compressed`
+    its precompressed variants by content encoding, if any. `vary` lists the
+    request headers, other than Accept-Encoding, the response depends on.
+    """
+    if isinstance(content, bytes):
+        body = content
+    else:
+        with span("serialization", "serialization"):
+            body = content.model_dump_json().encode()
+    headers = {
+        "ETag": compute_etag(body),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, headers["ETag"])
+    elif if_modified_since is not None and last_modified is not None:
+        not_modified = _not_modified_since(if_modified_since, last_modified)
+    else:
+        not_modified = False
+
+    vary = list(vary)
+    encoding = None
+    if compressed:
+        vary.append("Accept-Encoding")
+        encoding = choose_encoding(
+            request.headers.get("accept-encoding", ""), compressed
+        )
+        if encoding is not None:
+            headers["ETag"] = weak_etag(headers["ETag"])
+
+    if vary:
+        headers["Vary"] = ", ".join(vary)
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        body = compressed[encoding]
+    return Response(content=body, media_type="application/json", headers=headers)
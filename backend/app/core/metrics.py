@@ -0,0 +1,201 @@
+import functools
+import inspect
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram, with one series per label set"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: tuple[str, ...],
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        # Per label values: a count per bucket (non-cumulative), the sum and the count
+        self._series: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+        self._lock = threading.Lock()
+        metrics_registry.append(self)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            bucket_counts, total, count = self._series.get(
+                label_values, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    bucket_counts[i] += 1
+                    break
+            self._series[label_values] = (bucket_counts, total + value, count + 1)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self._series.items()
+            )
+        for label_values, (bucket_counts, total, count) in series:
+            labels = [
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.label_names, label_values, strict=True)
+            ]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts, strict=True):
+                cumulative += bucket_count
+                bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            bucket_labels = ",".join([*labels, 'le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            lines.append(f"{self.name}_sum{{{','.join(labels)}}} {total}")
+            lines.append(f"{self.name}_count{{{','.join(labels)}}} {count}")
+        return lines
+
+
+class Gauge:
+    """Prometheus-style gauge whose series are read from `collect` on render"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: tuple[str, ...],
+        collect: Callable[[], dict[tuple[str, ...], float]],
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.collect = collect
+        metrics_registry.append(self)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} gauge",
+        ]
+        for label_values, value in sorted(self.collect().items()):
+            labels = ",".join(
+                f'{name}="{_escape(label)}"'
+                for name, label in zip(self.label_names, label_values, strict=True)
+            )
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics_registry: list[Histogram | Gauge] = []
+
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    return "\n".join(line for m in metrics_registry for line in m.render()) + "\n"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to send the full response, by route template",
+    ("method", "route", "status"),
+)
+span_duration = Histogram(
+    "span_duration_seconds",
+    "Time spent in instrumented code, by stage and name",
+    ("stage", "name"),
+)
+
+# Spans finished during the current request, exported as Server-Timing when
+# `TimingMiddleware` has it enabled
+request_spans: ContextVar[list[tuple[str, float]] | None] = ContextVar(
+    "request_spans", default=None
+)
+
+
+@contextmanager
+def span(stage: str, name: str) -> Iterator[None]:
+    """Times the block into `span_duration`, and the request's Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        span_duration.observe(duration, stage, name)
+        spans = request_spans.get()
+        if spans is not None:
+            spans.append((name, duration))
+
+
+def instrument(stage: str, name: str | None = None) -> Callable[[T], T]:
+    """Decorates a function or coroutine function to run inside a `span`"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+        if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+            # Calling them only creates the generator, there is nothing to time
+            return func
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage, span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_class(stage: str) -> Callable[[type[T]], type[T]]:
+    """Instruments every public method of a class, including inherited ones"""
+
+    def decorator(cls):
+        for attribute in dir(cls):
+            method = getattr(cls, attribute)
+            if attribute.startswith("_") or not inspect.isfunction(method):
+                continue
+            setattr(
+                cls, attribute, instrument(stage, f"{cls.__name__}.{attribute}")(method)
+            )
+        return cls
+
+    return decorator
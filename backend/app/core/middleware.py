@@ -0,0 +1,65 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import http_request_duration, request_spans
+
+
+def _server_timing(spans: list[tuple[str, float]], total: float) -> str:
+    return ", ".join(
+        f"{name};dur={duration * 1_000:.3f}"
+        for name, duration in [*spans, ("total", total)]
+    )
+
+
+class TimingMiddleware:
+    """
+    Records the duration of every HTTP request by route template. With
+    `server_timing`, it also adds a Server-Timing header with the spans (see
+    `app.core.metrics.span`) that finished before the response started.
+
+    Background tasks run after the response is sent, so they are only
+    recorded in the span metrics.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        spans: list[tuple[str, float]] = []
+        token = request_spans.set(spans if self.server_timing else None)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing",
+                        _server_timing(spans, time.perf_counter() - started),
+                    )
+            elif message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                self._observe(scope, status, time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_spans.reset(token)
+
+    @staticmethod
+    def _observe(scope: Scope, status: int, duration: float) -> None:
+        # The route template, not the path, to keep the number of series bounded
+        route = getattr(scope.get("route"), "path", "unmatched")
+        http_request_duration.observe(duration, scope["method"], route, str(status))
@@ -1,11 +1,26 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.routing import APIRoute
+from posthog import Posthog
 from starlette.middleware.cors import CORSMiddleware
 
+from app.core.analytics import Analytics, AnalyticsSink, JsonlSink, PosthogSink
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.db import async_engine, async_read_engine, replica_set
+from app.core.deps import MetricsTokenDep
+from app.core.metrics import render_metrics
+from app.core.middleware import TimingMiddleware
 
 # from app.core.security import oauth2_scheme
 from app.modules.admin.routes import router as admin_router
+from app.modules.care_facilities.capacity import capacity_update_coalescer
+from app.modules.care_facilities.changes import facility_change_poller
 from app.modules.care_facilities.routes import care_facilities_router
 
 
@@ -13,10 +28,81 @@ def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+def create_analytics_sink() -> AnalyticsSink | None:
+    if settings.ANALYTICS_SINK == "jsonl":
+        return JsonlSink(settings.ANALYTICS_JSONL_PATH)
+    if settings.POSTHOG_API_KEY and settings.POSTHOG_HOST:
+        return PosthogSink(
+            Posthog(
+                settings.POSTHOG_API_KEY,
+                host=settings.POSTHOG_HOST,
+                flush_at=settings.ANALYTICS_BATCH_SIZE,
+            )
+        )
+    return None
+
+
+def create_analytics() -> Analytics:
+    return Analytics(
+        create_analytics_sink(),
+        max_queue_size=settings.ANALYTICS_QUEUE_MAX_SIZE,
+        batch_size=settings.ANALYTICS_BATCH_SIZE,
+        aggregation_window_seconds=settings.ANALYTICS_AGGREGATION_WINDOW_SECONDS,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    analytics = create_analytics()
+    app.state.analytics = analytics
+    periodic_tasks = [
+        asyncio.create_task(
+            analytics.flush_periodically(settings.ANALYTICS_FLUSH_INTERVAL_SECONDS)
+        ),
+        asyncio.create_task(
+            capacity_update_coalescer.flush_periodically(
+                settings.CAPACITY_UPDATE_FLUSH_INTERVAL_SECONDS
+            )
+        ),
+    ]
+    if settings.FACILITY_CHANGES_POLL_INTERVAL_SECONDS is not None:
+        periodic_tasks.append(
+            asyncio.create_task(
+                facility_change_poller.poll_periodically(
+                    settings.FACILITY_CHANGES_POLL_INTERVAL_SECONDS
+                )
+            )
+        )
+    if replica_set.replicas:
+        periodic_tasks.append(
+            asyncio.create_task(
+                replica_set.check_health_periodically(
+                    settings.DB_REPLICA_HEALTH_CHECK_INTERVAL_SECONDS,
+                    settings.DB_REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS,
+                )
+            )
+        )
+    try:
+        yield
+    finally:
+        for periodic_task in periodic_tasks:
+            periodic_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await periodic_task
+        await capacity_update_coalescer.flush()
+        await asyncio.to_thread(analytics.shutdown)
+        await replica_set.dispose()
+        if async_read_engine is not async_engine:
+            await async_read_engine.dispose()
+        await async_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    default_response_class=ORJSONResponse,
 )
 
 # Set all CORS enabled origins
@@ -29,6 +115,24 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+# Inside the timing middleware, so compression time is included
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        content_types=settings.COMPRESSION_CONTENT_TYPES,
+    )
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
+    @app.get("/metrics", tags=["metrics"], include_in_schema=False)
+    async def metrics(_: MetricsTokenDep) -> PlainTextResponse:
+        return PlainTextResponse(
+            render_metrics(), media_type="text/plain; version=0.0.4"
+        )
+
+
 if settings.ENABLE_ADMIN_ROUTES:
     app.include_router(admin_router, prefix=settings.API_V1_STR)
 app.include_router(care_facilities_router, prefix=settings.API_V1_STR)
@@ -1,6 +1,20 @@
-from fastapi import APIRouter
+import io
 
+from fastapi import APIRouter, HTTPException, UploadFile
+
+from app.core.cache import cache_registry
 from app.core.deps import AdminAPIKeyDep, SessionDep
+from app.modules.care_facilities.capacity import capacity_update_coalescer
+from app.modules.care_facilities.importer import (
+    ImportFormat,
+    format_from_filename,
+    import_facilities,
+)
+from app.modules.care_facilities.schemas import (
+    CareFacilityCapacityUpdateRequest,
+    CareFacilityCapacityUpdateResponse,
+    CareFacilityImportResponse,
+)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -12,3 +26,46 @@ async def admin_endpoint(
 ):
     """ """
     return {"message": "Hello, world!"}
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(_: AdminAPIKeyDep) -> dict[str, dict[str, int | float]]:
+    """Size, hit/miss and eviction counters of every in-process cache"""
+    return {name: cache.stats() for name, cache in cache_registry.items()}
+
+
+@router.post("/care-facilities/import")
+def import_care_facilities(
+    _: AdminAPIKeyDep,
+    session: SessionDep,
+    file: UploadFile,
+    file_format: ImportFormat | None = None,
+) -> CareFacilityImportResponse:
+    """Upserts care facilities by slug from a CSV or JSON lines upload"""
+    if file_format is None:
+        try:
+            file_format = format_from_filename(file.filename or "")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    return import_facilities(session, lines, file_format)
+
+
+@router.post("/care-facilities/capacity", status_code=202)
+async def update_care_facility_capacity(
+    _: AdminAPIKeyDep,
+    request: CareFacilityCapacityUpdateRequest,
+    flush: bool = False,
+) -> CareFacilityCapacityUpdateResponse:
+    """
+    Queues available capacity updates, written in batches every
+    CAPACITY_UPDATE_FLUSH_INTERVAL_SECONDS, or right away with `flush`
+    """
+    capacity_update_coalescer.submit(
+        (update.facility_id, update.available_capacity) for update in request.updates
+    )
+    if flush:
+        await capacity_update_coalescer.flush()
+    return CareFacilityCapacityUpdateResponse(
+        accepted=len(request.updates), pending=capacity_update_coalescer.pending
+    )
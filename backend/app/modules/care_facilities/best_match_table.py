@@ -0,0 +1,216 @@
+from bisect import bisect_left, bisect_right
+from typing import Protocol
+
+from app.modules.care_facilities.schemas import CareType
+
+ZIP_CODE_COUNT = 100_000
+
+
+class _Entry(Protocol):
+    zip_code: int
+    available_capacity: bool
+
+
+class BestMatchTable:
+    """
+    Precomputed `find_best_match` answers for every 5-digit zip code.
+
+    For each care type two arrays are indexed by zip code: the nearest facility
+    with available capacity, and the nearest facility overall (reported to
+    analytics when nothing is available), both limited to `zip_code_range`.
+    Lookups are O(1) regardless of the number of facilities. When a facility
+    changes only the zip codes between the neighbours of its old and new location
+    are recomputed, each run of them once.
+
+    The arrays of a care type are never changed once published: updates are
+    made to copies, swapped in at once. So lookups need no lock, and never see
+    an update half done.
+    """
+
+    def __init__(self, zip_code_range: int):
+        self.zip_code_range = zip_code_range
+        # (available, nearest) arrays of each care type
+        self._answers: dict[
+            CareType, tuple[list[_Entry | None], list[_Entry | None]]
+        ] = {}
+
+    def lookup(
+        self, care_type: CareType, zip_code: int
+    ) -> tuple[_Entry | None, _Entry | None]:
+        """The (nearest available, nearest) facilities for a zip code"""
+        answers = self._answers.get(care_type)
+        if answers is None:
+            return None, None
+        available, nearest = answers
+        return available[zip_code], nearest[zip_code]
+
+    def rebuild(
+        self, care_type: CareType, zip_codes: list[int], entries: list[_Entry]
+    ) -> None:
+        """Recomputes every zip code of a care type from its sorted entries"""
+        available_zip_codes, available_entries = self._available_only(
+            zip_codes, entries
+        )
+        self._answers[care_type] = (
+            self._sweep(available_zip_codes, available_entries),
+            self._sweep(zip_codes, entries),
+        )
+
+    def refresh(
+        self,
+        care_type: CareType,
+        zip_codes: list[int],
+        entries: list[_Entry],
+        changed_zip_codes: set[int],
+    ) -> None:
+        """
+        Recomputes the zip codes whose answers the changed facility zip codes can
+        affect: those between their neighbours, within range
+        """
+        if care_type not in self._answers:
+            self.rebuild(care_type, zip_codes, entries)
+            return
+        available_intervals = self._affected_intervals(
+            zip_codes, entries, changed_zip_codes, available_only=True
+        )
+        nearest_intervals = self._affected_intervals(
+            zip_codes, entries, changed_zip_codes, available_only=False
+        )
+        # Past half the zip codes of both arrays on average, a full sweep of each
+        # is cheaper than sweeping the intervals one by one
+        covered = sum(
+            stop - start for start, stop in available_intervals + nearest_intervals
+        )
+        if covered > ZIP_CODE_COUNT:
+            self.rebuild(care_type, zip_codes, entries)
+            return
+        available, nearest = (list(answers) for answers in self._answers[care_type])
+        for start, stop in available_intervals:
+            low, high = self._bounds(
+                zip_codes, entries, start, stop, available_only=True
+            )
+            available[start:stop] = self._sweep_range(
+                *self._available_only(zip_codes[low:high], entries[low:high]),
+                start,
+                stop,
+            )
+        for start, stop in nearest_intervals:
+            nearest[start:stop] = self._sweep_range(zip_codes, entries, start, stop)
+        self._answers[care_type] = (available, nearest)
+
+    def _affected_intervals(
+        self,
+        zip_codes: list[int],
+        entries: list[_Entry],
+        changed_zip_codes: set[int],
+        available_only: bool,
+    ) -> list[tuple[int, int]]:
+        """
+        Disjoint [start, stop) zip code intervals between the neighbours of each
+        changed zip code, within range of it: every other zip code has the same
+        nearest entries on either side as before
+        """
+        intervals: list[tuple[int, int]] = []
+        for changed_zip_code in sorted(changed_zip_codes):
+            first = bisect_left(zip_codes, changed_zip_code)
+            end = bisect_right(zip_codes, changed_zip_code, first)
+            low, high = self._bounds(
+                zip_codes,
+                entries,
+                changed_zip_code,
+                changed_zip_code + 1,
+                available_only,
+            )
+            start = max(changed_zip_code - self.zip_code_range, 0)
+            if low < first:
+                start = max(start, zip_codes[low] + 1)
+            stop = min(changed_zip_code + self.zip_code_range + 1, ZIP_CODE_COUNT)
+            if high > end:
+                stop = min(stop, zip_codes[high - 1])
+            if start >= stop:
+                continue
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1] = (intervals[-1][0], max(intervals[-1][1], stop))
+            else:
+                intervals.append((start, stop))
+        return intervals
+
+    def _bounds(
+        self,
+        zip_codes: list[int],
+        entries: list[_Entry],
+        start: int,
+        stop: int,
+        available_only: bool,
+    ) -> tuple[int, int]:
+        """
+        Positions of the entries in zip codes start to stop - 1, widened to the
+        nearest (available) entry within range on either side
+        """
+        low = bisect_left(zip_codes, start)
+        high = bisect_left(zip_codes, stop, low)
+        position = low - 1
+        while position >= 0 and zip_codes[position] >= start - self.zip_code_range:
+            if not available_only or entries[position].available_capacity:
+                low = position
+                break
+            position -= 1
+        position = high
+        while (
+            position < len(zip_codes)
+            and zip_codes[position] < stop + self.zip_code_range
+        ):
+            if not available_only or entries[position].available_capacity:
+                high = position + 1
+                break
+            position += 1
+        return low, high
+
+    def _sweep(
+        self, zip_codes: list[int], entries: list[_Entry]
+    ) -> list[_Entry | None]:
+        return self._sweep_range(zip_codes, entries, 0, ZIP_CODE_COUNT)
+
+    def _sweep_range(
+        self, zip_codes: list[int], entries: list[_Entry], start: int, stop: int
+    ) -> list[_Entry | None]:
+        """
+        The answers of zip codes start to stop - 1 from the sorted entries, built a
+        run at a time: each zip code answers up to the midpoint of the gaps to its
+        neighbours, within range, with ties going to the lower zip code
+        """
+        answers: list[_Entry | None] = []
+        reach = self.zip_code_range
+        # Only the entries in the range and the nearest one on either side of it
+        # can be answers
+        first = max(bisect_left(zip_codes, start) - 1, 0)
+        count = min(bisect_right(zip_codes, stop - 1) + 1, len(zip_codes))
+        while first < count:
+            zip_code = zip_codes[first]
+            # One past the last entry at this zip code
+            end = bisect_right(zip_codes, zip_code, first)
+            low = zip_code - reach
+            if first and low <= zip_codes[first - 1] + reach:
+                low = (zip_codes[first - 1] + zip_code) // 2 + 1
+            high = zip_code + reach + 1
+            if end < len(zip_codes) and high > zip_codes[end] - reach:
+                high = (zip_code + zip_codes[end]) // 2 + 1
+            low = max(low, start + len(answers))
+            middle = min(zip_code + 1, stop)
+            high = min(high, stop)
+            if low < high:
+                answers += [None] * (low - start - len(answers))
+                # Up to the zip code its first entry is the nearest, past it its last
+                if low < middle:
+                    answers += [entries[first]] * (middle - low)
+                answers += [entries[end - 1]] * (high - max(low, middle))
+            first = end
+        answers += [None] * (stop - start - len(answers))
+        return answers
+
+    @staticmethod
+    def _available_only(
+        zip_codes: list[int], entries: list[_Entry]
+    ) -> tuple[list[int], list[_Entry]]:
+        positions = [i for i, entry in enumerate(entries) if entry.available_capacity]
+        return [zip_codes[i] for i in positions], [entries[i] for i in positions]
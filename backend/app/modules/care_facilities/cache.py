@@ -0,0 +1,65 @@
+from collections.abc import Hashable, Iterator
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.modules.care_facilities.schemas import (
+    CareFacilityPayload,
+    CareFacilitySearchPayload,
+    CareType,
+    SearchMode,
+)
+
+# Search answers are tagged by blocks of this many zip codes, so that a
+# facility getting capacity only evicts the answers of zip codes near it
+ZIP_CODE_BLOCK_SIZE = 1_000
+
+
+def zip_code_block_tags(
+    care_type: CareType, search_mode: SearchMode, min_zip_code: int, max_zip_code: int
+) -> Iterator[Hashable]:
+    """Tags of the search answers of the zip codes between min and max"""
+    if search_mode == "geo":
+        # Coordinates aren't ordered like zip codes, one block for all
+        yield (care_type, search_mode)
+        return
+    for block in range(
+        min_zip_code // ZIP_CODE_BLOCK_SIZE, max_zip_code // ZIP_CODE_BLOCK_SIZE + 1
+    ):
+        yield (care_type, search_mode, block)
+
+
+def _search_tags(
+    key: tuple[CareType, int, SearchMode], payload: CareFacilitySearchPayload
+) -> Iterator[Hashable]:
+    """The ids of the match and nearest facility, and the zip code block"""
+    for facility in (payload.available, payload.nearest):
+        if facility is not None:
+            yield facility.id
+    care_type, zip_code, search_mode = key
+    yield from zip_code_block_tags(care_type, search_mode, zip_code, zip_code)
+
+
+# Facility detail responses and their JSON by slug, tagged by id
+care_facility_slug_cache: TTLCache[str, CareFacilityPayload] = TTLCache(
+    "care_facility_by_slug",
+    max_size=settings.FACILITY_CACHE_MAX_SIZE,
+    ttl_seconds=settings.FACILITY_CACHE_TTL_SECONDS,
+    tags=lambda _, payload: (payload.response.id,),
+)
+
+# Best match searches and the JSON of their match, see `_search_tags`
+care_facility_search_cache: TTLCache[
+    tuple[CareType, int, SearchMode], CareFacilitySearchPayload
+] = TTLCache(
+    "care_facility_search",
+    max_size=settings.SEARCH_CACHE_MAX_SIZE,
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+    tags=_search_tags,
+)
+
+# (latitude, longitude) of zip code centroids, which rarely ever change
+zip_code_centroid_cache: TTLCache[int, tuple[float, float]] = TTLCache(
+    "zip_code_centroid",
+    max_size=100_000,
+    ttl_seconds=24 * 60 * 60,
+)
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from collections.abc import Callable, Iterable
+from uuid import UUID
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.logger import get_logger
+from app.modules.care_facilities.repository import AsyncCareFacilityRepository
+
+logger = get_logger(__name__)
+
+
+def _default_session() -> AsyncSession:
+    return AsyncSession(async_engine, expire_on_commit=False)
+
+
+class CapacityUpdateCoalescer:
+    """
+    Collects available capacity updates in memory and writes them in batches.
+
+    Repeated updates of a facility before a flush are coalesced, the last one
+    wins. A flush writes everything pending with
+    `AsyncCareFacilityRepository.update_many`, at most one UPDATE per value,
+    which also keeps the search index and caches in sync. It does so in
+    transactions of `batch_size` facilities, as syncing after each commit runs
+    on the event loop.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = _default_session,
+        batch_size: int = settings.DERIVED_STATE_SYNC_BATCH_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._pending: dict[UUID, bool] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, updates: Iterable[tuple[UUID, bool]]) -> None:
+        with self._lock:
+            self._pending.update(updates)
+
+    async def flush(self) -> int:
+        """Writes every pending update, returns how many facilities were updated"""
+        async with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            updates = list(pending.items())
+            updated = 0
+            for start in range(0, len(updates), self.batch_size):
+                batch = updates[start : start + self.batch_size]
+                try:
+                    async with self.session_factory() as db:
+                        updated += await AsyncCareFacilityRepository(db).update_many(
+                            {
+                                facility_id: {"available_capacity": available_capacity}
+                                for facility_id, available_capacity in batch
+                            }
+                        )
+                except Exception:
+                    # Retried on the next flush, unless a newer update came in since
+                    with self._lock:
+                        self._pending = {**dict(updates[start:]), **self._pending}
+                    raise
+            return updated
+
+    async def flush_periodically(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing capacity updates: {e}", exc_info=True)
+
+
+capacity_update_coalescer = CapacityUpdateCoalescer()
@@ -0,0 +1,106 @@
+"""
+Applies the facility writes of other processes, such as the other workers of
+`fastapi run --workers 4`, to the search index and caches of this one.
+
+Writes made through the repositories sync the derived state of their own
+process right away, see `sync_derived_state`. Every process also polls for the
+facilities whose `updated_at` is at or after its previous poll, and syncs them
+the same way, its own writes included. Rows are stamped before their
+transaction commits, so each poll looks `COMMIT_LAG` further back, skipping
+the rows it already synced.
+
+Deletes leave no row to poll, so facilities are counted too. An index holding
+a different number of facilities than the database is reloaded, and a change
+of the number of facilities since the previous poll clears the caches. A
+delete and an insert between two polls cancel out in the count: without a
+loaded index, cached answers may then name the deleted facility until they
+expire.
+"""
+
+import asyncio
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.logger import get_logger
+from app.modules.care_facilities.cache import (
+    care_facility_search_cache,
+    care_facility_slug_cache,
+)
+from app.modules.care_facilities.repository import (
+    AsyncCareFacilityRepository,
+    invalidate_derived_state,
+    sync_derived_state,
+)
+from app.modules.care_facilities.search_index import care_facility_search_index
+
+logger = get_logger(__name__)
+
+# How long before its commit a write may have been stamped
+COMMIT_LAG = timedelta(seconds=5)
+
+
+def _default_session() -> AsyncSession:
+    return AsyncSession(async_engine, expire_on_commit=False)
+
+
+class FacilityChangePoller:
+    """
+    Polls for facility writes and syncs the search index and caches with them,
+    `batch_size` facilities at a time, yielding to other requests in between.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = _default_session,
+        batch_size: int = settings.DERIVED_STATE_SYNC_BATCH_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        # Earlier writes are in whatever the index loads
+        self._since = datetime.now(timezone.utc)
+        # updated_at of the facilities the previous poll read
+        self._synced: dict[UUID, datetime] = {}
+        self._count: int | None = None
+
+    async def poll(self) -> int:
+        """Syncs the writes made since the previous poll, returns how many"""
+        started_at = datetime.now(timezone.utc)
+        async with self.session_factory() as db:
+            repository = AsyncCareFacilityRepository(db)
+            facilities = await repository.get_updated_since(self._since - COMMIT_LAG)
+            count, search_index_count = await repository.count_for_search_index()
+        changed = [f for f in facilities if self._synced.get(f.id) != f.updated_at]
+        self._synced = {facility.id: facility.updated_at for facility in facilities}
+        self._since = started_at
+        for start in range(0, len(changed), self.batch_size):
+            sync_derived_state(changed[start : start + self.batch_size], deleted=False)
+            await asyncio.sleep(0)
+
+        index_count = care_facility_search_index.facility_count()
+        if index_count is not None and index_count != search_index_count:
+            logger.info(
+                f"Search index holds {index_count} facilities, the database "
+                f"{search_index_count}, reloading"
+            )
+            invalidate_derived_state()
+        elif self._count is not None and count != self._count:
+            care_facility_slug_cache.clear()
+            care_facility_search_cache.clear()
+        self._count = count
+        return len(changed)
+
+    async def poll_periodically(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Error polling facility changes: {e}", exc_info=True)
+
+
+facility_change_poller = FacilityChangePoller()
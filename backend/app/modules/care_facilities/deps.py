@@ -1,32 +1,51 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.deps import PostHogDep, SessionDep
+from app.core.analytics import Analytics
+from app.core.config import settings
+from app.core.db import replica_set
+from app.core.deps import (
+    AnalyticsDep,
+    AsyncSessionDep,
+    PrimaryReadSessionDep,
+    ReadSessionDep,
+    read_engine,
+    reads_own_writes,
+)
+from app.modules.care_facilities.cache import (
+    care_facility_search_cache,
+    care_facility_slug_cache,
+    zip_code_centroid_cache,
+)
 from app.modules.care_facilities.repository import (
-    CareFacilityContactRequestRepository,
-    CareFacilityRepository,
+    AsyncCareFacilityContactRequestRepository,
+    AsyncCareFacilityRepository,
 )
+from app.modules.care_facilities.search_index import care_facility_search_index
 from app.modules.care_facilities.services import CareFacilityService
 
 
-def get_care_facility_repository(db: SessionDep) -> CareFacilityRepository:
-    return CareFacilityRepository(db)
+def get_care_facility_repository(db: AsyncSessionDep) -> AsyncCareFacilityRepository:
+    return AsyncCareFacilityRepository(db)
 
 
 CareFacilityRepositoryDep = Annotated[
-    CareFacilityRepository, Depends(get_care_facility_repository)
+    AsyncCareFacilityRepository, Depends(get_care_facility_repository)
 ]
 
 
 def get_care_facility_contact_request_repository(
-    db: SessionDep,
-) -> CareFacilityContactRequestRepository:
-    return CareFacilityContactRequestRepository(db)
+    db: AsyncSessionDep,
+) -> AsyncCareFacilityContactRequestRepository:
+    return AsyncCareFacilityContactRequestRepository(db)
 
 
 CareFacilityContactRequestRepositoryDep = Annotated[
-    CareFacilityContactRequestRepository,
+    AsyncCareFacilityContactRequestRepository,
     Depends(get_care_facility_contact_request_repository),
 ]
 
@@ -34,11 +53,71 @@ CareFacilityContactRequestRepositoryDep = Annotated[
 def get_care_facility_service(
     repository: CareFacilityRepositoryDep,
     contact_request_repository: CareFacilityContactRequestRepositoryDep,
-    posthog: PostHogDep,
+    posthog: AnalyticsDep,
 ) -> CareFacilityService:
-    return CareFacilityService(repository, contact_request_repository, posthog)
+    return _cached_care_facility_service(
+        repository, contact_request_repository, posthog
+    )
+
+
+def _cached_care_facility_service(
+    repository: AsyncCareFacilityRepository,
+    contact_request_repository: AsyncCareFacilityContactRequestRepository | None,
+    posthog: Analytics,
+    primary_repository: AsyncCareFacilityRepository | None = None,
+) -> CareFacilityService:
+    """A service using the search index and the caches that are enabled"""
+    return CareFacilityService(
+        repository,
+        contact_request_repository,
+        posthog,
+        care_facility_search_index if settings.SEARCH_INDEX_ENABLED else None,
+        care_facility_slug_cache if settings.FACILITY_CACHE_ENABLED else None,
+        zip_code_centroid_cache,
+        care_facility_search_cache if settings.SEARCH_CACHE_ENABLED else None,
+        primary_repository,
+    )
 
 
 CareFacilityServiceDep = Annotated[
     CareFacilityService, Depends(get_care_facility_service)
 ]
+
+
+def get_read_care_facility_service(
+    request: Request,
+    db: ReadSessionDep,
+    primary_db: PrimaryReadSessionDep,
+    posthog: AnalyticsDep,
+) -> CareFacilityService:
+    """
+    A service reading from a replica, for routes that don't write. Requests
+    reading their own writes skip the search index and the caches, which may
+    lag behind the primary.
+    """
+    repository = get_care_facility_repository(db)
+    if reads_own_writes(request):
+        return CareFacilityService(repository, None, posthog)
+    if db.bind is replica_set.primary:
+        return _cached_care_facility_service(repository, None, posthog)
+    return _cached_care_facility_service(
+        repository, None, posthog, get_care_facility_repository(primary_db)
+    )
+
+
+ReadCareFacilityServiceDep = Annotated[
+    CareFacilityService, Depends(get_read_care_facility_service)
+]
+
+
+@asynccontextmanager
+async def streaming_care_facility_service(
+    request: Request, posthog: Analytics
+) -> AsyncIterator[CareFacilityService]:
+    """
+    A read service with a session of its own, on `read_engine`. Dependencies
+    with yield are closed before a StreamingResponse body is sent, so streams
+    can't use theirs. Streams don't use the search index or the caches.
+    """
+    async with AsyncSession(read_engine(request), expire_on_commit=False) as db:
+        yield CareFacilityService(get_care_facility_repository(db), None, posthog)
@@ -0,0 +1,117 @@
+import math
+from collections.abc import Iterable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LATITUDE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(
+    latitude: float, longitude: float, other_latitude: float, other_longitude: float
+) -> float:
+    """Great-circle distance between two points, in kilometres"""
+    phi1, phi2 = math.radians(latitude), math.radians(other_latitude)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(other_longitude - longitude) / 2
+    a = (
+        math.sin(half_dphi) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(
+    latitude: float, longitude: float, radius_km: float
+) -> tuple[float, float, float, float]:
+    """
+    (min latitude, max latitude, min longitude, max longitude) of a box
+    containing every point within the radius. Longitudes are not wrapped, a
+    box crossing the antimeridian extends past +-180.
+    """
+    latitude_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    min_latitude, max_latitude = latitude - latitude_delta, latitude + latitude_delta
+    if min_latitude <= -90 or max_latitude >= 90:
+        # The radius reaches a pole, every longitude is within reach
+        return max(min_latitude, -90.0), min(max_latitude, 90.0), -180.0, 180.0
+    widest_latitude = math.radians(max(abs(min_latitude), abs(max_latitude)))
+    longitude_delta = latitude_delta / math.cos(widest_latitude)
+    return (
+        min_latitude,
+        max_latitude,
+        longitude - longitude_delta,
+        longitude + longitude_delta,
+    )
+
+
+class GeoGrid(Generic[T]):
+    """
+    Grid of points bucketed into cells of `cell_degrees` square.
+
+    `within(latitude, longitude, radius_km)` only measures the points of the
+    cells overlapping the radius's bounding box, instead of every point.
+    Points are added and removed in place, touching a single cell.
+    """
+
+    def __init__(
+        self, points: Iterable[tuple[float, float, T]], cell_degrees: float = 0.25
+    ):
+        self.cell_degrees = cell_degrees
+        self._longitude_cells = math.ceil(360 / cell_degrees)
+        self._cells: dict[tuple[int, int], list[tuple[float, float, T]]] = {}
+        for point in points:
+            self._cells.setdefault(self._cell(point[0], point[1]), []).append(point)
+
+    def add(self, latitude: float, longitude: float, value: T) -> None:
+        point = (latitude, longitude, value)
+        self._cells.setdefault(self._cell(latitude, longitude), []).append(point)
+
+    def remove(self, latitude: float, longitude: float, value: T) -> None:
+        """Removes a point added with the same coordinates and value"""
+        cell = self._cell(latitude, longitude)
+        points = self._cells[cell]
+        points.remove((latitude, longitude, value))
+        if not points:
+            del self._cells[cell]
+
+    def within(
+        self, latitude: float, longitude: float, radius_km: float
+    ) -> list[tuple[float, T]]:
+        """(distance in km, value) of the points within the radius, nearest first"""
+        min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(
+            latitude, longitude, radius_km
+        )
+        min_row, min_column = self._cell(min_latitude, min_longitude, wrap=False)
+        max_row, max_column = self._cell(max_latitude, max_longitude, wrap=False)
+        # Wrapped around the antimeridian, without visiting a column twice
+        columns = sorted(
+            {
+                column % self._longitude_cells
+                for column in range(
+                    min_column,
+                    min(max_column, min_column + self._longitude_cells - 1) + 1,
+                )
+            }
+        )
+
+        matches = []
+        for row in range(min_row, max_row + 1):
+            for column in columns:
+                for point_latitude, point_longitude, value in self._cells.get(
+                    (row, column), ()
+                ):
+                    distance = haversine_km(
+                        latitude, longitude, point_latitude, point_longitude
+                    )
+                    if distance <= radius_km:
+                        matches.append((distance, value))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def _cell(
+        self, latitude: float, longitude: float, wrap: bool = True
+    ) -> tuple[int, int]:
+        row = math.floor(latitude / self.cell_degrees)
+        column = math.floor((longitude + 180) / self.cell_degrees)
+        return row, column % self._longitude_cells if wrap else column
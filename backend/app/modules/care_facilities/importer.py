@@ -0,0 +1,161 @@
+"""
+Bulk import of care facilities from CSV or JSON lines, upserting by slug.
+
+Records are streamed, validated against CareFacilityCreate and written in
+chunks of multi-row upserts, one transaction per chunk. Invalid records are
+reported and skipped. Also runnable from ./backend/:
+
+    python -m app.modules.care_facilities.importer facilities.csv
+"""
+
+import argparse
+import csv
+import itertools
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Literal
+from uuid import uuid4
+
+from pydantic import ValidationError
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.logger import get_logger
+from app.modules.care_facilities.models import CareFacility
+from app.modules.care_facilities.repository import (
+    UPSERT_INSERTS,
+    invalidate_derived_state,
+)
+from app.modules.care_facilities.schemas import (
+    CareFacilityCreate,
+    CareFacilityImportError,
+    CareFacilityImportResponse,
+)
+from app.modules.care_facilities.zip_code_centroids import (
+    backfill_facility_coordinates,
+)
+
+logger = get_logger(__name__)
+
+ImportFormat = Literal["csv", "jsonl"]
+
+# Errors beyond this many are counted but not returned
+MAX_REPORTED_ERRORS = 100
+
+
+def read_records(
+    lines: Iterable[str], file_format: ImportFormat
+) -> Iterator[dict | str]:
+    """CSV rows as dicts, JSON lines as raw JSON strings"""
+    if file_format == "csv":
+        for record in csv.DictReader(lines):
+            # Empty CSV cells are missing values, e.g. no image_url
+            yield {key: value for key, value in record.items() if value != ""}
+    else:
+        yield from (line for line in lines if line.strip())
+
+
+def format_from_filename(filename: str) -> ImportFormat:
+    suffix = Path(filename).suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported import file type: {filename}")
+
+
+def _upsert_statement(dialect_name: str):
+    if dialect_name not in UPSERT_INSERTS:
+        raise ValueError(f"Bulk import is not supported on {dialect_name}")
+    statement = UPSERT_INSERTS[dialect_name](CareFacility)
+    return statement.on_conflict_do_update(
+        index_elements=["slug"],
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in CareFacility.__table__.columns
+            if column.name not in ("id", "slug")
+        },
+    )
+
+
+def import_facilities(
+    session: Session,
+    lines: Iterable[str],
+    file_format: ImportFormat,
+    chunk_size: int = settings.IMPORT_CHUNK_SIZE,
+) -> CareFacilityImportResponse:
+    """Upserts every valid record, committing once per chunk"""
+    statement = _upsert_statement(session.get_bind().dialect.name)
+    result = CareFacilityImportResponse(imported=0, invalid=0, errors=[])
+    numbered_records = enumerate(read_records(lines, file_format), start=1)
+    try:
+        while chunk := list(itertools.islice(numbered_records, chunk_size)):
+            rows = _validate_chunk(chunk, result)
+            if rows:
+                session.exec(statement, params=rows)
+                session.commit()
+                result.imported += len(rows)
+        if result.imported:
+            backfill_facility_coordinates(session)
+    finally:
+        if result.imported:
+            invalidate_derived_state()
+    logger.info(f"Imported {result.imported} care facilities, {result.invalid} invalid")
+    return result
+
+
+def _validate_chunk(
+    chunk: list[tuple[int, dict | str]], result: CareFacilityImportResponse
+) -> list[dict]:
+    updated_at = datetime.now(timezone.utc)
+    # Keyed by slug, the last record wins. Upserting a slug twice in one
+    # statement is an error on Postgres
+    rows: dict[str, dict] = {}
+    for row_number, record in chunk:
+        try:
+            if isinstance(record, str):
+                facility = CareFacilityCreate.model_validate_json(record)
+            else:
+                facility = CareFacilityCreate.model_validate(record)
+        except ValidationError as e:
+            result.invalid += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(
+                    CareFacilityImportError(row=row_number, error=_describe(e))
+                )
+            continue
+        rows[facility.slug] = {
+            **facility.model_dump(),
+            "id": uuid4(),
+            "updated_at": updated_at,
+        }
+    return list(rows.values())
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import care facilities")
+    parser.add_argument("path", type=Path, help="A .csv or .jsonl file")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with args.path.open(newline="", encoding="utf-8") as file, Session(engine) as db:
+        result = import_facilities(
+            db,
+            file,
+            args.format or format_from_filename(args.path.name),
+            args.chunk_size,
+        )
+    print(result.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Node(Generic[T]):
+    center: int
+    # Intervals containing `center`, sorted by start ascending and by end descending
+    by_start: list[tuple[int, T]] = field(default_factory=list)
+    by_end: list[tuple[int, T]] = field(default_factory=list)
+    left: "_Node[T] | None" = None
+    right: "_Node[T] | None" = None
+
+
+class IntervalTree(Generic[T]):
+    """
+    Static centered interval tree over closed integer intervals.
+
+    `stab(point)` returns the values of every interval containing the point in
+    O(log n + k), where k is the number of matches.
+    """
+
+    def __init__(self, intervals: Iterable[tuple[int, int, T]]):
+        self._root = self._build([i for i in intervals if i[0] <= i[1]])
+
+    def stab(self, point: int) -> list[T]:
+        matches: list[T] = []
+        node = self._root
+        while node is not None:
+            if point < node.center:
+                for start, value in node.by_start:
+                    if start > point:
+                        break
+                    matches.append(value)
+                node = node.left
+            elif point > node.center:
+                for end, value in node.by_end:
+                    if end < point:
+                        break
+                    matches.append(value)
+                node = node.right
+            else:
+                matches.extend(value for _, value in node.by_start)
+                break
+        return matches
+
+    @classmethod
+    def _build(cls, intervals: list[tuple[int, int, T]]) -> _Node[T] | None:
+        if not intervals:
+            return None
+        endpoints = sorted(
+            point for start, end, _ in intervals for point in (start, end)
+        )
+        node: _Node[T] = _Node(center=endpoints[len(endpoints) // 2])
+        left, right, overlapping = [], [], []
+        for interval in intervals:
+            start, end, _ = interval
+            if end < node.center:
+                left.append(interval)
+            elif start > node.center:
+                right.append(interval)
+            else:
+                overlapping.append(interval)
+        node.by_start = sorted(
+            ((start, value) for start, _, value in overlapping), key=lambda i: i[0]
+        )
+        node.by_end = sorted(
+            ((end, value) for _, end, value in overlapping),
+            key=lambda i: i[0],
+            reverse=True,
+        )
+        node.left = cls._build(left)
+        node.right = cls._build(right)
+        return node
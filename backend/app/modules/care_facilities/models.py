@@ -1,23 +1,56 @@
+from datetime import datetime, timezone
+from typing import get_args
 from uuid import UUID, uuid4
 
+from sqlalchemy import text
 from sqlmodel import Field, Index, Relationship, SQLModel, String
 
 from .schemas import CareType
 
 
-class CareFacility(SQLModel, table=True):
-    __table_args__ = (
+def _care_type_search_indexes(care_type: CareType) -> tuple[Index, Index]:
+    """
+    Partial index of the facilities of a care type, for zip code searches,
+    in its Postgres and SQLite variants. It covers the columns the search
+    reads, so searches are index-only scans. Postgres keys it on zip_code and
+    includes the others. SQLite has no INCLUDE, and only covers when the WHERE
+    column is indexed, so every column is part of the key there.
+    """
+    name = f"ix_care_facility_{care_type}_zip_code"
+    column = f"has_{care_type}"
+    return (
         Index(
-            "ix_care_facility_has_stationary_care_zip_code",
-            "has_stationary_care",
+            name,
             "zip_code",
+            postgresql_include=["available_capacity", "id", "name", "address", "slug"],
+            postgresql_where=text(column),
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            name,
+            *("zip_code", "available_capacity", "id", "name", "address", "slug"),
+            column,
+            sqlite_where=text(f"{column} = 1"),
+        ).ddl_if(dialect="sqlite"),
+    )
+
+
+class CareFacility(SQLModel, table=True):
+    __table_args__ = (
+        *(
+            index
+            for care_type in get_args(CareType)
+            for index in _care_type_search_indexes(care_type)
         ),
-        Index("ix_care_facility_has_day_care_zip_code", "has_day_care", "zip_code"),
+        # Geographic searches: a latitude and longitude bounding box
+        Index("ix_care_facility_latitude_longitude", "latitude", "longitude"),
+        # Service area searches: from_zip_code <= zip_code <= to_zip_code
         Index(
-            "ix_care_facility_has_ambulatory_care_zip_code",
-            "has_ambulatory_care",
-            "zip_code",
+            "ix_care_facility_from_zip_code_to_zip_code",
+            "from_zip_code",
+            "to_zip_code",
         ),
+        # Polls for the writes of other processes: updated_at >= since
+        Index("ix_care_facility_updated_at", "updated_at"),
     )
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     name: str = Field(max_length=100)
@@ -31,12 +64,27 @@ class CareFacility(SQLModel, table=True):
     available_capacity: bool = Field(default=False)
     slug: str = Field(unique=True)
     image_url: str | None = Field(default=None)
+    # Defaults to the centroid of the zip code, and reset to it when the zip
+    # code changes, see repository.py and zip_code_centroids.py
+    latitude: float | None = Field(default=None, ge=-90, le=90)
+    longitude: float | None = Field(default=None, ge=-180, le=180)
+    # Set by BaseRepository.update, sent as Last-Modified of facility pages and
+    # polled by changes.py
+    updated_at: datetime | None = Field(
+        default_factory=lambda: datetime.now(timezone.utc)
+    )
 
     contact_requests: list["CareFacilityContactRequest"] = Relationship(
         back_populates="care_facility"
     )
 
 
+class ZipCodeCentroid(SQLModel, table=True):
+    zip_code: int = Field(primary_key=True, ge=0, le=99999)
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+
+
 class CareFacilityContactRequest(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     care_facility_id: UUID = Field(foreign_key="carefacility.id", nullable=True)
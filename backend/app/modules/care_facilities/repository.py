@@ -1,9 +1,30 @@
+from collections.abc import AsyncIterator, Hashable, Iterable, Iterator, Sequence
+from datetime import datetime
+from typing import Any, TypeVar
+from uuid import UUID
+
+from pydantic import BaseModel
+from sqlalchemy import Integer, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.sql import func
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.base_repository import BaseRepository
+from app.core.base_repository import AsyncBaseRepository, BaseRepository, _batches
+from app.core.config import settings
 from app.core.logger import get_logger
-from app.modules.care_facilities.models import CareFacility, CareFacilityContactRequest
+from app.core.metrics import instrument_class
+from app.modules.care_facilities.cache import (
+    care_facility_search_cache,
+    care_facility_slug_cache,
+    zip_code_block_tags,
+)
+from app.modules.care_facilities.geo import bounding_box, haversine_km
+from app.modules.care_facilities.models import (
+    CareFacility,
+    CareFacilityContactRequest,
+    ZipCodeCentroid,
+)
 from app.modules.care_facilities.schemas import (
     CareFacilityContactRequestCreate,
     CareFacilityContactRequestResponse,
@@ -11,13 +32,316 @@ from app.modules.care_facilities.schemas import (
     CareFacilityCreate,
     CareFacilityResponse,
     CareFacilitySearchResponse,
+    CareFacilitySearchRow,
     CareFacilityUpdate,
     CareType,
 )
+from app.modules.care_facilities.search_index import (
+    CARE_TYPE_FLAGS,
+    care_facility_search_index,
+)
 
 logger = get_logger(__name__)
 
+TSchema = TypeVar("TSchema", bound=BaseModel)
+
+
+# Statements are shared by the sync and async repositories
+
+
+def _by_slug_statement(slug: str):
+    return select(CareFacility).where(CareFacility.slug == slug)
+
+
+CARE_TYPE_COLUMNS = {
+    "stationary_care": CareFacility.has_stationary_care,
+    "day_care": CareFacility.has_day_care,
+    "ambulatory_care": CareFacility.has_ambulatory_care,
+}
+
+
+def _search_statement(zip_code):
+    return select(
+        CareFacility.id,
+        CareFacility.name,
+        CareFacility.address,
+        CareFacility.zip_code,
+        CareFacility.available_capacity,
+        CareFacility.slug,
+        func.abs(CareFacility.zip_code - zip_code).label("distance"),
+    )
+
+
+# The search statements below are built once per care type, with parameters
+# bound at execution, so calls skip building the statement and its cache key
+_ZIP_CODE = bindparam("zip_code", type_=Integer)
+_MIN_ZIP_CODE = bindparam("min_zip_code", type_=Integer)
+_MAX_ZIP_CODE = bindparam("max_zip_code", type_=Integer)
+_K = bindparam("k", type_=Integer)
+
+
+def _by_care_type_and_zip_code_statement(care_type: CareType):
+    """Params: zip_code, min_zip_code and max_zip_code"""
+    return (
+        _search_statement(_ZIP_CODE)
+        .where(
+            CARE_TYPE_COLUMNS[care_type] == True,  # noqa: E712
+            CareFacility.zip_code.between(_MIN_ZIP_CODE, _MAX_ZIP_CODE),
+        )
+        .order_by("distance")
+    )
+
+
+def _by_care_type_serving_zip_code_statement(care_type: CareType):
+    """Params: zip_code"""
+    return (
+        _search_statement(_ZIP_CODE)
+        .where(
+            CARE_TYPE_COLUMNS[care_type] == True,  # noqa: E712
+            CareFacility.from_zip_code <= _ZIP_CODE,
+            CareFacility.to_zip_code >= _ZIP_CODE,
+        )
+        .order_by("distance", CareFacility.zip_code)
+    )
+
+
+def _range_params(zip_code: int, zip_code_range: int) -> dict[str, int]:
+    return {
+        "zip_code": zip_code,
+        "min_zip_code": zip_code - zip_code_range,
+        "max_zip_code": zip_code + zip_code_range,
+    }
+
+
+def _by_care_type_within_radius_statement(
+    care_type: CareType,
+    zip_code: int,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+):
+    min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(
+        latitude, longitude, radius_km
+    )
+    return (
+        _search_statement(zip_code)
+        .add_columns(CareFacility.latitude, CareFacility.longitude)
+        .where(
+            CARE_TYPE_COLUMNS[care_type] == True,  # noqa: E712
+            CareFacility.latitude.between(min_latitude, max_latitude),
+            CareFacility.longitude.between(min_longitude, max_longitude),
+        )
+    )
+
+
+def _within_radius(
+    facilities, latitude: float, longitude: float, radius_km: float
+) -> list[CareFacilitySearchRow]:
+    """Search rows of a bounding box that are within the radius, nearest first"""
+    matches = []
+    for facility in facilities:
+        distance_km = haversine_km(latitude, longitude, facility[7], facility[8])
+        if distance_km <= radius_km:
+            matches.append((distance_km, facility))
+    matches.sort(key=lambda match: (match[0], match[1][3], match[1][0]))
+    return [
+        CareFacilitySearchRow(*facility[:7], distance_km=distance_km)
+        for distance_km, facility in matches
+    ]
+
+
+def _zip_code_centroid_statement(zip_code: int):
+    return select(ZipCodeCentroid.latitude, ZipCodeCentroid.longitude).where(
+        ZipCodeCentroid.zip_code == zip_code
+    )
+
+
+def _centroids_statement(zip_codes: Sequence[int]):
+    return select(
+        ZipCodeCentroid.zip_code, ZipCodeCentroid.latitude, ZipCodeCentroid.longitude
+    ).where(ZipCodeCentroid.zip_code.in_(zip_codes))
+
+
+def _needs_centroid(values: dict[str, Any], creating: bool) -> bool:
+    """
+    New facilities without coordinates get those of their zip code centroid,
+    and so do updates that set the zip code but not the coordinates, so that
+    a moved facility isn't matched at its old place
+    """
+    if values.get("zip_code") is None:
+        return False
+    if creating:
+        return values.get("latitude") is None or values.get("longitude") is None
+    return "latitude" not in values and "longitude" not in values
+
+
+def _centroid_zip_codes(values: Iterable[dict[str, Any]], creating: bool) -> list[int]:
+    return sorted({v["zip_code"] for v in values if _needs_centroid(v, creating)})
+
+
+def _centroid_coordinates(
+    values: dict[str, Any], creating: bool, centroids: dict[int, tuple[float, float]]
+) -> dict[str, float | None]:
+    """Coordinates to write along with the values, None for unknown zip codes"""
+    if not _needs_centroid(values, creating):
+        return {}
+    latitude, longitude = centroids.get(values["zip_code"], (None, None))
+    return {"latitude": latitude, "longitude": longitude}
+
+
+def _schema_values(data: Sequence[TSchema], creating: bool) -> list[dict[str, Any]]:
+    return [item.model_dump(exclude_unset=not creating) for item in data]
+
+
+def _with_centroids(
+    data: Sequence[TSchema],
+    values: list[dict[str, Any]],
+    creating: bool,
+    centroids: dict[int, tuple[float, float]],
+) -> list[TSchema]:
+    return [
+        item.model_copy(update=_centroid_coordinates(item_values, creating, centroids))
+        for item, item_values in zip(data, values, strict=True)
+    ]
+
+
+def _changes_with_centroids(
+    changes: dict[UUID, dict[str, Any]], centroids: dict[int, tuple[float, float]]
+) -> dict[UUID, dict[str, Any]]:
+    return {
+        id: {**values, **_centroid_coordinates(values, False, centroids)}
+        for id, values in changes.items()
+    }
+
+
+def _top_statement(statement, k):
+    """Keeps the k best rows of a search: available capacity first, then nearest"""
+    return (
+        statement.order_by(None)
+        .order_by(
+            CareFacility.available_capacity.desc(),
+            "distance",
+            CareFacility.zip_code,
+            CareFacility.id,
+        )
+        .limit(k)
+    )
+
+
+BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS = {
+    care_type: _by_care_type_and_zip_code_statement(care_type)
+    for care_type in CARE_TYPE_COLUMNS
+}
+BY_CARE_TYPE_SERVING_ZIP_CODE_STATEMENTS = {
+    care_type: _by_care_type_serving_zip_code_statement(care_type)
+    for care_type in CARE_TYPE_COLUMNS
+}
+# Params: those of the search, and k
+TOP_BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS = {
+    care_type: _top_statement(statement, _K)
+    for care_type, statement in BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS.items()
+}
+TOP_BY_CARE_TYPE_SERVING_ZIP_CODE_STATEMENTS = {
+    care_type: _top_statement(statement, _K)
+    for care_type, statement in BY_CARE_TYPE_SERVING_ZIP_CODE_STATEMENTS.items()
+}
+
+
+def _to_search_rows(facilities) -> list[CareFacilitySearchRow]:
+    return [CareFacilitySearchRow(*facility) for facility in facilities]
+
+
+def _offers_care():
+    return (
+        (CareFacility.has_stationary_care == True)  # noqa: E712
+        | (CareFacility.has_day_care == True)  # noqa: E712
+        | (CareFacility.has_ambulatory_care == True)  # noqa: E712
+    )
+
+
+def _search_index_statement():
+    return select(CareFacility).where(_offers_care())
+
+
+def _list_filters(
+    care_type: CareType | None, min_zip_code: int | None, max_zip_code: int | None
+):
+    filters = []
+    if care_type is not None:
+        filters.append(CARE_TYPE_COLUMNS[care_type] == True)  # noqa: E712
+    if min_zip_code is not None:
+        filters.append(CareFacility.zip_code >= min_zip_code)
+    if max_zip_code is not None:
+        filters.append(CareFacility.zip_code <= max_zip_code)
+    return filters
+
 
+# INSERT ... ON CONFLICT of the dialects bulk upserts support, see importer.py
+# and zip_code_centroids.py
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def invalidate_derived_state() -> None:
+    """
+    Drops the search index and caches after a bulk write, cheaper than syncing
+    every row. The index reloads on the next search
+    """
+    care_facility_search_index.invalidate()
+    care_facility_slug_cache.clear()
+    care_facility_search_cache.clear()
+
+
+def sync_derived_state(
+    db_data: list[CareFacility],
+    deleted: bool,
+    columns: frozenset[str] | None = None,
+) -> None:
+    """
+    Keeps the search index and caches in line with committed writes, of this
+    process or picked up from others by `FacilityChangePoller`. Without
+    `columns`, any column may have changed
+    """
+    if deleted:
+        care_facility_search_index.remove_many(facility.id for facility in db_data)
+    else:
+        care_facility_search_index.upsert_many(db_data)
+    # By id, the slug may have changed
+    care_facility_slug_cache.invalidate_tagged(facility.id for facility in db_data)
+    capacity_only = columns is not None and columns <= {"available_capacity"}
+    care_facility_search_cache.invalidate_tagged(
+        tag
+        for facility in db_data
+        for tag in _change_tags(facility, deleted, capacity_only)
+    )
+
+
+def _change_tags(
+    facility: CareFacility, deleted: bool, capacity_only: bool
+) -> Iterator[Hashable]:
+    """
+    Search cache tags of the answers a write can affect: those the facility is
+    the match or the nearest facility of, and unless it was deleted or only lost
+    capacity, those of every zip code it may now be the match or nearest of
+    """
+    yield facility.id
+    if deleted or (capacity_only and not facility.available_capacity):
+        return
+    for care_type, flag in CARE_TYPE_FLAGS.items():
+        if not getattr(facility, flag):
+            continue
+        yield from zip_code_block_tags(
+            care_type,
+            "distance",
+            facility.zip_code - settings.ZIP_CODE_RANGE_SEARCH,
+            facility.zip_code + settings.ZIP_CODE_RANGE_SEARCH,
+        )
+        yield from zip_code_block_tags(
+            care_type, "service_area", facility.from_zip_code, facility.to_zip_code
+        )
+        yield from zip_code_block_tags(care_type, "geo", 0, 0)
+
+
+@instrument_class("repository")
 class CareFacilityRepository(
     BaseRepository[
         CareFacility, CareFacilityCreate, CareFacilityUpdate, CareFacilitySearchResponse
@@ -27,58 +351,203 @@ class CareFacilityRepository(
         super().__init__(CareFacility, db)
 
     async def get_one_by_slug(self, slug: str) -> CareFacilitySearchResponse | None:
-        statement = select(CareFacility).where(CareFacility.slug == slug)
-        return self.db.exec(statement).first()
+        return self.db.exec(_by_slug_statement(slug)).first()
 
     async def get_by_care_type_and_zip_code(
         self, care_type: CareType, zip_code: int, zip_code_range: int
-    ) -> list[CareFacilitySearchResponse]:
-        care_type_columns = {
-            "stationary_care": CareFacility.has_stationary_care,
-            "day_care": CareFacility.has_day_care,
-            "ambulatory_care": CareFacility.has_ambulatory_care,
-        }
-        statement = (
-            select(
-                CareFacility.id,
-                CareFacility.name,
-                CareFacility.address,
-                CareFacility.zip_code,
-                CareFacility.available_capacity,
-                CareFacility.slug,
-                func.abs(CareFacility.zip_code - zip_code).label("distance"),
-            )
-            .where(
-                care_type_columns[care_type] == True,  # noqa: E712
-                CareFacility.zip_code.between(
-                    zip_code - zip_code_range, zip_code + zip_code_range
-                ),
-            )
-            .order_by("distance")
+    ) -> list[CareFacilitySearchRow]:
+        statement = BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS[care_type]
+        try:
+            facilities = self.db.exec(
+                statement, params=_range_params(zip_code, zip_code_range)
+            ).all()
+            return _to_search_rows(facilities)
+        except Exception as e:
+            logger.error(f"Error getting facilities: {e}", exc_info=True)
+            raise e
+
+    async def get_by_slug(self, slug: str) -> CareFacilityResponse | None:
+        return self.db.exec(_by_slug_statement(slug)).first()
+
+
+@instrument_class("repository")
+class AsyncCareFacilityRepository(
+    AsyncBaseRepository[
+        CareFacility, CareFacilityCreate, CareFacilityUpdate, CareFacilitySearchResponse
+    ]
+):
+    after_commit_needs_rows = True
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(CareFacility, db)
+
+    def _after_commit(
+        self,
+        db_data: CareFacility,
+        deleted: bool = False,
+        columns: frozenset[str] | None = None,
+    ) -> None:
+        sync_derived_state([db_data], deleted, columns)
+
+    def _after_commit_many(
+        self,
+        db_data: list[CareFacility],
+        deleted: bool = False,
+        columns: frozenset[str] | None = None,
+    ) -> None:
+        sync_derived_state(db_data, deleted, columns)
+
+    async def create(self, data: CareFacilityCreate) -> CareFacility:
+        [data] = await self._with_centroids([data], creating=True)
+        return await super().create(data)
+
+    async def create_many(
+        self, data: Sequence[CareFacilityCreate]
+    ) -> list[CareFacility]:
+        data = await self._with_centroids(data, creating=True)
+        return await super().create_many(data)
+
+    async def update(self, id: UUID, data: CareFacilityUpdate) -> CareFacility:
+        [data] = await self._with_centroids([data], creating=False)
+        return await super().update(id, data)
+
+    async def update_many(
+        self, changes: dict[UUID, dict[str, Any]], returning: bool = False
+    ) -> list[CareFacility] | int:
+        zip_codes = _centroid_zip_codes(changes.values(), False)
+        centroids = await self._get_centroids(zip_codes)
+        return await super().update_many(
+            _changes_with_centroids(changes, centroids), returning
         )
+
+    async def _with_centroids(
+        self, data: Sequence[TSchema], creating: bool
+    ) -> list[TSchema]:
+        values = _schema_values(data, creating)
+        centroids = await self._get_centroids(_centroid_zip_codes(values, creating))
+        return _with_centroids(data, values, creating, centroids)
+
+    async def _get_centroids(
+        self, zip_codes: list[int]
+    ) -> dict[int, tuple[float, float]]:
+        """(latitude, longitude) of the known zip codes among zip_codes"""
+        centroids = {}
+        for batch in _batches(zip_codes):
+            result = await self.db.exec(_centroids_statement(batch))
+            for zip_code, latitude, longitude in result:
+                centroids[zip_code] = (latitude, longitude)
+        return centroids
+
+    async def get_one_by_slug(self, slug: str) -> CareFacilitySearchResponse | None:
+        return (await self.db.exec(_by_slug_statement(slug))).first()
+
+    async def get_by_care_type_and_zip_code(
+        self, care_type: CareType, zip_code: int, zip_code_range: int
+    ) -> list[CareFacilitySearchRow]:
+        statement = BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS[care_type]
         try:
-            facilities = self.db.exec(statement).all()
-            return [
-                CareFacilitySearchResponse(
-                    id=facility[0],
-                    name=facility[1],
-                    address=facility[2],
-                    zip_code=facility[3],
-                    available_capacity=facility[4],
-                    slug=facility[5],
-                    distance=facility[6],
+            facilities = (
+                await self.db.exec(
+                    statement, params=_range_params(zip_code, zip_code_range)
                 )
-                for facility in facilities
-            ]
+            ).all()
+            return _to_search_rows(facilities)
         except Exception as e:
             logger.error(f"Error getting facilities: {e}", exc_info=True)
             raise e
 
+    async def get_by_care_type_serving_zip_code(
+        self, care_type: CareType, zip_code: int
+    ) -> list[CareFacilitySearchRow]:
+        """Facilities whose service area (from/to zip code) contains the zip code"""
+        statement = BY_CARE_TYPE_SERVING_ZIP_CODE_STATEMENTS[care_type]
+        return _to_search_rows(
+            (await self.db.exec(statement, params={"zip_code": zip_code})).all()
+        )
+
+    async def get_by_care_type_within_radius(
+        self,
+        care_type: CareType,
+        zip_code: int,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+    ) -> list[CareFacilitySearchRow]:
+        """Facilities within the radius of the coordinates, nearest first"""
+        statement = _by_care_type_within_radius_statement(
+            care_type, zip_code, latitude, longitude, radius_km
+        )
+        facilities = (await self.db.exec(statement)).all()
+        return _within_radius(facilities, latitude, longitude, radius_km)
+
+    async def get_zip_code_centroid(self, zip_code: int) -> tuple[float, float] | None:
+        """(latitude, longitude) of the zip code centroid, if known"""
+        centroid = (await self.db.exec(_zip_code_centroid_statement(zip_code))).first()
+        return tuple(centroid) if centroid else None
+
+    async def get_top_by_care_type_and_zip_code(
+        self, care_type: CareType, zip_code: int, zip_code_range: int, k: int
+    ) -> list[CareFacilitySearchRow]:
+        """The k best facilities in the zip code range, see `_top_statement`"""
+        statement = TOP_BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS[care_type]
+        params = {**_range_params(zip_code, zip_code_range), "k": k}
+        return _to_search_rows((await self.db.exec(statement, params=params)).all())
+
+    async def get_top_by_care_type_serving_zip_code(
+        self, care_type: CareType, zip_code: int, k: int
+    ) -> list[CareFacilitySearchRow]:
+        """The k best facilities serving the zip code, see `_top_statement`"""
+        statement = TOP_BY_CARE_TYPE_SERVING_ZIP_CODE_STATEMENTS[care_type]
+        params = {"zip_code": zip_code, "k": k}
+        return _to_search_rows((await self.db.exec(statement, params=params)).all())
+
     async def get_by_slug(self, slug: str) -> CareFacilityResponse | None:
-        statement = select(CareFacility).where(CareFacility.slug == slug)
-        return self.db.exec(statement).first()
+        return (await self.db.exec(_by_slug_statement(slug))).first()
+
+    async def get_all_for_search_index(self) -> list[CareFacility]:
+        """Gets every facility that offers at least one care type"""
+        return (await self.db.exec(_search_index_statement())).all()
 
+    async def get_updated_since(self, since: datetime) -> list[CareFacility]:
+        """Gets the facilities created or updated at or after `since`"""
+        return (
+            await self.db.exec(
+                select(CareFacility).where(CareFacility.updated_at >= since)
+            )
+        ).all()
+
+    async def count_for_search_index(self) -> tuple[int, int]:
+        """Counts every facility, and those that offer at least one care type"""
+        return (
+            await self.db.exec(
+                select(
+                    func.count(),
+                    func.count().filter(_offers_care()),
+                ).select_from(CareFacility)
+            )
+        ).one()
+
+    async def get_page_filtered(
+        self,
+        care_type: CareType | None = None,
+        min_zip_code: int | None = None,
+        max_zip_code: int | None = None,
+        after: UUID | None = None,
+        limit: int = 100,
+    ) -> list[CareFacility]:
+        filters = _list_filters(care_type, min_zip_code, max_zip_code)
+        return await self.get_page(after, limit, filters)
 
+    def stream_filtered(
+        self,
+        care_type: CareType | None = None,
+        min_zip_code: int | None = None,
+        max_zip_code: int | None = None,
+    ) -> AsyncIterator[CareFacility]:
+        return self.stream(_list_filters(care_type, min_zip_code, max_zip_code))
+
+
+@instrument_class("repository")
 class CareFacilityContactRequestRepository(
     BaseRepository[
         CareFacilityContactRequest,
@@ -89,3 +558,16 @@ class CareFacilityContactRequestRepository(
 ):
     def __init__(self, db: Session):
         super().__init__(CareFacilityContactRequest, db)
+
+
+@instrument_class("repository")
+class AsyncCareFacilityContactRequestRepository(
+    AsyncBaseRepository[
+        CareFacilityContactRequest,
+        CareFacilityContactRequestCreate,
+        CareFacilityContactRequestUpdate,
+        CareFacilityContactRequestResponse,
+    ]
+):
+    def __init__(self, db: AsyncSession):
+        super().__init__(CareFacilityContactRequest, db)
@@ -1,17 +1,84 @@
-from fastapi import APIRouter, BackgroundTasks
-from fastapi.responses import JSONResponse
+from collections.abc import AsyncIterator
+from typing import Literal
+from uuid import UUID
 
-from app.modules.care_facilities.deps import CareFacilityServiceDep
+from fastapi import APIRouter, BackgroundTasks, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from app.core.analytics import Analytics
+from app.core.config import settings
+from app.core.deps import READ_YOUR_WRITES_HEADER, AnalyticsDep
+from app.core.http_cache import conditional_response
+from app.core.metrics import span
+from app.modules.care_facilities.deps import (
+    CareFacilityServiceDep,
+    ReadCareFacilityServiceDep,
+    streaming_care_facility_service,
+)
 from app.modules.care_facilities.schemas import (
     CareFacilityContactRequestCreate,
     CareFacilityContactRequestResponse,
+    CareFacilityPage,
     CareFacilityResponse,
     CareFacilitySearchResponse,
+    CareFacilitySearchResults,
     CareType,
+    SearchMode,
+    search_rows_to_json,
 )
 
 care_facilities_router = APIRouter(prefix="/care-facilities", tags=["care-facilities"])
 
+# Lines are sent in chunks, not one by one
+NDJSON_LINES_PER_CHUNK = 100
+
+
+async def _ndjson_chunks(
+    request: Request,
+    posthog: Analytics,
+    care_type: CareType | None,
+    min_zip_code: int | None,
+    max_zip_code: int | None,
+) -> AsyncIterator[str]:
+    async with streaming_care_facility_service(request, posthog) as service:
+        lines = []
+        async for facility in service.stream_facilities(
+            care_type, min_zip_code, max_zip_code
+        ):
+            lines.append(facility.model_dump_json())
+            if len(lines) == NDJSON_LINES_PER_CHUNK:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+
+@care_facilities_router.get("")
+async def list_care_facilities(
+    request: Request,
+    service: ReadCareFacilityServiceDep,
+    posthog: AnalyticsDep,
+    care_type: CareType | None = None,
+    min_zip_code: int | None = None,
+    max_zip_code: int | None = None,
+    cursor: UUID | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    format: Literal["json", "ndjson"] = "json",
+) -> CareFacilityPage:
+    """
+    Facilities ordered by id, a page at a time; pass `next_cursor` as `cursor`
+    to get the next page. `format=ndjson` streams every matching facility as
+    JSON lines instead, ignoring `cursor` and `limit`.
+    """
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson_chunks(request, posthog, care_type, min_zip_code, max_zip_code),
+            media_type="application/x-ndjson",
+        )
+    return await service.list_facilities(
+        care_type, min_zip_code, max_zip_code, cursor, limit
+    )
+
 
 @care_facilities_router.post("/contact-request")
 async def create_care_facility_contact_request(
@@ -23,22 +90,60 @@ async def create_care_facility_contact_request(
 
 @care_facilities_router.get("/nearest")
 async def get_nearest_care_facilities(
+    request: Request,
     care_type: CareType,
     background_tasks: BackgroundTasks,
-    service: CareFacilityServiceDep,
+    service: ReadCareFacilityServiceDep,
     zip_code: int | None = None,
+    search_mode: SearchMode | None = None,
 ) -> CareFacilitySearchResponse | None:
-    best_match = await service.find_best_match(zip_code, care_type, background_tasks)
+    best_match = await service.find_best_match_payload(
+        zip_code, care_type, background_tasks, search_mode
+    )
     if not best_match:
-        return JSONResponse(status_code=404, content=None)
-    return best_match
+        return ORJSONResponse(status_code=404, content=None)
+    return conditional_response(
+        request,
+        best_match.body,
+        max_age=settings.SEARCH_CACHE_CONTROL_MAX_AGE,
+        compressed=best_match.compressed,
+        vary=[READ_YOUR_WRITES_HEADER],
+    )
+
+
+@care_facilities_router.get("/nearest/top")
+async def get_top_care_facilities(
+    request: Request,
+    care_type: CareType,
+    service: ReadCareFacilityServiceDep,
+    zip_code: int | None = None,
+    k: int = Query(5, ge=1, le=50),
+    search_mode: SearchMode | None = None,
+) -> CareFacilitySearchResults:
+    facilities = await service.find_top_matches(zip_code, care_type, k, search_mode)
+    # Straight to JSON, without a response model per facility
+    with span("serialization", "serialization"):
+        body = search_rows_to_json(facilities)
+    return conditional_response(
+        request,
+        body,
+        max_age=settings.SEARCH_CACHE_CONTROL_MAX_AGE,
+        vary=[READ_YOUR_WRITES_HEADER],
+    )
 
 
 @care_facilities_router.get("/{slug}")
 async def get_care_facility_by_slug(
-    slug: str, service: CareFacilityServiceDep
+    request: Request, slug: str, service: ReadCareFacilityServiceDep
 ) -> CareFacilityResponse | None:
-    facility = await service.get_by_slug(slug)
+    facility = await service.get_payload_by_slug(slug)
     if not facility:
-        return JSONResponse(status_code=404, content=None)
-    return facility
+        return ORJSONResponse(status_code=404, content=None)
+    return conditional_response(
+        request,
+        facility.body,
+        max_age=settings.FACILITY_CACHE_CONTROL_MAX_AGE,
+        last_modified=facility.response.updated_at,
+        compressed=facility.compressed,
+        vary=[READ_YOUR_WRITES_HEADER],
+    )
@@ -1,9 +1,15 @@
-from typing import Literal
+from datetime import datetime
+from typing import Literal, NamedTuple
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, RootModel
+from pydantic_core import to_json
 
 CareType = Literal["stationary_care", "day_care", "ambulatory_care"]
+# distance: facilities within ZIP_CODE_RANGE_SEARCH of the zip code
+# service_area: facilities whose from/to zip code range contains the zip code
+# geo: facilities within SEARCH_RADIUS_KM of the zip code's centroid
+SearchMode = Literal["distance", "service_area", "geo"]
 
 
 class CareFacility(BaseModel):
@@ -20,6 +26,9 @@ class CareFacility(BaseModel):
     available_capacity: bool
     slug: str
     image_url: str | None = None
+    # Missing coordinates are filled in from the zip code centroid
+    latitude: float | None = Field(default=None, ge=-90, le=90)
+    longitude: float | None = Field(default=None, ge=-180, le=180)
 
 
 class CareFacilityCreate(CareFacility):
@@ -36,15 +45,25 @@ class CareFacilityUpdate(CareFacility):
     to_zip_code: int | None = None
     zip_code: int | None = None
     available_capacity: bool | None = None
+    slug: str | None = None
     image_url: str | None = None
+    latitude: float | None = Field(default=None, ge=-90, le=90)
+    longitude: float | None = Field(default=None, ge=-180, le=180)
 
 
 class CareFacilityResponse(CareFacility):
     id: UUID
+    updated_at: datetime | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class CareFacilityPage(BaseModel):
+    items: list[CareFacilityResponse]
+    # Pass as `cursor` to get the next page, None on the last page
+    next_cursor: UUID | None
+
+
 class CareFacilitySearchResponse(BaseModel):
     id: UUID
     name: str
@@ -52,11 +71,89 @@ class CareFacilitySearchResponse(BaseModel):
     zip_code: int
     available_capacity: bool
     slug: str
+    # Zip code difference, and in geo searches the great-circle distance
     distance: int
+    distance_km: float | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class CareFacilitySearchResults(RootModel[list[CareFacilitySearchResponse]]):
+    pass
+
+
+class CareFacilitySearchRow(NamedTuple):
+    """
+    Search result used internally, much cheaper to build than a
+    CareFacilitySearchResponse. Only returned results are converted.
+    """
+
+    id: UUID
+    name: str
+    address: str
+    zip_code: int
+    available_capacity: bool
+    slug: str
+    distance: int
+    distance_km: float | None = None
+
+
+def search_rows_to_json(rows: list[CareFacilitySearchRow]) -> bytes:
+    """The JSON of CareFacilitySearchResults, without a model per row"""
+    return to_json([row._asdict() for row in rows])
+
+
+class CareFacilityPayload(NamedTuple):
+    """
+    A facility detail response, with its JSON serialized once and compressed
+    in each supported content encoding, unless it's too small to bother
+    """
+
+    response: CareFacilityResponse
+    body: bytes
+    compressed: dict[str, bytes]
+
+
+class CareFacilitySearchPayload(NamedTuple):
+    """
+    Outcome of a best match search, with the JSON of the match serialized (and
+    compressed, see CareFacilityPayload) once. The nearest facility is kept for
+    analytics, `body` is None without a match.
+    """
+
+    available: CareFacilitySearchRow | None
+    nearest: CareFacilitySearchRow | None
+    body: bytes | None
+    compressed: dict[str, bytes]
+
+
+class CareFacilityCapacityUpdate(BaseModel):
+    facility_id: UUID
+    available_capacity: bool
+
+
+class CareFacilityCapacityUpdateRequest(BaseModel):
+    updates: list[CareFacilityCapacityUpdate]
+
+
+class CareFacilityCapacityUpdateResponse(BaseModel):
+    accepted: int
+    # Updates not yet written, across all requests
+    pending: int
+
+
+class CareFacilityImportError(BaseModel):
+    row: int
+    error: str
+
+
+class CareFacilityImportResponse(BaseModel):
+    imported: int
+    invalid: int
+    # Only the first invalid rows are reported
+    errors: list[CareFacilityImportError]
+
+
 class CareFacilityContactRequestBase(BaseModel):
     name: str
     email: str
@@ -0,0 +1,554 @@
+import asyncio
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+from uuid import UUID
+
+from app.core.config import settings
+from app.modules.care_facilities.best_match_table import ZIP_CODE_COUNT, BestMatchTable
+from app.modules.care_facilities.geo import GeoGrid
+from app.modules.care_facilities.interval_tree import IntervalTree
+from app.modules.care_facilities.models import CareFacility
+from app.modules.care_facilities.schemas import CareFacilitySearchRow, CareType
+from app.modules.care_facilities.vectorized import VectorizedScorer, require_numpy
+
+CARE_TYPE_FLAGS: dict[CareType, str] = {
+    "stationary_care": "has_stationary_care",
+    "day_care": "has_day_care",
+    "ambulatory_care": "has_ambulatory_care",
+}
+
+
+class SearchIndexEntry(NamedTuple):
+    # zip_code first so entries sort by zip code
+    zip_code: int
+    id: UUID
+    name: str
+    address: str
+    available_capacity: bool
+    slug: str
+    from_zip_code: int
+    to_zip_code: int
+    latitude: float | None
+    longitude: float | None
+
+
+class CareFacilitySearchIndex:
+    """
+    Process-local index of facilities per care type, sorted by zip code.
+
+    Answers the same question as
+    `AsyncCareFacilityRepository.get_by_care_type_and_zip_code` without a
+    database round trip: the zip code range is found with bisect and the matches
+    are merged outwards from the requested zip code, so they come out
+    nearest-first.
+
+    The index is loaded lazily from the database. Writes made through
+    `AsyncCareFacilityRepository` in this process are applied right away, those
+    of other processes when `FacilityChangePoller` picks them up. Reloads after
+    `ttl_seconds` catch anything it missed.
+    Loads are serialized by `load_lock`, and writes made while one reads the
+    database are replayed over what it read, see `start_load`.
+
+    With a `best_match_table`, the per-zip-code best match answers are kept
+    up to date alongside the sorted arrays.
+
+    Service area searches use an interval tree per care type over the
+    facilities' from/to zip codes, built on the first search. Geographic
+    searches likewise use a grid per care type over the facilities'
+    coordinates. Both hold facility ids, so writes that keep the service area
+    and coordinates, such as of available capacity, leave them as they are.
+    A tree is rebuilt after a service area of its care type changes, grids
+    are updated in place.
+
+    When `vectorized`, best match and top-k searches are scored by a
+    `VectorizedScorer` (needs numpy), built on the first search after a
+    change other than of available capacity.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int | None = None,
+        best_match_table: BestMatchTable | None = None,
+        vectorized: bool = False,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.best_match_table = best_match_table
+        if vectorized:
+            require_numpy()
+        self.vectorized = vectorized
+        self._lock = threading.RLock()
+        self.load_lock = asyncio.Lock()
+        # (id, entry and care types, None once removed) of the writes made
+        # since `start_load`
+        self._pending_writes: (
+            list[tuple[UUID, tuple[SearchIndexEntry, list[CareType]] | None]] | None
+        ) = None
+        self._zip_codes: dict[CareType, list[int]] = {}
+        self._entries: dict[CareType, list[SearchIndexEntry]] = {}
+        self._care_types_by_id: dict[UUID, tuple[SearchIndexEntry, list[CareType]]] = {}
+        self._service_areas: dict[CareType, IntervalTree[UUID]] = {}
+        self._geo_grids: dict[CareType, GeoGrid[UUID]] = {}
+        self._scorer: VectorizedScorer | None = None
+        self._loaded_at: float | None = None
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if self.ttl_seconds is None:
+            return False
+        return time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def invalidate(self) -> None:
+        """Forces a reload on the next search"""
+        with self._lock:
+            self._loaded_at = None
+
+    def facility_count(self) -> int | None:
+        """The number of facilities offering any care type, None if not loaded"""
+        with self._lock:
+            if self._loaded_at is None:
+                return None
+            return sum(
+                1 for _, care_types in self._care_types_by_id.values() if care_types
+            )
+
+    def start_load(self) -> None:
+        """
+        Records the writes made from now on, to replay them in the next `load`.
+        Call it before reading the facilities to load, so that writes
+        committed after the read aren't lost.
+        """
+        with self._lock:
+            self._pending_writes = []
+
+    def abort_load(self) -> None:
+        """Stops recording writes, when reading the facilities to load failed"""
+        with self._lock:
+            self._pending_writes = None
+
+    def load(self, facilities: Iterable[CareFacility]) -> None:
+        """
+        Replaces the index contents with the given facilities, then replays the
+        writes recorded since `start_load`. Only the swap holds the lock, so
+        searches go on while the new contents are built, e.g. in a thread.
+        """
+        entries: dict[CareType, list[SearchIndexEntry]] = {
+            care_type: [] for care_type in CARE_TYPE_FLAGS
+        }
+        care_types_by_id = {}
+        for facility in facilities:
+            entry = self._to_entry(facility)
+            care_types = self._care_types(facility)
+            for care_type in care_types:
+                entries[care_type].append(entry)
+            care_types_by_id[entry.id] = (entry, care_types)
+
+        for care_type_entries in entries.values():
+            care_type_entries.sort()
+        zip_codes = {
+            care_type: [entry.zip_code for entry in care_type_entries]
+            for care_type, care_type_entries in entries.items()
+        }
+
+        best_match_table = None
+        if self.best_match_table:
+            best_match_table = BestMatchTable(self.best_match_table.zip_code_range)
+            for care_type in CARE_TYPE_FLAGS:
+                best_match_table.rebuild(
+                    care_type, zip_codes[care_type], entries[care_type]
+                )
+
+        with self._lock:
+            if best_match_table:
+                self.best_match_table = best_match_table
+            self._entries = entries
+            self._zip_codes = zip_codes
+            self._care_types_by_id = care_types_by_id
+            self._service_areas = {}
+            self._geo_grids = {}
+            self._scorer = None
+            self._loaded_at = time.monotonic()
+            pending_writes, self._pending_writes = self._pending_writes, None
+            for facility_id, change in pending_writes or ():
+                if change is None:
+                    self._remove_entries([facility_id])
+                else:
+                    self._upsert_entries([change])
+
+    def upsert(self, facility: CareFacility) -> None:
+        """Adds or replaces a single facility, if the index is loaded"""
+        self.upsert_many([facility])
+
+    def upsert_many(self, facilities: Iterable[CareFacility]) -> None:
+        """Adds or replaces facilities, if the index is loaded"""
+        with self._lock:
+            upserts = [
+                (self._to_entry(facility), self._care_types(facility))
+                for facility in facilities
+            ]
+            if self._pending_writes is not None:
+                self._pending_writes.extend(
+                    (entry.id, (entry, care_types)) for entry, care_types in upserts
+                )
+            if self._loaded_at is not None:
+                self._upsert_entries(upserts)
+
+    def _upsert_entries(
+        self, upserts: list[tuple[SearchIndexEntry, list[CareType]]]
+    ) -> None:
+        """Must be called while holding the lock"""
+        changes = []
+        for entry, care_types in upserts:
+            previous = self._remove(entry.id)
+            for care_type in care_types:
+                position = bisect_right(self._entries[care_type], entry)
+                self._entries[care_type].insert(position, entry)
+                self._zip_codes[care_type].insert(position, entry.zip_code)
+            self._care_types_by_id[entry.id] = (entry, care_types)
+            self._update_spatial_indexes(previous, (entry, care_types))
+            changes.extend((previous, (entry, care_types)))
+            if self._scorer and not self._scorer.update_available(entry, care_types):
+                self._scorer = None
+        self._refresh_best_match_table(changes)
+
+    def remove(self, facility_id: UUID) -> None:
+        """Removes a single facility, if the index is loaded"""
+        self.remove_many([facility_id])
+
+    def remove_many(self, facility_ids: Iterable[UUID]) -> None:
+        """Removes facilities, if the index is loaded"""
+        with self._lock:
+            facility_ids = list(facility_ids)
+            if self._pending_writes is not None:
+                self._pending_writes.extend((id, None) for id in facility_ids)
+            if self._loaded_at is not None:
+                self._remove_entries(facility_ids)
+
+    def _remove_entries(self, facility_ids: list[UUID]) -> None:
+        """Must be called while holding the lock"""
+        self._scorer = None
+        changes = []
+        for facility_id in facility_ids:
+            previous = self._remove(facility_id)
+            self._update_spatial_indexes(previous, None)
+            changes.append(previous)
+        self._refresh_best_match_table(changes)
+
+    def best_match(
+        self, care_type: CareType, zip_code: int
+    ) -> tuple[CareFacilitySearchRow | None, CareFacilitySearchRow | None]:
+        """
+        The (nearest available, nearest) facilities from the best match table.
+        Requires a loaded index with a best match table, see `has_best_match`.
+        """
+        # Without the lock: loads swap in a new table, and refreshes swap in
+        # new answers, so a lookup only ever sees complete ones
+        available, nearest = self.best_match_table.lookup(care_type, zip_code)
+        return (
+            self._to_row(available, zip_code) if available else None,
+            self._to_row(nearest, zip_code) if nearest else None,
+        )
+
+    def best_match_vectorized(
+        self, care_type: CareType, zip_code: int, zip_code_range: int | None
+    ) -> tuple[CareFacilitySearchRow | None, CareFacilitySearchRow | None]:
+        """
+        The (nearest available, nearest) facilities within the zip code range,
+        or serving the zip code without a range. Requires `vectorized`.
+        """
+        with self._lock:
+            available, nearest = self._vectorized_scorer().best_match(
+                care_type, zip_code, zip_code_range
+            )
+        return (
+            self._to_row(available, zip_code) if available else None,
+            self._to_row(nearest, zip_code) if nearest else None,
+        )
+
+    def top_vectorized(
+        self, care_type: CareType, zip_code: int, k: int, zip_code_range: int | None
+    ) -> list[CareFacilitySearchRow]:
+        """Same as `search_top` or, without a range, `search_service_area_top`"""
+        with self._lock:
+            entries = self._vectorized_scorer().top(
+                care_type, zip_code, k, zip_code_range
+            )
+        return [self._to_row(entry, zip_code) for entry in entries]
+
+    def has_best_match(self, zip_code: int) -> bool:
+        return self.best_match_table is not None and 0 <= zip_code < ZIP_CODE_COUNT
+
+    def search(
+        self, care_type: CareType, zip_code: int, zip_code_range: int
+    ) -> list[CareFacilitySearchRow]:
+        """Facilities of the care type within the zip code range, nearest first"""
+        with self._lock:
+            return [
+                self._to_row(entry, zip_code)
+                for entry in self._nearest_first(care_type, zip_code, zip_code_range)
+            ]
+
+    def search_top(
+        self, care_type: CareType, zip_code: int, zip_code_range: int, k: int
+    ) -> list[CareFacilitySearchRow]:
+        """
+        The k best facilities within the zip code range: available capacity
+        first, then nearest, then the lower zip code and id. Walks outwards
+        from the zip code and stops once k available facilities are found.
+        """
+        available: list[SearchIndexEntry] = []
+        unavailable: list[SearchIndexEntry] = []
+        with self._lock:
+            for entry in self._nearest_first(care_type, zip_code, zip_code_range):
+                distance = abs(entry.zip_code - zip_code)
+                # Entries as near as the last one kept may still win on id
+                if len(available) >= k and distance > abs(
+                    available[-1].zip_code - zip_code
+                ):
+                    break
+                if entry.available_capacity:
+                    available.append(entry)
+                elif len(unavailable) < k or distance == abs(
+                    unavailable[-1].zip_code - zip_code
+                ):
+                    unavailable.append(entry)
+        top = heapq.nsmallest(
+            k,
+            available + unavailable,
+            key=lambda entry: (
+                not entry.available_capacity,
+                abs(entry.zip_code - zip_code),
+                entry,
+            ),
+        )
+        return [self._to_row(entry, zip_code) for entry in top]
+
+    def search_service_area(
+        self, care_type: CareType, zip_code: int
+    ) -> list[CareFacilitySearchRow]:
+        """Facilities of the care type whose service area contains the zip code"""
+        with self._lock:
+            entries = self._service_area_entries(care_type, zip_code)
+        # Nearest first, the lower zip code first on equal distance
+        entries.sort(key=lambda entry: (abs(entry.zip_code - zip_code), entry))
+        return [self._to_row(entry, zip_code) for entry in entries]
+
+    def search_service_area_top(
+        self, care_type: CareType, zip_code: int, k: int
+    ) -> list[CareFacilitySearchRow]:
+        """The k best facilities serving the zip code, ranked as in `search_top`"""
+        with self._lock:
+            entries = self._service_area_entries(care_type, zip_code)
+        # A partial sort, only the winners are ordered and converted
+        top = heapq.nsmallest(
+            k,
+            entries,
+            key=lambda entry: (
+                not entry.available_capacity,
+                abs(entry.zip_code - zip_code),
+                entry,
+            ),
+        )
+        return [self._to_row(entry, zip_code) for entry in top]
+
+    def search_geo(
+        self,
+        care_type: CareType,
+        zip_code: int,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+    ) -> list[CareFacilitySearchRow]:
+        """Facilities of the care type within the radius of the coordinates"""
+        with self._lock:
+            if care_type not in self._geo_grids:
+                self._geo_grids[care_type] = GeoGrid(
+                    (entry.latitude, entry.longitude, entry.id)
+                    for entry in self._entries.get(care_type, [])
+                    if self._has_coordinates(entry)
+                )
+            matches = [
+                (distance_km, self._care_types_by_id[facility_id][0])
+                for distance_km, facility_id in self._geo_grids[care_type].within(
+                    latitude, longitude, radius_km
+                )
+            ]
+        # Nearest first, then the lower zip code, as in the repository
+        matches.sort(key=lambda match: (match[0], match[1].zip_code, match[1].id))
+        return [
+            self._to_row(entry, zip_code, distance_km) for distance_km, entry in matches
+        ]
+
+    def _vectorized_scorer(self) -> VectorizedScorer:
+        """Must be called while holding the lock"""
+        if self._scorer is None:
+            self._scorer = VectorizedScorer(self._entries)
+        return self._scorer
+
+    def _service_area_entries(
+        self, care_type: CareType, zip_code: int
+    ) -> list[SearchIndexEntry]:
+        """
+        Entries whose service area contains the zip code.
+        Must be called while holding the lock.
+        """
+        if care_type not in self._service_areas:
+            self._service_areas[care_type] = IntervalTree(
+                (entry.from_zip_code, entry.to_zip_code, entry.id)
+                for entry in self._entries.get(care_type, [])
+            )
+        return [
+            self._care_types_by_id[facility_id][0]
+            for facility_id in self._service_areas[care_type].stab(zip_code)
+        ]
+
+    def _update_spatial_indexes(
+        self,
+        previous: tuple[SearchIndexEntry, list[CareType]] | None,
+        current: tuple[SearchIndexEntry, list[CareType]] | None,
+    ) -> None:
+        """
+        Applies a changed facility to the built service area trees and geo
+        grids. Trees of care types whose service areas changed are dropped,
+        to be rebuilt on their next search. Must be called while holding the
+        lock.
+        """
+        old_entry, old_care_types = previous or (None, [])
+        new_entry, new_care_types = current or (None, [])
+        for care_type in {*old_care_types, *new_care_types}:
+            old = old_entry if care_type in old_care_types else None
+            new = new_entry if care_type in new_care_types else None
+            if care_type in self._service_areas and (
+                old is None
+                or new is None
+                or (old.from_zip_code, old.to_zip_code)
+                != (new.from_zip_code, new.to_zip_code)
+            ):
+                del self._service_areas[care_type]
+            grid = self._geo_grids.get(care_type)
+            if grid is None or (
+                old is not None
+                and new is not None
+                and (old.latitude, old.longitude) == (new.latitude, new.longitude)
+            ):
+                continue
+            if old is not None and self._has_coordinates(old):
+                grid.remove(old.latitude, old.longitude, old.id)
+            if new is not None and self._has_coordinates(new):
+                grid.add(new.latitude, new.longitude, new.id)
+
+    def _nearest_first(
+        self, care_type: CareType, zip_code: int, zip_code_range: int
+    ) -> Iterator[SearchIndexEntry]:
+        """
+        Entries within the zip code range, merged outwards from the zip code.
+        Must be consumed while holding the lock.
+        """
+        zip_codes = self._zip_codes.get(care_type, [])
+        entries = self._entries.get(care_type, [])
+        low = bisect_left(zip_codes, zip_code - zip_code_range)
+        high = bisect_right(zip_codes, zip_code + zip_code_range)
+        pivot = bisect_left(zip_codes, zip_code, low, high)
+
+        left, right = pivot - 1, pivot
+        while left >= low or right < high:
+            # On equal distance the lower zip code goes first
+            if right >= high or (
+                left >= low
+                and zip_code - zip_codes[left] <= zip_codes[right] - zip_code
+            ):
+                yield entries[left]
+                left -= 1
+            else:
+                yield entries[right]
+                right += 1
+
+    def _remove(
+        self, facility_id: UUID
+    ) -> tuple[SearchIndexEntry, list[CareType]] | None:
+        previous = self._care_types_by_id.pop(facility_id, None)
+        if not previous:
+            return None
+        entry, care_types = previous
+        for care_type in care_types:
+            position = bisect_left(self._entries[care_type], entry)
+            del self._entries[care_type][position]
+            del self._zip_codes[care_type][position]
+        return previous
+
+    def _refresh_best_match_table(
+        self, changes: list[tuple[SearchIndexEntry, list[CareType]] | None]
+    ) -> None:
+        """Refreshes the answers affected by removed or added entries, at once"""
+        if not self.best_match_table:
+            return
+        changed_zip_codes: dict[CareType, set[int]] = {}
+        for change in changes:
+            if change:
+                entry, care_types = change
+                for care_type in care_types:
+                    changed_zip_codes.setdefault(care_type, set()).add(entry.zip_code)
+        for care_type, zip_codes in changed_zip_codes.items():
+            self.best_match_table.refresh(
+                care_type,
+                self._zip_codes[care_type],
+                self._entries[care_type],
+                zip_codes,
+            )
+
+    @staticmethod
+    def _to_row(
+        entry: SearchIndexEntry, zip_code: int, distance_km: float | None = None
+    ) -> CareFacilitySearchRow:
+        return CareFacilitySearchRow(
+            id=entry.id,
+            name=entry.name,
+            address=entry.address,
+            zip_code=entry.zip_code,
+            available_capacity=entry.available_capacity,
+            slug=entry.slug,
+            distance=abs(entry.zip_code - zip_code),
+            distance_km=distance_km,
+        )
+
+    @staticmethod
+    def _to_entry(facility: CareFacility) -> SearchIndexEntry:
+        return SearchIndexEntry(
+            zip_code=facility.zip_code,
+            id=facility.id,
+            name=facility.name,
+            address=facility.address,
+            available_capacity=facility.available_capacity,
+            slug=facility.slug,
+            from_zip_code=facility.from_zip_code,
+            to_zip_code=facility.to_zip_code,
+            latitude=facility.latitude,
+            longitude=facility.longitude,
+        )
+
+    @staticmethod
+    def _has_coordinates(entry: SearchIndexEntry) -> bool:
+        return entry.latitude is not None and entry.longitude is not None
+
+    @staticmethod
+    def _care_types(facility: CareFacility) -> list[CareType]:
+        return [
+            care_type
+            for care_type, flag in CARE_TYPE_FLAGS.items()
+            if getattr(facility, flag)
+        ]
+
+
+care_facility_search_index = CareFacilitySearchIndex(
+    ttl_seconds=settings.SEARCH_INDEX_TTL_SECONDS,
+    best_match_table=(
+        BestMatchTable(settings.ZIP_CODE_RANGE_SEARCH)
+        if settings.SEARCH_BEST_MATCH_TABLE_ENABLED
+        else None
+    ),
+    vectorized=settings.SEARCH_VECTORIZED,
+)
@@ -1,31 +1,68 @@
+import asyncio
+from collections.abc import AsyncIterator
+from uuid import UUID
+
 from fastapi import BackgroundTasks
+from pydantic import BaseModel
 
-from app.core.analytics import PosthogAnalytics
+from app.core.analytics import Analytics
+from app.core.cache import TTLCache
+from app.core.compression import compress_variants
 from app.core.config import settings
+from app.core.metrics import instrument, instrument_class, span
 from app.modules.care_facilities.repository import (
-    CareFacilityContactRequestRepository,
-    CareFacilityRepository,
+    AsyncCareFacilityContactRequestRepository,
+    AsyncCareFacilityRepository,
 )
 from app.modules.care_facilities.schemas import (
     CareFacilityContactRequestCreate,
     CareFacilityContactRequestResponse,
+    CareFacilityPage,
+    CareFacilityPayload,
     CareFacilityResponse,
+    CareFacilitySearchPayload,
     CareFacilitySearchResponse,
+    CareFacilitySearchRow,
     CareType,
+    SearchMode,
 )
+from app.modules.care_facilities.search_index import CareFacilitySearchIndex
 
 
+@instrument_class("service")
 class CareFacilityService:
     def __init__(
         self,
-        repository: CareFacilityRepository,
-        contact_request_repository: CareFacilityContactRequestRepository,
-        posthog: PosthogAnalytics,
+        repository: AsyncCareFacilityRepository,
+        contact_request_repository: AsyncCareFacilityContactRequestRepository,
+        posthog: Analytics,
+        search_index: CareFacilitySearchIndex | None = None,
+        slug_cache: TTLCache[str, CareFacilityPayload] | None = None,
+        zip_code_centroid_cache: TTLCache[int, tuple[float, float]] | None = None,
+        search_cache: TTLCache[
+            tuple[CareType, int, SearchMode], CareFacilitySearchPayload
+        ]
+        | None = None,
+        primary_repository: AsyncCareFacilityRepository | None = None,
     ):
+        """
+        `primary_repository` is needed when `repository` reads a replica, which
+        may lag behind the primary: the search index and the caches are shared
+        by every request, so they are only ever filled from the primary.
+        """
         self.repository = repository
         self.contact_request_repository = contact_request_repository
         self.posthog = posthog
+        self.search_index = search_index
+        self.slug_cache = slug_cache
+        self.zip_code_centroid_cache = zip_code_centroid_cache
+        self.search_cache = search_cache
+        self.reads_primary = primary_repository is None
+        self.primary_repository = (
+            repository if self.reads_primary else primary_repository
+        )
 
+    @instrument("background")
     async def __analytics_search_facilities_not_found(
         self, zip_code: int, care_type: CareType
     ):
@@ -36,8 +73,10 @@ class CareFacilityService:
                 "zip_code": zip_code,
                 "care_type": care_type,
             },
+            aggregate=True,
         )
 
+    @instrument("background")
     async def __analytics_search_facilities_not_available(
         self, zip_code: int, care_type: CareType, facility_id: int, facility_name: str
     ):
@@ -50,8 +89,10 @@ class CareFacilityService:
                 "facility_id": facility_id,
                 "facility_name": facility_name,
             },
+            aggregate=True,
         )
 
+    @instrument("background")
     async def __analytics_search_facilities_found(
         self, zip_code: int, care_type: CareType, facility_id: int, facility_name: str
     ):
@@ -71,13 +112,66 @@ class CareFacilityService:
         zip_code: int | None,
         care_type: CareType,
         background_tasks: BackgroundTasks,
+        search_mode: SearchMode | None = None,
     ) -> CareFacilitySearchResponse | None:
         if not zip_code:
             return None
-        facilities = await self.repository.get_by_care_type_and_zip_code(
-            care_type, zip_code, settings.ZIP_CODE_RANGE_SEARCH
+        available_facility, nearest_facility = await self._find_available_and_nearest(
+            care_type, zip_code, search_mode or settings.SEARCH_MODE
+        )
+        self._track_search(
+            zip_code, care_type, background_tasks, available_facility, nearest_facility
         )
-        available_facility = next((f for f in facilities if f.available_capacity), None)
+        if available_facility:
+            return CareFacilitySearchResponse.model_validate(available_facility)
+        return None
+
+    async def find_best_match_payload(
+        self,
+        zip_code: int | None,
+        care_type: CareType,
+        background_tasks: BackgroundTasks,
+        search_mode: SearchMode | None = None,
+    ) -> CareFacilitySearchPayload | None:
+        """
+        `find_best_match` serialized to JSON. Cache hits skip the search, the
+        model validation and the encoding, but are tracked like any search.
+        """
+        if not zip_code:
+            return None
+        search_mode = search_mode or settings.SEARCH_MODE
+        key = (care_type, zip_code, search_mode)
+        cached = self.search_cache.get(key) if self.search_cache is not None else None
+        if cached is None:
+            (
+                available_facility,
+                nearest_facility,
+            ) = await self._find_available_and_nearest(care_type, zip_code, search_mode)
+            body, compressed = None, {}
+            if available_facility:
+                response = CareFacilitySearchResponse.model_validate(available_facility)
+                body, compressed = self._serialize(response)
+            cached = CareFacilitySearchPayload(
+                available_facility, nearest_facility, body, compressed
+            )
+            # Index searches read the primary, other ones may read a replica
+            if self.search_cache is not None and (
+                self.reads_primary or self.search_index is not None
+            ):
+                self.search_cache.set(key, cached)
+        self._track_search(
+            zip_code, care_type, background_tasks, cached.available, cached.nearest
+        )
+        return cached if cached.body is not None else None
+
+    def _track_search(
+        self,
+        zip_code: int,
+        care_type: CareType,
+        background_tasks: BackgroundTasks,
+        available_facility: CareFacilitySearchRow | None,
+        nearest_facility: CareFacilitySearchRow | None,
+    ) -> None:
         if available_facility:
             background_tasks.add_task(
                 self.__analytics_search_facilities_found,
@@ -86,29 +180,223 @@ class CareFacilityService:
                 available_facility.id,
                 available_facility.name,
             )
-            return available_facility
-        elif facilities:  # No available capacity, but facilities found
+        elif nearest_facility:  # No available capacity, but facilities found
             background_tasks.add_task(
                 self.__analytics_search_facilities_not_available,
                 zip_code,
                 care_type,
-                # Nearest facility
-                facilities[0].id,
-                facilities[0].name,
+                nearest_facility.id,
+                nearest_facility.name,
             )
-            return None
         else:  # No facilities found
             background_tasks.add_task(
                 self.__analytics_search_facilities_not_found,
                 zip_code,
                 care_type,
             )
-            return None
+
+    async def find_top_matches(
+        self,
+        zip_code: int | None,
+        care_type: CareType,
+        k: int,
+        search_mode: SearchMode | None = None,
+    ) -> list[CareFacilitySearchRow]:
+        """The k best facilities: available capacity first, then nearest"""
+        if not zip_code:
+            return []
+        search_mode = search_mode or settings.SEARCH_MODE
+        if search_mode == "geo":
+            facilities = await self._search_facilities_geo(care_type, zip_code)
+            # Stable, so nearest first among available and unavailable ones
+            facilities.sort(key=lambda f: not f.available_capacity)
+            del facilities[k:]
+        elif self.search_index is not None and self.search_index.vectorized:
+            await self._ensure_search_index_loaded()
+            facilities = self.search_index.top_vectorized(
+                care_type, zip_code, k, self._zip_code_range(search_mode)
+            )
+        elif search_mode == "service_area":
+            if self.search_index is None:
+                facilities = (
+                    await self.repository.get_top_by_care_type_serving_zip_code(
+                        care_type, zip_code, k
+                    )
+                )
+            else:
+                await self._ensure_search_index_loaded()
+                facilities = self.search_index.search_service_area_top(
+                    care_type, zip_code, k
+                )
+        elif self.search_index is None:
+            facilities = await self.repository.get_top_by_care_type_and_zip_code(
+                care_type, zip_code, settings.ZIP_CODE_RANGE_SEARCH, k
+            )
+        else:
+            await self._ensure_search_index_loaded()
+            facilities = self.search_index.search_top(
+                care_type, zip_code, settings.ZIP_CODE_RANGE_SEARCH, k
+            )
+        return facilities
+
+    async def _find_available_and_nearest(
+        self, care_type: CareType, zip_code: int, search_mode: SearchMode
+    ) -> tuple[CareFacilitySearchRow | None, CareFacilitySearchRow | None]:
+        """The nearest facility with available capacity, and the nearest overall"""
+        if search_mode == "geo":
+            facilities = await self._search_facilities_geo(care_type, zip_code)
+        elif (
+            search_mode == "distance"
+            and self.search_index is not None
+            and self.search_index.has_best_match(zip_code)
+        ):
+            await self._ensure_search_index_loaded()
+            return self.search_index.best_match(care_type, zip_code)
+        elif self.search_index is not None and self.search_index.vectorized:
+            await self._ensure_search_index_loaded()
+            return self.search_index.best_match_vectorized(
+                care_type, zip_code, self._zip_code_range(search_mode)
+            )
+        elif search_mode == "service_area":
+            facilities = await self._search_facilities_serving(care_type, zip_code)
+        else:
+            facilities = await self._search_facilities(care_type, zip_code)
+        available_facility = next((f for f in facilities if f.available_capacity), None)
+        return available_facility, facilities[0] if facilities else None
+
+    @staticmethod
+    def _zip_code_range(search_mode: SearchMode) -> int | None:
+        """The zip code range of a search mode, None for service area searches"""
+        return None if search_mode == "service_area" else settings.ZIP_CODE_RANGE_SEARCH
+
+    async def _ensure_search_index_loaded(self) -> None:
+        if not self.search_index.is_stale():
+            return
+        # One load at a time, the requests waiting for it then use its result
+        async with self.search_index.load_lock:
+            if not self.search_index.is_stale():
+                return
+            self.search_index.start_load()
+            try:
+                facilities = await self.primary_repository.get_all_for_search_index()
+            except Exception:
+                self.search_index.abort_load()
+                raise
+            # Sorting and building the tables would block the event loop
+            await asyncio.to_thread(self.search_index.load, facilities)
+
+    async def _search_facilities(
+        self, care_type: CareType, zip_code: int
+    ) -> list[CareFacilitySearchRow]:
+        """Nearest-first facilities, from the search index when one is configured"""
+        if self.search_index is None:
+            return await self.repository.get_by_care_type_and_zip_code(
+                care_type, zip_code, settings.ZIP_CODE_RANGE_SEARCH
+            )
+        await self._ensure_search_index_loaded()
+        return self.search_index.search(
+            care_type, zip_code, settings.ZIP_CODE_RANGE_SEARCH
+        )
+
+    async def _search_facilities_serving(
+        self, care_type: CareType, zip_code: int
+    ) -> list[CareFacilitySearchRow]:
+        """Nearest-first facilities whose service area contains the zip code"""
+        if self.search_index is None:
+            return await self.repository.get_by_care_type_serving_zip_code(
+                care_type, zip_code
+            )
+        await self._ensure_search_index_loaded()
+        return self.search_index.search_service_area(care_type, zip_code)
+
+    async def _search_facilities_geo(
+        self, care_type: CareType, zip_code: int
+    ) -> list[CareFacilitySearchRow]:
+        """Nearest-first facilities within SEARCH_RADIUS_KM of the zip code"""
+        coordinates = await self._zip_code_coordinates(zip_code)
+        if coordinates is None:
+            return []
+        latitude, longitude = coordinates
+        if self.search_index is None:
+            return await self.repository.get_by_care_type_within_radius(
+                care_type, zip_code, latitude, longitude, settings.SEARCH_RADIUS_KM
+            )
+        await self._ensure_search_index_loaded()
+        return self.search_index.search_geo(
+            care_type, zip_code, latitude, longitude, settings.SEARCH_RADIUS_KM
+        )
+
+    async def _zip_code_coordinates(self, zip_code: int) -> tuple[float, float] | None:
+        if self.zip_code_centroid_cache is None:
+            return await self.repository.get_zip_code_centroid(zip_code)
+        coordinates = self.zip_code_centroid_cache.get(zip_code)
+        if coordinates is None:
+            coordinates = await self.primary_repository.get_zip_code_centroid(zip_code)
+            if coordinates is not None:
+                self.zip_code_centroid_cache.set(zip_code, coordinates)
+        return coordinates
 
     async def get_by_slug(self, slug: str) -> CareFacilityResponse | None:
-        return await self.repository.get_by_slug(slug)
+        payload = await self.get_payload_by_slug(slug)
+        return payload.response if payload else None
+
+    async def get_payload_by_slug(self, slug: str) -> CareFacilityPayload | None:
+        """The facility and its JSON, cache hits skip validation and encoding"""
+        if self.slug_cache is None:
+            facility = await self.repository.get_by_slug(slug)
+        else:
+            cached = self.slug_cache.get(slug)
+            if cached is not None:
+                return cached
+            facility = await self.primary_repository.get_by_slug(slug)
+        if not facility:
+            return None
+        response = CareFacilityResponse.model_validate(facility)
+        payload = CareFacilityPayload(response, *self._serialize(response))
+        if self.slug_cache is not None:
+            self.slug_cache.set(slug, payload)
+        return payload
+
+    @staticmethod
+    def _serialize(response: BaseModel) -> tuple[bytes, dict[str, bytes]]:
+        """The JSON of a response to cache, and its precompressed variants"""
+        with span("serialization", "serialization"):
+            body = response.model_dump_json().encode()
+        if not settings.COMPRESSION_ENABLED:
+            return body, {}
+        with span("serialization", "compression"):
+            return body, compress_variants(body, settings.COMPRESSION_MINIMUM_SIZE)
+
+    async def list_facilities(
+        self,
+        care_type: CareType | None = None,
+        min_zip_code: int | None = None,
+        max_zip_code: int | None = None,
+        cursor: UUID | None = None,
+        limit: int = 100,
+    ) -> CareFacilityPage:
+        # One extra row tells whether there is a next page
+        facilities = await self.repository.get_page_filtered(
+            care_type, min_zip_code, max_zip_code, cursor, limit + 1
+        )
+        items = [CareFacilityResponse.model_validate(f) for f in facilities[:limit]]
+        has_next = len(facilities) > limit
+        return CareFacilityPage(
+            items=items, next_cursor=items[-1].id if has_next else None
+        )
+
+    async def stream_facilities(
+        self,
+        care_type: CareType | None = None,
+        min_zip_code: int | None = None,
+        max_zip_code: int | None = None,
+    ) -> AsyncIterator[CareFacilityResponse]:
+        async for facility in self.repository.stream_filtered(
+            care_type, min_zip_code, max_zip_code
+        ):
+            yield CareFacilityResponse.model_validate(facility)
 
     async def create_contact_request(
         self, request: CareFacilityContactRequestCreate
     ) -> CareFacilityContactRequestResponse:
-        return self.contact_request_repository.create(request)
+        return await self.contact_request_repository.create(request)
@@ -0,0 +1,167 @@
+from collections.abc import Iterable, Mapping
+from typing import Any, Protocol
+from uuid import UUID
+
+from app.modules.care_facilities.best_match_table import ZIP_CODE_COUNT
+from app.modules.care_facilities.schemas import CareType
+
+try:
+    import numpy as np
+except ImportError:  # Optional, see the numpy extra in pyproject.toml
+    np = None
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("Vectorized scoring needs numpy, install the numpy extra")
+
+
+class _Entry(Protocol):
+    zip_code: int
+    id: UUID
+    available_capacity: bool
+    from_zip_code: int
+    to_zip_code: int
+
+
+class _Columns:
+    """The facilities of one care type, sorted by (zip code, id)"""
+
+    def __init__(self, entries: list[_Entry]):
+        self.entries = entries
+        self.rows = {entry.id: row for row, entry in enumerate(entries)}
+        self.zip_codes = np.fromiter(
+            (e.zip_code for e in entries), dtype=np.int64, count=len(entries)
+        )
+        self.available = np.fromiter(
+            (e.available_capacity for e in entries), dtype=bool, count=len(entries)
+        )
+        # Rows by service area start, so the rows starting at or before a zip
+        # code are a prefix and only their ends need to be compared
+        from_zip_codes = np.fromiter(
+            (e.from_zip_code for e in entries), dtype=np.int64, count=len(entries)
+        )
+        to_zip_codes = np.fromiter(
+            (e.to_zip_code for e in entries), dtype=np.int64, count=len(entries)
+        )
+        self.rows_by_from_zip_code = np.argsort(from_zip_codes, kind="stable")
+        self.sorted_from_zip_codes = from_zip_codes[self.rows_by_from_zip_code]
+        self.to_zip_codes_by_from_zip_code = to_zip_codes[self.rows_by_from_zip_code]
+
+
+class VectorizedScorer:
+    """
+    Facility attributes in NumPy column arrays, per care type.
+
+    Searches are scored in one vectorized pass, and only the winning entries
+    are returned for hydration. Rows are sorted by zip code, so a zip code
+    range search only scores the rows of the range, found with `searchsorted`.
+    Ties resolve like the repository's top-k query: nearest first, then the
+    lower zip code, then the lower id.
+
+    Changes of available capacity are applied in place, other changes need a
+    new scorer, see `update_available`.
+    """
+
+    def __init__(self, entries: Mapping[CareType, Iterable[_Entry]]):
+        """`entries` of each care type must be sorted by (zip code, id)"""
+        require_numpy()
+        self._columns = {
+            care_type: _Columns(list(care_type_entries))
+            for care_type, care_type_entries in entries.items()
+        }
+
+    def best_match(
+        self, care_type: CareType, zip_code: int, zip_code_range: int | None = None
+    ) -> tuple[_Entry | None, _Entry | None]:
+        """
+        The (nearest available, nearest) facilities within the zip code range,
+        or whose service area contains the zip code when there is no range
+        """
+        columns, rows, keys = self._score(care_type, zip_code, zip_code_range)
+        if not len(rows):
+            return None, None
+        nearest = rows[np.argmin(keys)]
+        if columns.available[nearest]:
+            return columns.entries[nearest], columns.entries[nearest]
+        available = columns.available[rows]
+        if not available.any():
+            return None, columns.entries[nearest]
+        available_rows = rows[available]
+        return (
+            columns.entries[available_rows[np.argmin(keys[available])]],
+            columns.entries[nearest],
+        )
+
+    def top(
+        self,
+        care_type: CareType,
+        zip_code: int,
+        k: int,
+        zip_code_range: int | None = None,
+    ) -> list[_Entry]:
+        """The k best facilities: available capacity first, then nearest"""
+        columns, rows, keys = self._score(care_type, zip_code, zip_code_range)
+        if not len(rows):
+            return []
+        # Unavailable facilities rank after every available one
+        keys = keys + np.where(columns.available[rows], 0, len(columns.entries) * _RANK)
+        if len(rows) > k:
+            best = np.argpartition(keys, k - 1)[:k]
+            rows, keys = rows[best], keys[best]
+        return [columns.entries[row] for row in rows[np.argsort(keys)].tolist()]
+
+    def update_available(self, entry: _Entry, care_types: list[CareType]) -> bool:
+        """
+        Applies a changed facility in place, if only its available capacity
+        changed. Returns False when the scorer needs to be rebuilt instead.
+        """
+        updates = []
+        for care_type, columns in self._columns.items():
+            row = columns.rows.get(entry.id)
+            if (row is not None) != (care_type in care_types):
+                return False
+            if row is None:
+                continue
+            previous = columns.entries[row]
+            if (
+                previous.zip_code != entry.zip_code
+                or previous.from_zip_code != entry.from_zip_code
+                or previous.to_zip_code != entry.to_zip_code
+            ):
+                return False
+            updates.append((columns, row))
+        if len(updates) != len(care_types):
+            return False
+        for columns, row in updates:
+            columns.entries[row] = entry
+            columns.available[row] = entry.available_capacity
+        return True
+
+    def _score(
+        self, care_type: CareType, zip_code: int, zip_code_range: int | None
+    ) -> tuple[_Columns | None, Any, Any]:
+        """
+        (columns, rows, keys) of the candidate rows. The smallest key wins: keys
+        combine the distance, the zip code and the row, so they are unique.
+        """
+        columns = self._columns.get(care_type)
+        if columns is None:
+            return None, _NO_ROWS, _NO_ROWS
+        if zip_code_range is None:
+            starts = np.searchsorted(columns.sorted_from_zip_codes, zip_code, "right")
+            serving = columns.to_zip_codes_by_from_zip_code[:starts] >= zip_code
+            rows = columns.rows_by_from_zip_code[:starts][serving]
+            zip_codes = columns.zip_codes[rows]
+        else:
+            start = np.searchsorted(columns.zip_codes, zip_code - zip_code_range)
+            end = np.searchsorted(columns.zip_codes, zip_code + zip_code_range, "right")
+            rows = np.arange(start, end)
+            zip_codes = columns.zip_codes[start:end]
+        rank = np.abs(zip_codes - zip_code) * ZIP_CODE_COUNT + zip_codes
+        return columns, rows, rank * len(columns.entries) + rows
+
+
+# Keys of unavailable facilities are offset by more than any distance rank
+_RANK = 2 * ZIP_CODE_COUNT * ZIP_CODE_COUNT
+_NO_ROWS = np.empty(0, dtype=np.int64) if np is not None else None
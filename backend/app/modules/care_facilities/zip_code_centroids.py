@@ -0,0 +1,136 @@
+"""
+Zip code centroid coordinates, used by "geo" searches and as the default
+coordinates of care facilities.
+
+The dataset is not bundled with the code, load it once per database from
+./backend/, either as a CSV with zip_code, latitude and longitude columns or
+as a GeoNames postal code dump (e.g. DE.txt from
+https://download.geonames.org/export/zip/, CC BY 4.0):
+
+    python -m app.modules.care_facilities.zip_code_centroids DE.txt --format geonames
+"""
+
+import argparse
+import csv
+import itertools
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Literal
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.logger import get_logger
+from app.modules.care_facilities.cache import zip_code_centroid_cache
+from app.modules.care_facilities.models import CareFacility, ZipCodeCentroid
+from app.modules.care_facilities.repository import (
+    UPSERT_INSERTS,
+    invalidate_derived_state,
+)
+
+logger = get_logger(__name__)
+
+CentroidFormat = Literal["csv", "geonames"]
+
+
+def read_centroids(
+    lines: Iterable[str], file_format: CentroidFormat
+) -> Iterator[ZipCodeCentroid]:
+    """
+    Centroids of a CSV, or of a GeoNames dump. GeoNames lists a postal code
+    once per place, those places are averaged. Non-numeric codes are skipped.
+    """
+    if file_format == "csv":
+        for record in csv.DictReader(lines):
+            yield ZipCodeCentroid.model_validate(record)
+        return
+
+    places: dict[int, list[tuple[float, float]]] = {}
+    # country, postal code, place name, 3 admin names and codes, lat, lon, accuracy
+    for record in csv.reader(lines, delimiter="\t"):
+        if len(record) < 11 or not record[1].isdigit():
+            continue
+        places.setdefault(int(record[1]), []).append(
+            (float(record[9]), float(record[10]))
+        )
+    for zip_code, coordinates in places.items():
+        yield ZipCodeCentroid(
+            zip_code=zip_code,
+            latitude=sum(c[0] for c in coordinates) / len(coordinates),
+            longitude=sum(c[1] for c in coordinates) / len(coordinates),
+        )
+
+
+def load_zip_code_centroids(
+    session: Session,
+    centroids: Iterable[ZipCodeCentroid],
+    chunk_size: int = settings.IMPORT_CHUNK_SIZE,
+) -> int:
+    """Upserts the centroids and backfills facility coordinates, returns the count"""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name not in UPSERT_INSERTS:
+        raise ValueError(
+            f"Loading zip code centroids is not supported on {dialect_name}"
+        )
+    statement = UPSERT_INSERTS[dialect_name](ZipCodeCentroid)
+    statement = statement.on_conflict_do_update(
+        index_elements=["zip_code"],
+        set_={
+            "latitude": statement.excluded.latitude,
+            "longitude": statement.excluded.longitude,
+        },
+    )
+    loaded = 0
+    centroids = iter(centroids)
+    while chunk := list(itertools.islice(centroids, chunk_size)):
+        session.exec(statement, params=[c.model_dump() for c in chunk])
+        loaded += len(chunk)
+    session.commit()
+    zip_code_centroid_cache.clear()
+    if backfill_facility_coordinates(session):
+        invalidate_derived_state()
+    logger.info(f"Loaded {loaded} zip code centroids")
+    return loaded
+
+
+def backfill_facility_coordinates(session: Session) -> int:
+    """
+    Sets the coordinates of facilities without any to their zip code centroid,
+    returns how many. Callers invalidate the derived state, see
+    `invalidate_derived_state`
+    """
+    centroid = select(ZipCodeCentroid).where(
+        ZipCodeCentroid.zip_code == CareFacility.zip_code
+    )
+    result = session.exec(
+        update(CareFacility)
+        .where(CareFacility.latitude.is_(None), centroid.exists())
+        .values(
+            latitude=centroid.with_only_columns(
+                ZipCodeCentroid.latitude
+            ).scalar_subquery(),
+            longitude=centroid.with_only_columns(
+                ZipCodeCentroid.longitude
+            ).scalar_subquery(),
+        )
+    )
+    session.commit()
+    return result.rowcount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load zip code centroids")
+    parser.add_argument("path", type=Path, help="A .csv or GeoNames .txt file")
+    parser.add_argument("--format", choices=["csv", "geonames"])
+    args = parser.parse_args()
+    file_format = args.format or ("csv" if args.path.suffix == ".csv" else "geonames")
+
+    with args.path.open(newline="", encoding="utf-8") as file, Session(engine) as db:
+        loaded = load_zip_code_centroids(db, read_centroids(file, file_format))
+    print(f"Loaded {loaded} zip code centroids")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Benchmarks the care facility search path against synthetic data.
+
+For each dataset size, seeds a temporary SQLite database and measures:
+- repository: CareFacilityRepository.get_by_care_type_and_zip_code
+- service: CareFacilityService.find_best_match, wired like the app dependencies
+- endpoint: GET /care-facilities/nearest through an ASGI client
+
+Reports p50/p95/p99 latency and requests/sec. Run from ./backend/:
+
+    python -m app.tests.benchmarks.search --sizes 1000 10000 100000
+
+Requests are sequential, unless --concurrency N has N clients send them to
+the endpoint at once, e.g. --concurrency 200. Requests/sec is then their
+aggregate throughput, and latencies include the time spent queued in the app.
+The repository and service benchmarks share one session, so stay sequential.
+
+Results can be saved with --json to compare optimizations against a baseline.
+Settings are read from the environment as usual, e.g. SEARCH_INDEX_ENABLED=false
+benchmarks the database search.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+CARE_TYPES = ("stationary_care", "day_care", "ambulatory_care")
+
+
+def configure_environment(database_path: Path) -> None:
+    """Must run before any app module is imported, settings are read on import"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("PROJECT_NAME", "careportal-benchmark")
+    os.environ.setdefault("FIRST_SUPERUSER", "benchmark@example.com")
+    os.environ.setdefault("FIRST_SUPERUSER_PASSWORD", "benchmark")
+
+
+def synthetic_facilities(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    facilities = []
+    for i in range(count):
+        zip_code = rng.randint(0, 99_999)
+        service_radius = rng.randint(0, 2_000)
+        facilities.append(
+            {
+                "name": f"Facility {i}",
+                "address": f"{i} Benchmark St",
+                "has_stationary_care": rng.random() < 0.5,
+                "has_day_care": rng.random() < 0.4,
+                "has_ambulatory_care": rng.random() < 0.3,
+                "from_zip_code": max(zip_code - service_radius, 0),
+                "to_zip_code": min(zip_code + service_radius, 99_999),
+                "zip_code": zip_code,
+                "available_capacity": rng.random() < 0.3,
+                "slug": f"facility-{i}",
+            }
+        )
+    return facilities
+
+
+def seed_database(count: int, seed: int) -> None:
+    from sqlmodel import Session, SQLModel, delete, insert
+
+    from app.core.db import engine
+    from app.modules.care_facilities.cache import (
+        care_facility_search_cache,
+        care_facility_slug_cache,
+    )
+    from app.modules.care_facilities.models import CareFacility
+    from app.modules.care_facilities.search_index import care_facility_search_index
+
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.exec(delete(CareFacility))
+        session.exec(insert(CareFacility), params=synthetic_facilities(count, seed))
+        session.commit()
+    care_facility_search_index.invalidate()
+    care_facility_slug_cache.clear()
+    care_facility_search_cache.clear()
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict[str, float]:
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "p50_ms": percentiles[49] * 1_000,
+        "p95_ms": percentiles[94] * 1_000,
+        "p99_ms": percentiles[98] * 1_000,
+        "requests_per_second": len(latencies) / elapsed,
+    }
+
+
+async def measure(
+    call: Callable[[str, int], Awaitable[object]],
+    queries: list[tuple[str, int]],
+    warmup: int,
+    concurrency: int = 1,
+) -> dict[str, float]:
+    """Sends the queries from `concurrency` workers, each one call at a time"""
+    for care_type, zip_code in queries[:warmup]:
+        await call(care_type, zip_code)
+    latencies = []
+    # Shared by the workers, each query is sent once
+    remaining = iter(queries)
+
+    async def worker() -> None:
+        for care_type, zip_code in remaining:
+            call_started = time.perf_counter()
+            await call(care_type, zip_code)
+            latencies.append(time.perf_counter() - call_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {
+        **summarize(latencies, time.perf_counter() - started),
+        "concurrency": concurrency,
+    }
+
+
+async def benchmark_repository(queries, warmup):
+    from sqlmodel import Session
+
+    from app.core.config import settings
+    from app.core.db import engine
+    from app.modules.care_facilities.repository import CareFacilityRepository
+
+    with Session(engine) as session:
+        repository = CareFacilityRepository(session)
+
+        async def call(care_type, zip_code):
+            await repository.get_by_care_type_and_zip_code(
+                care_type, zip_code, settings.ZIP_CODE_RANGE_SEARCH
+            )
+
+        return await measure(call, queries, warmup)
+
+
+async def benchmark_service(queries, warmup):
+    from fastapi import BackgroundTasks
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from app.core.analytics import Analytics
+    from app.core.db import async_engine
+    from app.modules.care_facilities.deps import get_care_facility_service
+    from app.modules.care_facilities.repository import (
+        AsyncCareFacilityContactRequestRepository,
+        AsyncCareFacilityRepository,
+    )
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        service = get_care_facility_service(
+            AsyncCareFacilityRepository(session),
+            AsyncCareFacilityContactRequestRepository(session),
+            Analytics(None),
+        )
+
+        async def call(care_type, zip_code):
+            await service.find_best_match(zip_code, care_type, BackgroundTasks())
+
+        return await measure(call, queries, warmup)
+
+
+async def benchmark_endpoint(queries, warmup, concurrency=1):
+    import httpx
+
+    from app.core.config import settings
+    from app.main import app, lifespan
+
+    transport = httpx.ASGITransport(app=app)
+    async with (
+        lifespan(app),
+        httpx.AsyncClient(transport=transport, base_url="http://test") as client,
+    ):
+        url = f"{settings.API_V1_STR}/care-facilities/nearest"
+
+        async def call(care_type, zip_code):
+            response = await client.get(
+                url, params={"care_type": care_type, "zip_code": zip_code}
+            )
+            if response.status_code not in (200, 404):
+                raise RuntimeError(f"Unexpected response {response.status_code}")
+
+        return await measure(call, queries, warmup, concurrency)
+
+
+BENCHMARKS = {
+    "repository": benchmark_repository,
+    "service": benchmark_service,
+    "endpoint": benchmark_endpoint,
+}
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    from app.core.db import async_engine
+
+    rng = random.Random(args.seed)
+    queries = [
+        (rng.choice(CARE_TYPES), rng.randint(0, 99_999)) for _ in range(args.requests)
+    ]
+    results = []
+    for size in args.sizes:
+        seed_database(size, args.seed)
+        for name in args.benchmarks:
+            if name == "endpoint":
+                result = await benchmark_endpoint(
+                    queries, args.warmup, args.concurrency
+                )
+            else:
+                result = await BENCHMARKS[name](queries, args.warmup)
+            results.append({"size": size, "benchmark": name, **result})
+            print_result(results[-1])
+    await async_engine.dispose()
+    return results
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"{result['size']:>8} {result['benchmark']:<11}"
+        f" x{result['concurrency']:<4}"
+        f" p50 {result['p50_ms']:8.3f} ms"
+        f" p95 {result['p95_ms']:8.3f} ms"
+        f" p99 {result['p99_ms']:8.3f} ms"
+        f" {result['requests_per_second']:10.1f} req/s",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS)
+    )
+    parser.add_argument("--requests", type=int, default=1_000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Concurrent clients of the endpoint benchmark",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", type=Path, help="Write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(Path(directory) / "benchmark.db")
+        results = asyncio.run(run(args))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Micro-benchmarks the per-call overhead of the nearest-facility query.
+
+Compares, against an in-memory SQLite database:
+- dynamic: the statement built on every call, as the repository used to
+- prebuilt: the repository's per care type statement, with bound parameters
+
+Both run the same SQL, so the difference is the Python-side cost of building
+the statement and its cache key. Reports p50 and mean microseconds per call.
+Run from ./backend/:
+
+    python -m app.tests.benchmarks.statements --calls 20000
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from app.tests.benchmarks.search import (
+    CARE_TYPES,
+    configure_environment,
+    synthetic_facilities,
+)
+
+
+def dynamic_statement(care_type: str, zip_code: int, zip_code_range: int):
+    from sqlalchemy.sql import func
+    from sqlmodel import select
+
+    from app.modules.care_facilities.models import CareFacility
+
+    care_type_columns = {
+        "stationary_care": CareFacility.has_stationary_care,
+        "day_care": CareFacility.has_day_care,
+        "ambulatory_care": CareFacility.has_ambulatory_care,
+    }
+    return (
+        select(
+            CareFacility.id,
+            CareFacility.name,
+            CareFacility.address,
+            CareFacility.zip_code,
+            CareFacility.available_capacity,
+            CareFacility.slug,
+            func.abs(CareFacility.zip_code - zip_code).label("distance"),
+        )
+        .where(
+            care_type_columns[care_type] == True,  # noqa: E712
+            CareFacility.zip_code.between(
+                zip_code - zip_code_range, zip_code + zip_code_range
+            ),
+        )
+        .order_by("distance")
+    )
+
+
+def measure(call: Callable[[str, int], object], queries, warmup: int) -> list[float]:
+    for care_type, zip_code in queries[:warmup]:
+        call(care_type, zip_code)
+    durations = []
+    for care_type, zip_code in queries:
+        started = time.perf_counter()
+        call(care_type, zip_code)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def run(args: argparse.Namespace) -> None:
+    from sqlmodel import Session, SQLModel, create_engine, insert
+
+    from app.modules.care_facilities.models import CareFacility
+    from app.modules.care_facilities.repository import (
+        BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS,
+        _range_params,
+    )
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(args.seed)
+    queries = [
+        (rng.choice(CARE_TYPES), rng.randint(0, 99_999)) for _ in range(args.calls)
+    ]
+    zip_code_range = args.zip_code_range
+
+    with Session(engine) as session:
+        session.exec(
+            insert(CareFacility), params=synthetic_facilities(args.size, args.seed)
+        )
+        session.commit()
+
+        def dynamic(care_type, zip_code):
+            statement = dynamic_statement(care_type, zip_code, zip_code_range)
+            return session.exec(statement).all()
+
+        def prebuilt(care_type, zip_code):
+            statement = BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS[care_type]
+            params = _range_params(zip_code, zip_code_range)
+            return session.exec(statement, params=params).all()
+
+        for name, call in (("dynamic", dynamic), ("prebuilt", prebuilt)):
+            durations = measure(call, queries, args.warmup)
+            print(
+                f"{name:<9}"
+                f" p50 {statistics.median(durations) * 1e6:8.1f} us"
+                f" mean {statistics.fmean(durations) * 1e6:8.1f} us",
+                flush=True,
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--size", type=int, default=100, help="Facilities to seed")
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--warmup", type=int, default=500)
+    # Small, so the query itself doesn't drown the overhead being measured
+    parser.add_argument("--zip-code-range", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(Path(directory) / "benchmark.db")
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
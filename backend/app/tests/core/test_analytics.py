@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import json
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from app.core.analytics import Analytics, JsonlSink, PosthogSink
+
+
+def captured_events(posthog):
+    return [call.args[1] for call in posthog.capture.call_args_list]
+
+
+class TestAnalytics:
+    def test_track_event_is_queued_until_flush(self):
+        posthog = MagicMock()
+        analytics = Analytics(PosthogSink(posthog))
+
+        analytics.track_event(uid=None, event_name="searched", properties={"a": 1})
+
+        posthog.capture.assert_not_called()
+        assert analytics.flush() == 1
+        uid, event_name, properties = posthog.capture.call_args.args
+        assert uid == "anonymous"
+        assert event_name == "searched"
+        assert properties == {"a": 1, "$process_person_profile": False}
+        assert posthog.capture.call_args.kwargs["timestamp"] is not None
+
+    def test_full_queue_drops_oldest(self):
+        posthog = MagicMock()
+        analytics = Analytics(PosthogSink(posthog), max_queue_size=3)
+
+        for i in range(5):
+            analytics.track_event(uid="user", event_name=f"event_{i}")
+        analytics.flush()
+
+        assert captured_events(posthog) == ["event_2", "event_3", "event_4"]
+        assert analytics.dropped == 2
+
+    def test_without_client_is_a_no_op(self):
+        analytics = Analytics(None)
+
+        analytics.track_event(uid=None, event_name="searched", properties={})
+
+        assert analytics.flush() == 0
+        analytics.shutdown()
+
+    def test_shutdown_flushes_and_stops_client(self):
+        posthog = MagicMock()
+        analytics = Analytics(PosthogSink(posthog))
+        analytics.track_event(uid="user", event_name="searched")
+
+        analytics.shutdown()
+
+        assert captured_events(posthog) == ["searched"]
+        posthog.shutdown.assert_called_once()
+
+    async def test_full_batch_is_flushed_before_interval(self):
+        posthog = MagicMock()
+        analytics = Analytics(PosthogSink(posthog), batch_size=2)
+        task = asyncio.create_task(analytics.flush_periodically(60))
+
+        analytics.track_event(uid="user", event_name="first")
+        analytics.track_event(uid="user", event_name="second")
+        for _ in range(100):
+            if posthog.capture.call_count == 2:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+        assert captured_events(posthog) == ["first", "second"]
+
+    def test_aggregates_repeated_events(self, monkeypatch):
+        posthog = MagicMock()
+        analytics = Analytics(PosthogSink(posthog), aggregation_window_seconds=60)
+        monkeypatch.setattr(time, "time", lambda: 1_200.0)
+
+        for _ in range(3):
+            analytics.track_event(
+                uid=None,
+                event_name="not_found",
+                properties={"zip_code": 1},
+                aggregate=True,
+            )
+        analytics.track_event(
+            uid=None, event_name="not_found", properties={"zip_code": 2}, aggregate=True
+        )
+        analytics.track_event(uid=None, event_name="found", properties={"zip_code": 1})
+
+        # The window is still open, so only the non-aggregated event is sent
+        assert analytics.flush() == 1
+        assert captured_events(posthog) == ["found"]
+
+        monkeypatch.setattr(time, "time", lambda: 1_260.0)
+        assert analytics.flush() == 2
+        counts = {
+            call.args[2]["zip_code"]: call.args[2]["count"]
+            for call in posthog.capture.call_args_list[1:]
+        }
+        assert counts == {1: 3, 2: 1}
+        timestamp = posthog.capture.call_args.kwargs["timestamp"]
+        assert timestamp == datetime.fromtimestamp(1_200, timezone.utc)
+
+    def test_shutdown_sends_open_aggregate_windows(self):
+        posthog = MagicMock()
+        analytics = Analytics(PosthogSink(posthog), aggregation_window_seconds=60)
+        analytics.track_event(
+            uid=None, event_name="not_found", properties={}, aggregate=True
+        )
+
+        analytics.shutdown()
+
+        assert captured_events(posthog) == ["not_found"]
+        assert posthog.capture.call_args.args[2]["count"] == 1
+
+    def test_jsonl_sink(self, tmp_path):
+        path = tmp_path / "analytics.jsonl"
+        analytics = Analytics(JsonlSink(path))
+        analytics.track_event(
+            uid=None, event_name="searched", properties={"id": uuid4()}
+        )
+        analytics.track_event(uid="user", event_name="searched", properties={})
+
+        analytics.shutdown()
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record["uid"] for record in records] == ["anonymous", "user"]
+        assert records[0]["event"] == "searched"
+        assert isinstance(records[0]["properties"]["id"], str)
@@ -0,0 +1,152 @@
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.core import base_repository
+from app.core.base_repository import AsyncBaseRepository, BaseRepository
+from app.modules.care_facilities.models import CareFacility
+from app.modules.care_facilities.schemas import CareFacilityCreate
+from app.tests.fixtures import (  # noqa
+    async_db_engine,
+    async_db_session,
+    build_facilities,
+    db_engine,
+    db_session,
+)
+
+
+def facility_data(count):
+    return build_facilities(
+        count,
+        care_types=("day_care",),
+        available_capacity=False,
+        model=CareFacilityCreate,
+    )
+
+
+@pytest.fixture
+def repository(db_session):  # noqa: F811
+    return BaseRepository(CareFacility, db_session)
+
+
+@pytest.fixture
+def async_repository(async_db_session):  # noqa: F811
+    return AsyncBaseRepository(CareFacility, async_db_session)
+
+
+class TestBaseRepositoryBulkOperations:
+    def test_create_many(self, repository, db_session):  # noqa: F811
+        created = repository.create_many(facility_data(3))
+
+        stored = db_session.exec(select(CareFacility)).all()
+        assert {f.id for f in stored} == {f.id for f in created}
+        assert repository.create_many([]) == []
+
+    def test_update_many_groups_identical_values(
+        self,
+        repository,
+        db_session,  # noqa: F811
+        monkeypatch,
+    ):
+        # Small batches, so the id lists are split over several statements
+        monkeypatch.setattr(base_repository, "BULK_BATCH_SIZE", 2)
+        created = repository.create_many(facility_data(5))
+        changes = {f.id: {"available_capacity": True} for f in created[:3]}
+        changes[created[3].id] = {"name": "Renamed", "available_capacity": True}
+        changes[uuid4()] = {"available_capacity": True}
+
+        updated = repository.update_many(changes)
+
+        assert updated == 4
+        db_session.expire_all()
+        stored = {f.slug: f for f in db_session.exec(select(CareFacility)).all()}
+        assert [stored[f"facility-{i}"].available_capacity for i in range(5)] == [
+            True,
+            True,
+            True,
+            True,
+            False,
+        ]
+        assert stored["facility-3"].name == "Renamed"
+        assert stored["facility-4"].updated_at < stored["facility-0"].updated_at
+
+    def test_update_many_returning(self, repository):
+        created = repository.create_many(facility_data(2))
+
+        updated = repository.update_many(
+            {created[0].id: {"zip_code": 12345}}, returning=True
+        )
+
+        assert [(f.id, f.zip_code) for f in updated] == [(created[0].id, 12345)]
+
+    def test_delete_many(self, repository, db_session):  # noqa: F811
+        created = repository.create_many(facility_data(3))
+
+        deleted = repository.delete_many([created[0].id, created[1].id], returning=True)
+
+        assert {f.id for f in deleted} == {created[0].id, created[1].id}
+        assert [f.id for f in db_session.exec(select(CareFacility)).all()] == [
+            created[2].id
+        ]
+        assert repository.delete_many([created[2].id, uuid4()]) == 1
+
+
+class TestAsyncBaseRepositoryBulkOperations:
+    async def test_create_update_delete_many(self, async_repository):
+        created = await async_repository.create_many(facility_data(3))
+
+        updated = await async_repository.update_many(
+            {f.id: {"available_capacity": True} for f in created}
+        )
+        deleted = await async_repository.delete_many(
+            [f.id for f in created[:2]], returning=True
+        )
+
+        assert updated == 3
+        assert {f.id for f in deleted} == {f.id for f in created[:2]}
+        remaining = await async_repository.get_all()
+        assert [(f.id, f.available_capacity) for f in remaining] == [
+            (created[2].id, True)
+        ]
+
+
+class TestBaseRepositoryPagination:
+    def test_get_page_follows_cursor(self, repository):
+        created = repository.create_many(facility_data(5))
+        ids = sorted(f.id for f in created)
+
+        first = repository.get_page(limit=2)
+        second = repository.get_page(after=first[-1].id, limit=2)
+        last = repository.get_page(after=second[-1].id, limit=2)
+
+        assert [f.id for f in first + second + last] == ids
+        assert repository.get_page(after=ids[-1]) == []
+
+    def test_get_page_filters(self, repository):
+        repository.create_many(facility_data(5))
+
+        page = repository.get_page(filters=[CareFacility.zip_code >= 10003])
+
+        assert sorted(f.zip_code for f in page) == [10003, 10004]
+
+    def test_stream(self, repository):
+        created = repository.create_many(facility_data(5))
+
+        streamed = list(
+            repository.stream([CareFacility.zip_code < 10004], batch_size=2)
+        )
+
+        assert [f.id for f in streamed] == sorted(f.id for f in created[:4])
+
+
+class TestAsyncBaseRepositoryPagination:
+    async def test_get_page_and_stream(self, async_repository):
+        created = await async_repository.create_many(facility_data(3))
+        ids = sorted(f.id for f in created)
+
+        page = await async_repository.get_page(after=ids[0], limit=1)
+        streamed = [f.id async for f in async_repository.stream(batch_size=2)]
+
+        assert [f.id for f in page] == [ids[1]]
+        assert streamed == ids
@@ -0,0 +1,74 @@
+import time
+
+from app.core.cache import TTLCache, cache_registry
+
+
+class TestTTLCache:
+    def test_get_set_counts_hits_and_misses(self):
+        cache = TTLCache("test_hits", max_size=10, ttl_seconds=60)
+
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+        assert cache_registry["test_hits"] is cache
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache("test_lru", max_size=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now the least recently used
+
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire(self, monkeypatch):
+        cache = TTLCache("test_ttl", max_size=10, ttl_seconds=5)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        cache.set("a", 1)
+
+        monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_invalidate(self):
+        cache = TTLCache("test_invalidate", max_size=10, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+
+        cache.invalidate("a")
+        cache.invalidate_where(lambda value: value == 2)
+
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_invalidate_tagged(self):
+        cache = TTLCache(
+            "test_tags",
+            max_size=2,
+            ttl_seconds=60,
+            tags=lambda key, value: [key[0], value],
+        )
+        cache.set(("a", 1), "x")
+        cache.set(("a", 2), "y")
+        cache.set(("b", 1), "y")  # Evicts ("a", 1), and its tags
+
+        cache.invalidate_tagged(["a"])
+
+        assert cache.get(("a", 2)) is None
+        assert cache.get(("b", 1)) == "y"
+        cache.invalidate_tagged(["y"])
+        assert cache.get(("b", 1)) is None
+        assert cache._keys_by_tag == {}
@@ -0,0 +1,106 @@
+import gzip
+
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import (
+    CompressionMiddleware,
+    choose_encoding,
+    compress_variants,
+)
+
+LARGE = "x" * 1_000
+
+
+def build_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=500, content_types=["text/plain"]
+    )
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("small")
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse(LARGE, headers={"ETag": '"large"'})
+
+    @app.get("/html")
+    async def html():
+        return Response(LARGE, media_type="text/html")
+
+    @app.get("/precompressed")
+    async def precompressed():
+        return Response(
+            gzip.compress(LARGE.encode()),
+            media_type="text/plain",
+            headers={"Content-Encoding": "gzip"},
+        )
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield "chunk\n"
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+
+class TestChooseEncoding:
+    def test_prefers_available_order(self):
+        assert choose_encoding("gzip, br", ("br", "gzip")) == "br"
+        assert choose_encoding("gzip", ("br", "gzip")) == "gzip"
+
+    def test_weights(self):
+        assert choose_encoding("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+        assert choose_encoding("gzip;q=0", ("gzip",)) is None
+        assert choose_encoding("*", ("gzip",)) == "gzip"
+        assert choose_encoding("", ("gzip",)) is None
+
+
+class TestCompressVariants:
+    def test_minimum_size(self):
+        assert compress_variants(b"small", minimum_size=500) == {}
+        variants = compress_variants(LARGE.encode(), minimum_size=500)
+        assert gzip.decompress(variants["gzip"]) == LARGE.encode()
+
+
+class TestCompressionMiddleware:
+    def test_compresses_large_responses(self):
+        with build_client() as client:
+            response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"large"'
+        assert int(response.headers["content-length"]) < len(LARGE)
+        assert response.text == LARGE
+
+    def test_skips_small_and_other_responses(self):
+        with build_client() as client:
+            small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+            html = client.get("/html", headers={"Accept-Encoding": "gzip"})
+            identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+        assert "content-encoding" not in small.headers
+        assert small.text == "small"
+        assert "content-encoding" not in html.headers
+        assert "content-encoding" not in identity.headers
+        assert identity.headers["etag"] == '"large"'
+
+    def test_passes_precompressed_responses_through(self):
+        with build_client() as client:
+            response = client.get("/precompressed", headers={"Accept-Encoding": "gzip"})
+
+        assert response.text == LARGE
+
+    def test_compresses_streams(self):
+        with build_client() as client:
+            response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.text == "chunk\n" * 3
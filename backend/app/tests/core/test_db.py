@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+
+from app.core import db, deps
+from app.core.config import settings
+from app.core.metrics import render_metrics
+
+
+class TestCreateDbEngine:
+    def test_pool_settings(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DB_POOL_SIZE", 2)
+        monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 1)
+        monkeypatch.setattr(settings, "DB_POOL_RECYCLE_SECONDS", 60)
+
+        engine = db.create_db_engine(f"sqlite:///{tmp_path}/pool.db", "test_pool")
+
+        assert isinstance(engine.pool, db.InstrumentedQueuePool)
+        assert engine.pool.size() == 2
+        assert engine.pool._max_overflow == 1
+        assert engine.pool._recycle == 60
+        engine.dispose()
+
+    def test_memory_database_keeps_its_pool(self):
+        engine = db.create_async_db_engine("sqlite+aiosqlite://", "test_memory")
+
+        assert isinstance(engine.sync_engine.pool, StaticPool)
+
+    def test_postgresql_statement_timeout(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 5_000)
+
+        options = db._engine_options("postgresql://u@h/d", "test", is_async=False)
+
+        assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    def test_psycopg_prepare_threshold(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", 3)
+
+        options = db._engine_options("postgresql+psycopg://u@h/d", "test", True)
+
+        assert options["connect_args"]["prepare_threshold"] == 3
+
+    def test_checkout_metrics_and_wait_warning(self, tmp_path, monkeypatch, caplog):
+        monkeypatch.setattr(settings, "DB_POOL_WAIT_WARNING_SECONDS", 0.0)
+        monkeypatch.setattr(db, "_last_pool_wait_warning", 0.0)
+        engine = db.create_db_engine(f"sqlite:///{tmp_path}/wait.db", "test_wait")
+
+        with caplog.at_level(logging.WARNING), engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+        metrics = render_metrics()
+        assert 'db_pool_checkout_wait_seconds_count{engine="test_wait"} 1' in metrics
+        assert (
+            'db_pool_connections{engine="test_wait",state="checked_out"} 0' in metrics
+        )
+        assert 'db_pool_connections{engine="test_wait",state="idle"} 1' in metrics
+        assert "Waited" in caplog.text
+        engine.dispose()
+
+
+class TestReplicaSet:
+    async def test_round_robin_skips_unhealthy_replicas(self, tmp_path):
+        primary = db.create_async_db_engine(
+            f"sqlite+aiosqlite:///{tmp_path}/primary.db", "test_primary"
+        )
+        first = db.create_async_db_engine(
+            f"sqlite+aiosqlite:///{tmp_path}/first.db", "test_first"
+        )
+        second = db.create_async_db_engine(
+            f"sqlite+aiosqlite:///{tmp_path}/second.db", "test_second"
+        )
+        broken = db.create_async_db_engine(
+            f"sqlite+aiosqlite:///{tmp_path}/missing/broken.db", "test_broken"
+        )
+        replicas = db.ReplicaSet(primary, [first, second, broken])
+
+        await replicas.check_health(timeout_seconds=1.0)
+
+        assert replicas.healthy == [first, second]
+        assert [replicas.next_engine() for _ in range(4)] == [
+            first,
+            second,
+            first,
+            second,
+        ]
+        await replicas.dispose()
+        await primary.dispose()
+
+    def test_falls_back_to_primary(self):
+        primary = db.create_async_db_engine("sqlite+aiosqlite://", "test_fallback")
+
+        assert db.ReplicaSet(primary, []).next_engine() is primary
+
+
+class TestGetReadDb:
+    async def test_read_your_writes(self, monkeypatch):
+        replica = db.create_async_db_engine("sqlite+aiosqlite://", "test_replica")
+        monkeypatch.setattr(
+            deps, "replica_set", db.ReplicaSet(db.async_engine, [replica])
+        )
+
+        async def read_engine(**headers):
+            request = Request(
+                {
+                    "type": "http",
+                    "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+                }
+            )
+            async for session in deps.get_read_db(request):
+                return session.bind
+
+        assert await read_engine() is replica
+        assert await read_engine(**{"x-read-your-writes": "true"}) is db.async_engine
+
+
+class TestSqlite:
+    def test_pragmas(self, tmp_path):
+        engine = db.create_db_engine(f"sqlite:///{tmp_path}/pragmas.db", "test_pragmas")
+
+        with engine.connect() as connection:
+            pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()  # noqa: E731
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == settings.SQLITE_BUSY_TIMEOUT_MS
+            assert pragma("cache_size") == -settings.SQLITE_CACHE_SIZE_KIB
+            assert pragma("temp_store") == 2  # MEMORY
+        engine.dispose()
+
+    async def test_single_writer(self, tmp_path):
+        url = f"sqlite+aiosqlite:///{tmp_path}/writer.db"
+        writer = db.create_async_db_engine(url, "test_writer", writer=True)
+        reader = db.create_async_db_engine(url, "test_reader")
+
+        assert writer.sync_engine.pool.size() == 1
+        assert writer.sync_engine.pool._max_overflow == 0
+        assert reader.sync_engine.pool.size() == settings.DB_POOL_SIZE
+
+        async with writer.begin() as connection:
+            await connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        async with writer.begin() as connection:
+            await connection.execute(text("INSERT INTO t VALUES (1)"))
+            # WAL: reads don't wait for the write transaction
+            async with reader.connect() as read_connection:
+                count = await read_connection.execute(text("SELECT count(*) FROM t"))
+                assert count.scalar() == 0
+        await writer.dispose()
+        await reader.dispose()
+
+    async def test_sync_and_async_writers_write_one_at_a_time(self, tmp_path):
+        path = tmp_path / "writers.db"
+        sync_writer = db.create_db_engine(
+            f"sqlite:///{path}", "test_sync_writer", writer=True
+        )
+        async_writer = db.create_async_db_engine(
+            f"sqlite+aiosqlite:///{path}", "test_async_writer", writer=True
+        )
+        with sync_writer.begin() as connection:
+            connection.execute(text("CREATE TABLE t (x TEXT)"))
+        writes = []
+
+        def sync_write(value):
+            with sync_writer.begin() as connection:
+                writes.append(f"{value} start")
+                connection.execute(text("INSERT INTO t VALUES (:x)"), {"x": value})
+                time.sleep(0.01)
+                writes.append(f"{value} end")
+
+        async def async_write(value):
+            async with async_writer.begin() as connection:
+                writes.append(f"{value} start")
+                await connection.execute(
+                    text("INSERT INTO t VALUES (:x)"), {"x": value}
+                )
+                await asyncio.sleep(0.01)
+                writes.append(f"{value} end")
+
+        await asyncio.gather(
+            *(asyncio.to_thread(sync_write, f"sync {i}") for i in range(5)),
+            *(async_write(f"async {i}") for i in range(5)),
+        )
+
+        # Writers hold their transaction for a while, yet never overlap
+        assert len(writes) == 20
+        for start, end in zip(writes[::2], writes[1::2], strict=True):
+            assert start.removesuffix(" start") == end.removesuffix(" end")
+        with sync_writer.connect() as connection:
+            assert connection.execute(text("SELECT count(*) FROM t")).scalar() == 10
+        sync_writer.dispose()
+        await async_writer.dispose()
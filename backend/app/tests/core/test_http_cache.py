@@ -0,0 +1,160 @@
+import gzip
+from datetime import datetime, timezone
+
+from fastapi import Request
+from pydantic import BaseModel
+
+from app.core.http_cache import conditional_response
+
+LAST_MODIFIED = datetime(2025, 3, 6, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+class Facility(BaseModel):
+    name: str
+
+
+def build_request(**headers: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [
+                (key.replace("_", "-").encode(), value.encode())
+                for key, value in headers.items()
+            ],
+        }
+    )
+
+
+class TestConditionalResponse:
+    def test_sets_validators(self):
+        response = conditional_response(
+            build_request(), Facility(name="A"), max_age=60, last_modified=LAST_MODIFIED
+        )
+
+        assert response.status_code == 200
+        assert response.body == b'{"name":"A"}'
+        assert response.headers["cache-control"] == "public, max-age=60"
+        assert response.headers["last-modified"] == "Thu, 06 Mar 2025 12:30:15 GMT"
+        assert response.headers["etag"].startswith('"')
+
+    def test_serialized_content(self):
+        response = conditional_response(build_request(), b'{"name":"A"}', max_age=60)
+        model_response = conditional_response(
+            build_request(), Facility(name="A"), max_age=60
+        )
+
+        assert response.body == b'{"name":"A"}'
+        assert response.headers["etag"] == model_response.headers["etag"]
+
+    def test_precompressed_variant(self):
+        body = b'{"name":"A"}'
+        compressed = {"gzip": gzip.compress(body)}
+        plain = conditional_response(build_request(), body, max_age=60)
+
+        response = conditional_response(
+            build_request(accept_encoding="gzip, br"),
+            body,
+            max_age=60,
+            compressed=compressed,
+        )
+        identity = conditional_response(
+            build_request(), body, max_age=60, compressed=compressed
+        )
+        not_modified = conditional_response(
+            build_request(
+                accept_encoding="gzip", if_none_match=response.headers["etag"]
+            ),
+            body,
+            max_age=60,
+            compressed=compressed,
+        )
+
+        assert response.body == compressed["gzip"]
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"] == f"W/{plain.headers['etag']}"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert identity.body == body
+        assert "content-encoding" not in identity.headers
+        assert not_modified.status_code == 304
+
+    def test_vary(self):
+        body = b'{"name":"A"}'
+        compressed = {"gzip": gzip.compress(body)}
+
+        plain = conditional_response(build_request(), body, max_age=60)
+        varying = conditional_response(
+            build_request(),
+            body,
+            max_age=60,
+            compressed=compressed,
+            vary=["X-Read-Your-Writes"],
+        )
+
+        assert "vary" not in plain.headers
+        assert varying.headers["vary"] == "X-Read-Your-Writes, Accept-Encoding"
+
+    def test_etag_is_deterministic(self):
+        first = conditional_response(build_request(), Facility(name="A"), max_age=60)
+        second = conditional_response(build_request(), Facility(name="A"), max_age=60)
+        other = conditional_response(build_request(), Facility(name="B"), max_age=60)
+
+        assert first.headers["etag"] == second.headers["etag"]
+        assert first.headers["etag"] != other.headers["etag"]
+
+    def test_if_none_match(self):
+        etag = conditional_response(
+            build_request(), Facility(name="A"), max_age=60
+        ).headers["etag"]
+
+        for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            response = conditional_response(
+                build_request(if_none_match=if_none_match),
+                Facility(name="A"),
+                max_age=60,
+            )
+            assert response.status_code == 304, if_none_match
+            assert response.body == b""
+            assert response.headers["etag"] == etag
+
+        response = conditional_response(
+            build_request(if_none_match='"other"'), Facility(name="A"), max_age=60
+        )
+        assert response.status_code == 200
+
+    def test_if_modified_since(self):
+        def respond(if_modified_since):
+            return conditional_response(
+                build_request(if_modified_since=if_modified_since),
+                Facility(name="A"),
+                max_age=60,
+                last_modified=LAST_MODIFIED,
+            )
+
+        assert respond("Thu, 06 Mar 2025 12:30:15 GMT").status_code == 304
+        assert respond("Thu, 06 Mar 2025 12:30:14 GMT").status_code == 200
+        assert respond("not a date").status_code == 200
+
+    def test_if_none_match_takes_precedence(self):
+        response = conditional_response(
+            build_request(
+                if_none_match='"other"',
+                if_modified_since="Thu, 06 Mar 2025 12:30:15 GMT",
+            ),
+            Facility(name="A"),
+            max_age=60,
+            last_modified=LAST_MODIFIED,
+        )
+
+        assert response.status_code == 200
+
+    def test_naive_last_modified_is_utc(self):
+        response = conditional_response(
+            build_request(),
+            Facility(name="A"),
+            max_age=60,
+            last_modified=LAST_MODIFIED.replace(tzinfo=None),
+        )
+
+        assert response.headers["last-modified"] == "Thu, 06 Mar 2025 12:30:15 GMT"
@@ -0,0 +1,171 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.metrics import (
+    Gauge,
+    Histogram,
+    instrument,
+    instrument_class,
+    render_metrics,
+    request_spans,
+    span,
+    span_duration,
+)
+from app.core.middleware import TimingMiddleware
+
+
+def series(histogram, *label_values):
+    return histogram._series.get(label_values)
+
+
+class TestHistogram:
+    def test_render(self):
+        histogram = Histogram(
+            "test_render_seconds", "Test histogram", ("route",), buckets=(0.1, 1.0)
+        )
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.5, "/a")
+        histogram.observe(5.0, "/a")
+
+        lines = histogram.render()
+
+        assert lines == [
+            "# HELP test_render_seconds Test histogram",
+            "# TYPE test_render_seconds histogram",
+            'test_render_seconds_bucket{route="/a",le="0.1"} 1',
+            'test_render_seconds_bucket{route="/a",le="1.0"} 2',
+            'test_render_seconds_bucket{route="/a",le="+Inf"} 3',
+            'test_render_seconds_sum{route="/a"} 5.55',
+            'test_render_seconds_count{route="/a"} 3',
+        ]
+        assert "test_render_seconds_count" in render_metrics()
+
+
+class TestGauge:
+    def test_render(self):
+        gauge = Gauge(
+            "test_render_gauge",
+            "Test gauge",
+            ("engine", "state"),
+            lambda: {("b", "idle"): 2, ("a", "idle"): 1},
+        )
+
+        assert gauge.render() == [
+            "# HELP test_render_gauge Test gauge",
+            "# TYPE test_render_gauge gauge",
+            'test_render_gauge{engine="a",state="idle"} 1',
+            'test_render_gauge{engine="b",state="idle"} 2',
+        ]
+        assert 'test_render_gauge{engine="a",state="idle"} 1' in render_metrics()
+
+
+class TestSpans:
+    def test_span_records_metric_and_request_spans(self):
+        spans = []
+        token = request_spans.set(spans)
+        try:
+            with span("test", "test_span_block"):
+                pass
+        finally:
+            request_spans.reset(token)
+
+        assert [name for name, _ in spans] == ["test_span_block"]
+        assert series(span_duration, "test", "test_span_block")[2] == 1
+
+    async def test_instrument(self):
+        @instrument("test")
+        def sync_function():
+            return 1
+
+        @instrument("test", "test_async_function")
+        async def async_function():
+            return 2
+
+        assert sync_function() == 1
+        assert await async_function() == 2
+        qualname = sync_function.__qualname__
+        assert series(span_duration, "test", qualname)[2] == 1
+        assert series(span_duration, "test", "test_async_function")[2] == 1
+
+    async def test_instrument_class_includes_inherited_methods(self):
+        class Base:
+            def get(self):
+                return "base"
+
+        @instrument_class("test")
+        class Child(Base):
+            async def find(self):
+                return "child"
+
+            def _private(self):
+                return "private"
+
+        child = Child()
+        assert child.get() == "base"
+        assert await child.find() == "child"
+        child._private()
+
+        assert series(span_duration, "test", "Child.get")[2] == 1
+        assert series(span_duration, "test", "Child.find")[2] == 1
+        assert series(span_duration, "test", "Child._private") is None
+        assert Base.get.__name__ == "get" and Base().get() == "base"
+
+
+class TestTimingMiddleware:
+    def test_server_timing_and_route_metrics(self):
+        app = FastAPI()
+        app.add_middleware(TimingMiddleware, server_timing=True)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            with span("test", "load_item"):
+                return {"id": item_id}
+
+        with TestClient(app) as client:
+            response = client.get("/items/1")
+            client.get("/missing")
+
+        server_timing = response.headers["server-timing"]
+        assert server_timing.startswith("load_item;dur=")
+        assert ", total;dur=" in server_timing
+        metrics = render_metrics()
+        assert (
+            'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 1'
+            in metrics
+        )
+        assert 'route="unmatched",status="404"' in metrics
+
+    def test_no_server_timing_by_default(self):
+        app = FastAPI()
+        app.add_middleware(TimingMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            with span("test", "load_hidden_item"):
+                return {"id": item_id}
+
+        with TestClient(app) as client:
+            response = client.get("/items/1")
+
+        assert response.status_code == 200
+        assert "server-timing" not in response.headers
+        assert series(span_duration, "test", "load_hidden_item")[2] == 1
+
+
+class TestMetricsEndpoint:
+    def test_requires_token(self, client, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+        assert client.get("/metrics").status_code == 404
+        response = client.get("/metrics", headers={"Authorization": "Bearer x"})
+        assert response.status_code == 404
+
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+        assert client.get("/metrics").status_code == 403
+        response = client.get("/metrics", headers={"Authorization": "Bearer x"})
+        assert response.status_code == 403
+        response = client.get(
+            "/metrics", headers={"Authorization": "Bearer scrape-token"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
@@ -1,8 +1,14 @@
+from collections.abc import Iterable
+from typing import Any
+
 import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
 from sqlmodel import Session as SQLSession
 from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.modules.care_facilities.models import CareFacility  # noqa
+from app.modules.care_facilities.models import CareFacility
 
 
 @pytest.fixture
@@ -22,3 +28,64 @@ async def db_session(db_engine):
         SQLModel.metadata.create_all(db_engine)
         yield session
         SQLModel.metadata.drop_all(db_engine)
+
+
+@pytest.fixture
+async def async_db_engine():
+    """Create a test async database engine, sharing one in-memory connection"""
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def async_db_session(async_db_engine):
+    """Create a test async database session"""
+    async with async_db_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(async_db_engine, expire_on_commit=False) as session:
+        yield session
+    async with async_db_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+
+
+def build_facility(
+    name: str = "Test Facility",
+    zip_code: int = 10000,
+    care_types: Iterable[str] = ("stationary_care",),
+    available_capacity: bool = True,
+    zip_code_radius: int = 50,
+    model: type | None = CareFacility,
+    **fields: Any,
+):
+    """
+    Build a facility offering the care types and serving the zip codes within
+    `zip_code_radius` of its own. `fields` override any other column; `model` is
+    what it's built as, e.g. `CareFacilityCreate`, or a plain dict with None
+    """
+    care_types = set(care_types)
+    values = {
+        "name": name,
+        "address": f"{zip_code} Test St",
+        "has_stationary_care": "stationary_care" in care_types,
+        "has_day_care": "day_care" in care_types,
+        "has_ambulatory_care": "ambulatory_care" in care_types,
+        "from_zip_code": zip_code - zip_code_radius,
+        "to_zip_code": zip_code + zip_code_radius,
+        "zip_code": zip_code,
+        "available_capacity": available_capacity,
+        "slug": name.lower().replace(" ", "-"),
+        **fields,
+    }
+    return values if model is None else model(**values)
+
+
+def build_facilities(count: int, zip_code: int = 10000, **kwargs: Any):
+    """`count` facilities, "Facility 0" onwards, at consecutive zip codes"""
+    return [
+        build_facility(f"Facility {i}", zip_code + i, **kwargs) for i in range(count)
+    ]
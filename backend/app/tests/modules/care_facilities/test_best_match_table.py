@@ -0,0 +1,140 @@
+import random
+
+import pytest
+
+from app.modules.care_facilities.best_match_table import ZIP_CODE_COUNT, BestMatchTable
+from app.modules.care_facilities.search_index import CareFacilitySearchIndex
+from app.tests.fixtures import build_facility
+
+ZIP_CODE_RANGE = 500
+
+
+def build_random_facilities(rng, count, max_zip_code):
+    return [
+        build_facility(
+            f"Facility {i}",
+            rng.randint(10_000, max_zip_code),
+            available_capacity=rng.random() < 0.3,
+            care_types=[
+                care_type
+                for care_type, share in (("stationary_care", 0.7), ("day_care", 0.5))
+                if rng.random() < share
+            ],
+            zip_code_radius=0,
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def random_facilities():
+    return build_random_facilities(random.Random(42), 200, 20_000)
+
+
+@pytest.fixture
+def search_index(random_facilities):
+    index = CareFacilitySearchIndex(best_match_table=BestMatchTable(ZIP_CODE_RANGE))
+    index.load(random_facilities)
+    return index
+
+
+def assert_matches_search(index, zip_codes):
+    for care_type in ("stationary_care", "day_care", "ambulatory_care"):
+        for zip_code in zip_codes:
+            facilities = index.search(care_type, zip_code, ZIP_CODE_RANGE)
+            expected_available = next(
+                (f for f in facilities if f.available_capacity), None
+            )
+            expected_nearest = facilities[0] if facilities else None
+
+            available, nearest = index.best_match(care_type, zip_code)
+
+            assert available == expected_available, (care_type, zip_code)
+            assert nearest == expected_nearest, (care_type, zip_code)
+
+
+class TestBestMatchTable:
+    def test_lookup_matches_search(self, search_index):
+        assert_matches_search(search_index, range(9_000, 21_000, 37))
+
+    def test_lookup_out_of_range(self, search_index):
+        assert search_index.best_match("stationary_care", 0) == (None, None)
+        assert search_index.best_match("ambulatory_care", 15_000) == (None, None)
+
+    def test_upsert_refreshes_affected_zip_codes(self, search_index, random_facilities):
+        moved = random_facilities[0]
+        old_zip_code = moved.zip_code
+        moved.zip_code = 30_000
+        moved.available_capacity = True
+        moved.has_ambulatory_care = True
+
+        search_index.upsert(moved)
+
+        available, nearest = search_index.best_match("ambulatory_care", 30_100)
+        assert available.id == moved.id
+        assert nearest.id == moved.id
+        assert_matches_search(
+            search_index, range(old_zip_code - 600, old_zip_code + 600, 7)
+        )
+
+    def test_capacity_change_refreshes_answers(self, search_index, random_facilities):
+        facility = next(f for f in random_facilities if f.has_stationary_care)
+        facility.available_capacity = not facility.available_capacity
+
+        search_index.upsert(facility)
+
+        assert_matches_search(
+            search_index, range(facility.zip_code - 600, facility.zip_code + 600, 3)
+        )
+
+    def test_remove_refreshes_answers(self, search_index, random_facilities):
+        removed = random_facilities[1]
+
+        search_index.remove(removed.id)
+
+        assert_matches_search(
+            search_index, range(removed.zip_code - 600, removed.zip_code + 600, 3)
+        )
+
+    def test_updates_swap_in_new_answers(self, search_index, random_facilities):
+        facility = next(f for f in random_facilities if f.has_stationary_care)
+        table = search_index.best_match_table
+        before = table.lookup("stationary_care", facility.zip_code)
+        published = table._answers["stationary_care"]
+        facility.available_capacity = not facility.available_capacity
+
+        search_index.upsert(facility)
+
+        # A lookup racing the update reads the arrays published before it,
+        # which are left as they were
+        available, nearest = published
+        assert (available[facility.zip_code], nearest[facility.zip_code]) == before
+        assert table._answers["stationary_care"] is not published
+        search_index.load(random_facilities)
+        assert search_index.best_match_table is not table
+
+    def test_batch_refresh_matches_rebuild(self):
+        rng = random.Random(7)
+        facilities = build_random_facilities(rng, 2_000, 13_000)
+        index = CareFacilitySearchIndex(best_match_table=BestMatchTable(ZIP_CODE_RANGE))
+        index.load(facilities)
+        changed = rng.sample(facilities, 1_000)
+        for facility in changed[:800]:
+            facility.available_capacity = not facility.available_capacity
+        for facility in changed[800:900]:
+            facility.zip_code = rng.randint(9_000, 14_000)
+            facility.has_day_care = not facility.has_day_care
+        removed_ids = {facility.id for facility in changed[900:]}
+
+        index.upsert_many(changed[:900])
+        index.remove_many(removed_ids)
+
+        rebuilt = CareFacilitySearchIndex(
+            best_match_table=BestMatchTable(ZIP_CODE_RANGE)
+        )
+        rebuilt.load([f for f in facilities if f.id not in removed_ids])
+        for care_type in ("stationary_care", "day_care", "ambulatory_care"):
+            for zip_code in range(ZIP_CODE_COUNT):
+                assert index.best_match(care_type, zip_code) == rebuilt.best_match(
+                    care_type, zip_code
+                ), (care_type, zip_code)
@@ -0,0 +1,105 @@
+import pytest
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.modules.care_facilities.capacity import CapacityUpdateCoalescer
+from app.modules.care_facilities.models import CareFacility
+from app.modules.care_facilities.search_index import care_facility_search_index
+from app.tests.fixtures import (  # noqa
+    async_db_engine,
+    async_db_session,
+    build_facilities,
+)
+
+
+@pytest.fixture
+async def facilities(async_db_session):  # noqa: F811
+    facilities = build_facilities(3, available_capacity=False)
+    async_db_session.add_all(facilities)
+    await async_db_session.commit()
+    return facilities
+
+
+@pytest.fixture
+def coalescer(async_db_engine):  # noqa: F811
+    return CapacityUpdateCoalescer(
+        lambda: AsyncSession(async_db_engine, expire_on_commit=False)
+    )
+
+
+async def stored_capacity(async_db_session):  # noqa: F811
+    async_db_session.expire_all()
+    facilities = (await async_db_session.exec(select(CareFacility))).all()
+    return {f.slug: f.available_capacity for f in facilities}
+
+
+class TestCapacityUpdateCoalescer:
+    async def test_coalesces_until_flush(
+        self,
+        coalescer,
+        facilities,
+        async_db_session,  # noqa: F811
+    ):
+        first, second, _ = facilities
+        coalescer.submit([(first.id, True), (second.id, True)])
+        coalescer.submit([(second.id, False), (first.id, True)])
+
+        assert coalescer.pending == 2
+        assert await coalescer.flush() == 2
+        assert coalescer.pending == 0
+        assert await coalescer.flush() == 0
+        assert await stored_capacity(async_db_session) == {
+            "facility-0": True,
+            "facility-1": False,
+            "facility-2": False,
+        }
+
+    async def test_flush_keeps_search_index_in_sync(self, coalescer, facilities):
+        care_facility_search_index.load(facilities)
+        coalescer.submit([(facilities[2].id, True)])
+
+        await coalescer.flush()
+
+        results = care_facility_search_index.search("stationary_care", 10000, 10)
+        assert [r.available_capacity for r in results] == [False, False, True]
+
+    async def test_flush_writes_in_batches(
+        self,
+        facilities,
+        async_db_engine,  # noqa: F811
+        async_db_session,  # noqa: F811
+    ):
+        sessions = []
+
+        def session_factory():
+            sessions.append(AsyncSession(async_db_engine, expire_on_commit=False))
+            return sessions[-1]
+
+        coalescer = CapacityUpdateCoalescer(session_factory, batch_size=2)
+        coalescer.submit((facility.id, True) for facility in facilities)
+
+        assert await coalescer.flush() == 3
+        assert len(sessions) == 2
+        assert set((await stored_capacity(async_db_session)).values()) == {True}
+
+    async def test_failed_flush_is_retried(self, facilities, async_db_engine):  # noqa: F811
+        def broken_session():
+            raise RuntimeError("database unavailable")
+
+        coalescer = CapacityUpdateCoalescer(broken_session)
+        coalescer.submit([(facilities[0].id, True), (facilities[1].id, True)])
+
+        with pytest.raises(RuntimeError):
+            await coalescer.flush()
+        coalescer.submit([(facilities[1].id, False)])
+        coalescer.session_factory = lambda: AsyncSession(
+            async_db_engine, expire_on_commit=False
+        )
+        await coalescer.flush()
+
+        async with AsyncSession(async_db_engine) as session:
+            assert await stored_capacity(session) == {
+                "facility-0": True,
+                "facility-1": False,
+                "facility-2": False,
+            }
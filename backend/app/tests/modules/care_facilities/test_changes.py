@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.modules.care_facilities.changes import FacilityChangePoller
+from app.modules.care_facilities.models import CareFacility
+from app.modules.care_facilities.search_index import care_facility_search_index
+from app.tests.fixtures import (  # noqa
+    async_db_engine,
+    async_db_session,
+    build_facilities,
+)
+
+
+@pytest.fixture
+async def facilities(async_db_session):  # noqa: F811
+    facilities = build_facilities(3, available_capacity=False)
+    async_db_session.add_all(facilities)
+    await async_db_session.commit()
+    care_facility_search_index.load(facilities)
+    return facilities
+
+
+@pytest.fixture
+async def poller(async_db_engine, facilities):  # noqa: F811, ARG001
+    # After the facilities are written, which the first poll picks up
+    poller = FacilityChangePoller(
+        lambda: AsyncSession(async_db_engine, expire_on_commit=False)
+    )
+    await poller.poll()
+    return poller
+
+
+async def write_elsewhere(async_db_engine, statement):  # noqa: F811
+    """A write that bypasses the repositories, as if made by another process"""
+    async with AsyncSession(async_db_engine) as session:
+        await session.exec(statement)
+        await session.commit()
+
+
+class TestFacilityChangePoller:
+    async def test_syncs_writes_of_other_processes(
+        self,
+        poller,
+        facilities,
+        async_db_engine,  # noqa: F811
+    ):
+        await write_elsewhere(
+            async_db_engine,
+            update(CareFacility)
+            .where(CareFacility.id == facilities[2].id)
+            .values(available_capacity=True, updated_at=datetime.now(timezone.utc)),
+        )
+
+        assert await poller.poll() == 1
+        # Polled again within the commit lag, but already synced
+        assert await poller.poll() == 0
+
+        results = care_facility_search_index.search("stationary_care", 10000, 10)
+        assert [r.available_capacity for r in results] == [False, False, True]
+        assert not care_facility_search_index.is_stale()
+
+    async def test_deletes_reload_the_index(
+        self,
+        poller,
+        facilities,
+        async_db_engine,  # noqa: F811
+    ):
+        await write_elsewhere(
+            async_db_engine,
+            delete(CareFacility).where(CareFacility.id == facilities[0].id),
+        )
+
+        await poller.poll()
+
+        assert care_facility_search_index.is_stale()
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from app.modules.care_facilities.geo import GeoGrid, bounding_box, haversine_km
+
+BERLIN = (52.5200, 13.4050)
+MUNICH = (48.1372, 11.5756)
+
+
+class TestGeo:
+    def test_haversine_km(self):
+        assert haversine_km(*BERLIN, *MUNICH) == pytest.approx(504, abs=1)
+        assert haversine_km(*BERLIN, *BERLIN) == 0
+
+    def test_bounding_box_contains_radius(self):
+        min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(
+            *BERLIN, 100
+        )
+
+        assert haversine_km(min_latitude, BERLIN[1], *BERLIN) == pytest.approx(100)
+        assert haversine_km(BERLIN[0], max_longitude, *BERLIN) > 100
+        assert min_longitude < BERLIN[1] < max_longitude < 15.0
+        assert bounding_box(89.9, 0, 100)[2:] == (-180.0, 180.0)
+
+    def test_grid_matches_brute_force(self):
+        rng = random.Random(11)
+        points = [(rng.uniform(47, 55), rng.uniform(6, 15), i) for i in range(2_000)]
+        grid = GeoGrid(points, cell_degrees=0.2)
+
+        for _ in range(50):
+            latitude, longitude = rng.uniform(47, 55), rng.uniform(6, 15)
+            radius_km = rng.choice([5, 25, 80])
+            expected = sorted(
+                (haversine_km(latitude, longitude, lat, lon), i)
+                for lat, lon, i in points
+                if haversine_km(latitude, longitude, lat, lon) <= radius_km
+            )
+            matches = grid.within(latitude, longitude, radius_km)
+            assert [i for _, i in matches] == [i for _, i in expected]
+
+    def test_grid_wraps_around_antimeridian(self):
+        grid = GeoGrid([(0.0, 179.95, "east"), (0.0, -179.95, "west")])
+
+        matches = grid.within(0.0, 179.99, 20)
+
+        assert [value for _, value in matches] == ["east", "west"]
+        assert GeoGrid([]).within(*BERLIN, 50) == []
+
+    def test_grid_add_and_remove(self):
+        grid = GeoGrid([(*BERLIN, "berlin")])
+
+        grid.add(*BERLIN, "also berlin")
+        grid.remove(*BERLIN, "berlin")
+
+        assert [value for _, value in grid.within(*BERLIN, 1)] == ["also berlin"]
+        grid.remove(*BERLIN, "also berlin")
+        assert grid.within(*BERLIN, 1) == []
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from sqlmodel import select
+
+from app.modules.care_facilities.importer import (
+    format_from_filename,
+    import_facilities,
+)
+from app.modules.care_facilities.models import CareFacility
+from app.modules.care_facilities.search_index import care_facility_search_index
+from app.tests.fixtures import (  # noqa
+    build_facilities,
+    build_facility,
+    db_engine,
+    db_session,
+)
+
+CSV_HEADER = (
+    "name,address,has_stationary_care,has_day_care,has_ambulatory_care,"
+    "from_zip_code,to_zip_code,zip_code,available_capacity,slug,image_url"
+)
+
+
+def facilities_by_slug(db_session):  # noqa: F811
+    return {f.slug: f for f in db_session.exec(select(CareFacility)).all()}
+
+
+class TestImportFacilities:
+    def test_import_csv(self, db_session):  # noqa: F811
+        lines = [
+            CSV_HEADER,
+            "Facility A,1 Main St,true,false,1,10000,10100,10050,false,facility-a,",
+            "Facility B,2 Main St,false,true,0,20000,20100,not-a-zip,true,facility-b,",
+            "Facility C,3 Main St,0,0,true,30000,30100,30050,yes,facility-c,https://img",
+        ]
+
+        result = import_facilities(db_session, lines, "csv", chunk_size=2)
+
+        assert result.imported == 2
+        assert result.invalid == 1
+        assert result.errors[0].row == 2
+        assert "zip_code" in result.errors[0].error
+        facilities = facilities_by_slug(db_session)
+        assert set(facilities) == {"facility-a", "facility-c"}
+        assert facilities["facility-a"].has_ambulatory_care is True
+        assert facilities["facility-a"].image_url is None
+        assert facilities["facility-c"].available_capacity is True
+        assert facilities["facility-c"].updated_at is not None
+
+    def test_import_jsonl_upserts_by_slug(self, db_session):  # noqa: F811
+        import_facilities(
+            db_session,
+            [json.dumps(record) for record in build_facilities(5, model=None)],
+            "jsonl",
+        )
+        existing_id = facilities_by_slug(db_session)["facility-1"].id
+
+        lines = [
+            json.dumps(
+                build_facility(
+                    "Renamed",
+                    10001,
+                    available_capacity=False,
+                    model=None,
+                    slug="facility-1",
+                )
+            ),
+            "",
+            "{not json",
+            json.dumps(build_facility("Facility 5", 10005, model=None)),
+        ]
+        result = import_facilities(db_session, lines, "jsonl")
+
+        assert result.imported == 2
+        assert result.invalid == 1
+        assert result.errors[0].row == 2
+        db_session.expire_all()
+        facilities = facilities_by_slug(db_session)
+        assert len(facilities) == 6
+        assert facilities["facility-1"].id == existing_id
+        assert facilities["facility-1"].name == "Renamed"
+        assert facilities["facility-1"].available_capacity is False
+
+    def test_duplicate_slugs_in_a_chunk_keep_the_last(self, db_session):  # noqa: F811
+        lines = [
+            json.dumps(build_facility("First", model=None, slug="facility-1")),
+            json.dumps(build_facility("Second", model=None, slug="facility-1")),
+        ]
+
+        result = import_facilities(db_session, lines, "jsonl")
+
+        assert result.imported == 1
+        assert facilities_by_slug(db_session)["facility-1"].name == "Second"
+
+    def test_import_invalidates_search_index(self, db_session):  # noqa: F811
+        care_facility_search_index.load([])
+
+        import_facilities(db_session, [json.dumps(build_facility(model=None))], "jsonl")
+
+        assert care_facility_search_index.is_stale()
+
+
+def test_format_from_filename():
+    assert format_from_filename("facilities.CSV") == "csv"
+    assert format_from_filename("facilities.jsonl") == "jsonl"
+    with pytest.raises(ValueError):
+        format_from_filename("facilities.xlsx")
@@ -0,0 +1,29 @@
+import random
+
+from app.modules.care_facilities.interval_tree import IntervalTree
+
+
+class TestIntervalTree:
+    def test_stab_matches_brute_force(self):
+        rng = random.Random(7)
+        intervals = []
+        for i in range(300):
+            start = rng.randint(0, 10_000)
+            intervals.append((start, start + rng.randint(0, 2_000), i))
+        tree = IntervalTree(intervals)
+
+        for point in range(-10, 12_100, 13):
+            expected = {i for start, end, i in intervals if start <= point <= end}
+            assert set(tree.stab(point)) == expected
+
+    def test_stab_includes_endpoints(self):
+        tree = IntervalTree([(10, 20, "a"), (20, 30, "b"), (31, 31, "c")])
+
+        assert tree.stab(10) == ["a"]
+        assert sorted(tree.stab(20)) == ["a", "b"]
+        assert tree.stab(31) == ["c"]
+        assert tree.stab(32) == []
+
+    def test_empty_and_inverted_intervals(self):
+        assert IntervalTree([]).stab(5) == []
+        assert IntervalTree([(10, 5, "inverted")]).stab(7) == []
@@ -1,11 +1,58 @@
-import pytest
+import os
 
-from app.modules.care_facilities.models import CareFacility
-from app.modules.care_facilities.repository import CareFacilityRepository
+import pytest
+from sqlalchemy import create_mock_engine
+from sqlmodel import SQLModel, create_engine
+
+from app.modules.care_facilities.models import CareFacility, ZipCodeCentroid
+from app.modules.care_facilities.repository import (
+    BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS,
+    AsyncCareFacilityRepository,
+    CareFacilityRepository,
+    _range_params,
+)
 from app.modules.care_facilities.schemas import (
-    CareFacilitySearchResponse,
+    CareFacilityCreate,
+    CareFacilitySearchRow,
+    CareFacilityUpdate,
+)
+from app.modules.care_facilities.search_index import care_facility_search_index
+from app.tests.fixtures import (  # noqa
+    async_db_engine,
+    async_db_session,
+    build_facility,
+    db_engine,
+    db_session,
 )
-from app.tests.fixtures import db_engine, db_session  # noqa
+
+# Runs the Postgres query plan tests, the database's tables are dropped after
+POSTGRES_TEST_DATABASE_URL = os.environ.get("POSTGRES_TEST_DATABASE_URL")
+
+
+def sample_facility_data():
+    """The care types and zip codes of `sample_facilities`, for the async tests"""
+    return [
+        build_facility("Stationary Care Facility", 10050, model=None),
+        build_facility(
+            "Day Care Facility",
+            10075,
+            care_types=("day_care",),
+            available_capacity=False,
+            model=None,
+        ),
+        build_facility(
+            "Ambulatory Care Facility",
+            20050,
+            care_types=("ambulatory_care",),
+            model=None,
+        ),
+        build_facility(
+            "Multi-Care Facility",
+            10025,
+            care_types=("stationary_care", "day_care", "ambulatory_care"),
+            model=None,
+        ),
+    ]
 
 
 @pytest.fixture
@@ -84,6 +131,20 @@ async def sample_facilities(db_session):  # noqa: F811
     return facilities
 
 
+@pytest.fixture
+async def async_care_facility_repository(async_db_session):  # noqa: F811
+    return AsyncCareFacilityRepository(db=async_db_session)
+
+
+@pytest.fixture
+async def async_sample_facilities(async_db_session):  # noqa: F811
+    """Create sample facilities in the async test database"""
+    facilities = [CareFacility(**data) for data in sample_facility_data()]
+    async_db_session.add_all(facilities)
+    await async_db_session.commit()
+    return facilities
+
+
 class TestCareFacilityRepository:
     async def test_get_by_care_type_and_zip_code_exact_match(
         self, care_facility_repository, sample_facilities
@@ -169,7 +230,7 @@ class TestCareFacilityRepository:
         facility = results[0]
 
         # Check that the response has all expected fields
-        assert isinstance(facility, CareFacilitySearchResponse)
+        assert isinstance(facility, CareFacilitySearchRow)
         assert facility.id is not None
         assert facility.name == "Stationary Care Facility"
         assert facility.address == "123 Main St"
@@ -178,6 +239,87 @@ class TestCareFacilityRepository:
         assert facility.slug == "stationary-care-facility"
         assert facility.distance == 0
 
+    @pytest.mark.parametrize(
+        "care_type", ["stationary_care", "day_care", "ambulatory_care"]
+    )
+    async def test_get_by_care_type_and_zip_code_is_index_only(
+        self, care_facility_repository, care_type
+    ):
+        statement = BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS[care_type].params(
+            **_range_params(10050, 100)
+        )
+        db = care_facility_repository.db
+        sql = statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+
+        plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+
+        details = [row[-1] for row in plan]
+        assert (
+            f"SEARCH carefacility USING COVERING INDEX "
+            f"ix_care_facility_{care_type}_zip_code (zip_code>? AND zip_code<?)"
+        ) in details
+
+    @pytest.mark.parametrize("url", ["postgresql+psycopg://", "sqlite://"])
+    async def test_care_type_indexes_per_dialect(self, url):
+        statements = []
+        engine = create_mock_engine(
+            url,
+            lambda ddl, *_, **__: statements.append(
+                ddl.compile(dialect=engine.dialect)
+            ),
+        )
+
+        CareFacility.__table__.create(engine)
+
+        statements = [
+            str(statement)
+            for statement in statements
+            if "ix_care_facility_day_care_zip_code" in str(statement)
+        ]
+        if url.startswith("postgresql"):
+            # Postgres keys on the zip code alone, other columns are included
+            assert statements == [
+                "CREATE INDEX ix_care_facility_day_care_zip_code ON carefacility "
+                "(zip_code) INCLUDE (available_capacity, id, name, address, slug) "
+                "WHERE has_day_care"
+            ]
+        else:
+            assert statements == [
+                "CREATE INDEX ix_care_facility_day_care_zip_code ON carefacility "
+                "(zip_code, available_capacity, id, name, address, slug, "
+                "has_day_care) WHERE has_day_care = 1"
+            ]
+
+    @pytest.mark.skipif(
+        not POSTGRES_TEST_DATABASE_URL,
+        reason="POSTGRES_TEST_DATABASE_URL, a scratch Postgres database, is not set",
+    )
+    @pytest.mark.parametrize(
+        "care_type", ["stationary_care", "day_care", "ambulatory_care"]
+    )
+    async def test_get_by_care_type_and_zip_code_is_index_only_on_postgres(
+        self, care_type
+    ):
+        engine = create_engine(POSTGRES_TEST_DATABASE_URL)
+        SQLModel.metadata.create_all(engine)
+        statement = BY_CARE_TYPE_AND_ZIP_CODE_STATEMENTS[care_type].params(
+            **_range_params(10050, 100)
+        )
+        sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+        try:
+            with engine.connect() as connection:
+                # An empty table is cheapest to scan, rule that plan out
+                connection.exec_driver_sql("SET enable_seqscan = off")
+                plan = connection.exec_driver_sql(f"EXPLAIN {sql}").scalars().all()
+        finally:
+            SQLModel.metadata.drop_all(engine)
+            engine.dispose()
+
+        assert any(
+            f"Index Only Scan using ix_care_facility_{care_type}_zip_code" in line
+            for line in plan
+        )
+
     async def test_get_stationary_care_by_nearest_zip_code(
         self, care_facility_repository, sample_facilities
     ):
@@ -227,3 +369,110 @@ class TestCareFacilityRepository:
 
         assert len(results) == 1
         assert results[0].name == "Ambulatory Care Facility"
+
+
+class TestAsyncCareFacilityRepository:
+    async def test_get_by_care_type_and_zip_code_range(
+        self, async_care_facility_repository, async_sample_facilities
+    ):
+        results = await async_care_facility_repository.get_by_care_type_and_zip_code(
+            "stationary_care", 10000, 100
+        )
+
+        assert [result.name for result in results] == [
+            "Multi-Care Facility",
+            "Stationary Care Facility",
+        ]
+        assert all(isinstance(r, CareFacilitySearchRow) for r in results)
+
+    async def test_get_by_slug(
+        self, async_care_facility_repository, async_sample_facilities
+    ):
+        facility = await async_care_facility_repository.get_by_slug("day-care-facility")
+
+        assert facility.name == "Day Care Facility"
+        assert await async_care_facility_repository.get_by_slug("missing") is None
+
+    async def test_create_update_delete(self, async_care_facility_repository):
+        created = await async_care_facility_repository.create(
+            CareFacilityCreate(**sample_facility_data()[0])
+        )
+        assert created.id is not None
+
+        updated = await async_care_facility_repository.update(
+            created.id, CareFacilityUpdate(available_capacity=False)
+        )
+        assert updated.available_capacity is False
+        assert updated.name == "Stationary Care Facility"
+
+        await async_care_facility_repository.delete(created.id)
+        with pytest.raises(ValueError):
+            await async_care_facility_repository.get_by_id(created.id)
+
+    async def test_coordinates_default_to_zip_code_centroid(
+        self,
+        async_care_facility_repository,
+        async_db_session,  # noqa: F811
+    ):
+        async_db_session.add_all(
+            [
+                ZipCodeCentroid(zip_code=10050, latitude=52.5, longitude=13.4),
+                ZipCodeCentroid(zip_code=20050, latitude=53.5, longitude=10.0),
+            ]
+        )
+        await async_db_session.commit()
+
+        created = await async_care_facility_repository.create_many(
+            [
+                CareFacilityCreate(**sample_facility_data()[0]),
+                CareFacilityCreate(
+                    **sample_facility_data()[1], latitude=1, longitude=2
+                ),
+            ]
+        )
+        assert (created[0].latitude, created[0].longitude) == (52.5, 13.4)
+        assert (created[1].latitude, created[1].longitude) == (1, 2)
+
+        # Moving resets the coordinates, unless they are moved too
+        moved = await async_care_facility_repository.update(
+            created[1].id, CareFacilityUpdate(zip_code=20050)
+        )
+        assert (moved.latitude, moved.longitude) == (53.5, 10.0)
+        moved = await async_care_facility_repository.update(
+            created[1].id, CareFacilityUpdate(zip_code=10050, latitude=3, longitude=4)
+        )
+        assert (moved.latitude, moved.longitude) == (3, 4)
+        [moved] = await async_care_facility_repository.update_many(
+            {created[0].id: {"zip_code": 99999}}, returning=True
+        )
+        assert (moved.latitude, moved.longitude) == (None, None)
+
+    async def test_bulk_operations_sync_search_index(
+        self, async_care_facility_repository
+    ):
+        care_facility_search_index.load([])
+        created = await async_care_facility_repository.create_many(
+            [CareFacilityCreate(**data) for data in sample_facility_data()]
+        )
+        stationary = [f for f in created if f.has_stationary_care]
+        assert (
+            len(care_facility_search_index.search("stationary_care", 10000, 100)) == 2
+        )
+
+        updated = await async_care_facility_repository.update_many(
+            {facility.id: {"available_capacity": False} for facility in stationary},
+            returning=True,
+        )
+
+        assert {facility.id for facility in updated} == {f.id for f in stationary}
+        assert all(not facility.available_capacity for facility in updated)
+        results = care_facility_search_index.search("stationary_care", 10000, 100)
+        assert not any(result.available_capacity for result in results)
+
+        deleted = await async_care_facility_repository.delete_many(
+            [facility.id for facility in stationary]
+        )
+
+        assert deleted == 2
+        assert care_facility_search_index.search("stationary_care", 10000, 100) == []
+        assert len(await async_care_facility_repository.get_all()) == 2
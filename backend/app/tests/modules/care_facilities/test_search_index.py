@@ -0,0 +1,399 @@
+import asyncio
+
+import pytest
+from fastapi import BackgroundTasks
+
+from app.modules.care_facilities.repository import AsyncCareFacilityRepository
+from app.modules.care_facilities.schemas import (
+    CareFacilitySearchResults,
+    CareFacilityUpdate,
+    search_rows_to_json,
+)
+from app.modules.care_facilities.search_index import (
+    CareFacilitySearchIndex,
+    care_facility_search_index,
+)
+from app.modules.care_facilities.services import CareFacilityService
+from app.tests.fixtures import (  # noqa
+    async_db_engine,
+    async_db_session,
+    build_facility,
+)
+
+
+@pytest.fixture
+def sample_facilities():
+    return [
+        build_facility("North", 10100),
+        build_facility("South", 9900, care_types=("stationary_care", "day_care")),
+        build_facility("Far", 14000, available_capacity=False),
+        build_facility("Day Only", 10000, care_types=("day_care",)),
+    ]
+
+
+@pytest.fixture
+def search_index(sample_facilities):
+    index = CareFacilitySearchIndex()
+    index.load(sample_facilities)
+    return index
+
+
+@pytest.fixture
+async def care_facility_repository(async_db_session):  # noqa: F811
+    return AsyncCareFacilityRepository(db=async_db_session)
+
+
+@pytest.fixture
+def mock_posthog():
+    class MockPosthogAnalytics:
+        def track_event(self, uid, event_name, properties=None):
+            pass
+
+    return MockPosthogAnalytics()
+
+
+class TestCareFacilitySearchIndex:
+    def test_search_orders_nearest_first(self, search_index):
+        results = search_index.search("stationary_care", 10000, 5000)
+
+        assert [r.name for r in results] == ["South", "North", "Far"]
+        assert [r.distance for r in results] == [100, 100, 4000]
+
+    def test_search_respects_range(self, search_index):
+        results = search_index.search("stationary_care", 10000, 100)
+
+        assert {r.name for r in results} == {"South", "North"}
+
+    def test_search_filters_by_care_type(self, search_index):
+        results = search_index.search("day_care", 10000, 500)
+
+        assert [r.name for r in results] == ["Day Only", "South"]
+        assert search_index.search("ambulatory_care", 10000, 500) == []
+
+    def test_rows_serialize_like_the_response_model(self, search_index):
+        rows = search_index.search("stationary_care", 10000, 5000)
+
+        assert (
+            search_rows_to_json(rows)
+            == CareFacilitySearchResults(rows).model_dump_json().encode()
+        )
+
+    def test_upsert_moves_facility(self, search_index, sample_facilities):
+        far = sample_facilities[2]
+        far.zip_code = 10001
+
+        search_index.upsert(far)
+
+        results = search_index.search("stationary_care", 10000, 50)
+        assert [r.name for r in results] == ["Far"]
+        assert len(search_index.search("stationary_care", 14000, 0)) == 0
+
+    def test_upsert_changes_care_types(self, search_index, sample_facilities):
+        south = sample_facilities[1]
+        south.has_day_care = False
+
+        search_index.upsert(south)
+
+        assert [r.name for r in search_index.search("day_care", 10000, 500)] == [
+            "Day Only"
+        ]
+
+    def test_remove(self, search_index, sample_facilities):
+        search_index.remove(sample_facilities[0].id)
+
+        results = search_index.search("stationary_care", 10100, 0)
+        assert results == []
+
+    def test_is_stale(self):
+        index = CareFacilitySearchIndex(ttl_seconds=None)
+        assert index.is_stale()
+
+        index.load([])
+        assert not index.is_stale()
+
+        index.invalidate()
+        assert index.is_stale()
+
+    async def test_matches_repository_results(
+        self,
+        async_db_session,  # noqa: F811
+        care_facility_repository,
+        sample_facilities,
+    ):
+        for facility in sample_facilities:
+            async_db_session.add(facility)
+        await async_db_session.commit()
+        index = CareFacilitySearchIndex()
+        index.load(await care_facility_repository.get_all_for_search_index())
+
+        for zip_code in (9000, 10000, 10050, 12000):
+            expected = await care_facility_repository.get_by_care_type_and_zip_code(
+                "stationary_care", zip_code, 3000
+            )
+            results = index.search("stationary_care", zip_code, 3000)
+            assert {(r.id, r.distance) for r in results} == {
+                (r.id, r.distance) for r in expected
+            }
+            assert [r.distance for r in results] == [r.distance for r in expected]
+
+    def test_search_service_area(self, search_index):
+        # Service areas span the facility zip code +-50
+        results = search_index.search_service_area("stationary_care", 10050)
+
+        assert [r.name for r in results] == ["North"]
+        # Equally distant, the lower zip code comes first
+        results = search_index.search_service_area("day_care", 9950)
+        assert [r.name for r in results] == ["South", "Day Only"]
+
+    def test_search_service_area_after_upsert(self, search_index, sample_facilities):
+        far = sample_facilities[2]
+        far.from_zip_code, far.to_zip_code = 10000, 10100
+
+        search_index.upsert(far)
+
+        results = search_index.search_service_area("stationary_care", 10050)
+        assert [r.name for r in results] == ["North", "Far"]
+
+    def test_capacity_changes_keep_service_area_trees_and_geo_grids(
+        self, search_index, sample_facilities
+    ):
+        for facility in sample_facilities:
+            facility.latitude, facility.longitude = 50.0, 10.0
+        search_index.load(sample_facilities)
+        search_index.search_service_area("stationary_care", 10050)
+        search_index.search_geo("stationary_care", 10000, 50.0, 10.0, 5)
+        trees, grids = dict(search_index._service_areas), dict(search_index._geo_grids)
+        north = sample_facilities[0]
+        north.available_capacity = False
+
+        search_index.upsert(north)
+
+        assert search_index._service_areas == trees
+        assert search_index._geo_grids == grids
+        [result] = search_index.search_service_area("stationary_care", 10050)
+        assert result.available_capacity is False
+
+        # Moving a facility updates the grid in place, and only drops the
+        # trees whose service areas changed
+        north.latitude, north.to_zip_code = 52.0, 10300
+        search_index.upsert(north)
+
+        assert "stationary_care" not in search_index._service_areas
+        assert search_index._geo_grids == grids
+        results = search_index.search_geo("stationary_care", 10000, 50.0, 10.0, 5)
+        assert [r.name for r in results] == ["South", "Far"]
+        results = search_index.search_geo("stationary_care", 10000, 52.0, 10.0, 5)
+        assert [r.name for r in results] == ["North"]
+        assert [
+            r.name for r in search_index.search_service_area("stationary_care", 10250)
+        ] == ["North"]
+
+        search_index.remove(north.id)
+
+        assert search_index.search_geo("stationary_care", 10000, 52.0, 10.0, 5) == []
+
+    async def test_service_area_matches_repository_results(
+        self,
+        async_db_session,  # noqa: F811
+        care_facility_repository,
+        sample_facilities,
+    ):
+        for facility in sample_facilities:
+            async_db_session.add(facility)
+        await async_db_session.commit()
+        index = CareFacilitySearchIndex()
+        index.load(await care_facility_repository.get_all_for_search_index())
+
+        for zip_code in (9800, 9950, 10000, 10150, 14000):
+            for care_type in ("stationary_care", "day_care"):
+                expected = (
+                    await care_facility_repository.get_by_care_type_serving_zip_code(
+                        care_type, zip_code
+                    )
+                )
+                assert index.search_service_area(care_type, zip_code) == expected
+
+    def test_search_top_ranks_available_first(self, search_index, sample_facilities):
+        sample_facilities[1].available_capacity = False
+        search_index.upsert(sample_facilities[1])
+
+        results = search_index.search_top("stationary_care", 10000, 5000, 2)
+
+        assert [r.name for r in results] == ["North", "South"]
+        assert [r.name for r in search_index.search_top("day_care", 9900, 0, 5)] == [
+            "South"
+        ]
+
+    def test_search_service_area_top(self, search_index, sample_facilities):
+        far = sample_facilities[2]
+        far.from_zip_code, far.to_zip_code = 10000, 10100
+        search_index.upsert(far)
+
+        results = search_index.search_service_area_top("stationary_care", 10050, 1)
+
+        assert [r.name for r in results] == ["North"]
+
+    async def test_top_matches_repository_results(
+        self,
+        async_db_session,  # noqa: F811
+        care_facility_repository,
+        sample_facilities,
+    ):
+        sample_facilities.append(
+            build_facility(
+                "Near Full", 10010, available_capacity=False, care_types=("day_care",)
+            )
+        )
+        for facility in sample_facilities:
+            async_db_session.add(facility)
+        await async_db_session.commit()
+        index = CareFacilitySearchIndex()
+        index.load(await care_facility_repository.get_all_for_search_index())
+
+        repository = care_facility_repository
+        for zip_code in (9950, 10000, 10050, 14000):
+            for care_type in ("stationary_care", "day_care"):
+                for k in (1, 2, 5):
+                    assert index.search_top(
+                        care_type, zip_code, 3000, k
+                    ) == await repository.get_top_by_care_type_and_zip_code(
+                        care_type, zip_code, 3000, k
+                    )
+                    assert index.search_service_area_top(
+                        care_type, zip_code, k
+                    ) == await repository.get_top_by_care_type_serving_zip_code(
+                        care_type, zip_code, k
+                    )
+
+    async def test_geo_search_matches_repository_results(
+        self,
+        async_db_session,  # noqa: F811
+        care_facility_repository,
+        sample_facilities,
+    ):
+        # Roughly 11 km per 100 zip codes, northwards
+        for facility in sample_facilities:
+            facility.latitude = 50 + (facility.zip_code - 10000) / 1000
+            facility.longitude = 10.0
+            async_db_session.add(facility)
+        await async_db_session.commit()
+        index = CareFacilitySearchIndex()
+        index.load(await care_facility_repository.get_all_for_search_index())
+
+        repository = care_facility_repository
+        for latitude in (49.8, 50.0, 50.05, 54.0):
+            for radius_km in (5, 15, 500):
+                for care_type in ("stationary_care", "day_care"):
+                    assert index.search_geo(
+                        care_type, 10000, latitude, 10.0, radius_km
+                    ) == await repository.get_by_care_type_within_radius(
+                        care_type, 10000, latitude, 10.0, radius_km
+                    )
+        results = index.search_geo("stationary_care", 10000, 50.0, 10.0, 15)
+        assert [r.name for r in results] == ["South", "North"]
+        assert results[0].distance_km == pytest.approx(11.1, abs=0.1)
+
+    async def test_index_kept_in_sync_by_repository(
+        self,
+        async_db_session,  # noqa: F811
+        care_facility_repository,
+        sample_facilities,
+    ):
+        for facility in sample_facilities:
+            async_db_session.add(facility)
+        await async_db_session.commit()
+        care_facility_search_index.load(
+            await care_facility_repository.get_all_for_search_index()
+        )
+
+        far = sample_facilities[2]
+        await care_facility_repository.update(
+            far.id, CareFacilityUpdate(zip_code=10050)
+        )
+        results = care_facility_search_index.search("stationary_care", 10050, 0)
+        assert [r.name for r in results] == ["Far"]
+
+        await care_facility_repository.delete(far.id)
+        assert care_facility_search_index.search("stationary_care", 10050, 0) == []
+
+        care_facility_search_index.invalidate()
+
+    async def test_find_best_match_uses_index(
+        self, care_facility_repository, search_index, mock_posthog, monkeypatch
+    ):
+        async def fail(*_args, **_kwargs):
+            raise AssertionError("The database should not be queried")
+
+        monkeypatch.setattr(
+            care_facility_repository, "get_by_care_type_and_zip_code", fail
+        )
+        service = CareFacilityService(
+            repository=care_facility_repository,
+            contact_request_repository=None,
+            posthog=mock_posthog,
+            search_index=search_index,
+        )
+
+        result = await service.find_best_match(
+            10050, "stationary_care", BackgroundTasks()
+        )
+
+        assert result.name == "North"
+
+    async def test_concurrent_searches_load_the_index_once(
+        self, care_facility_repository, sample_facilities, mock_posthog
+    ):
+        loads = []
+
+        async def get_all_for_search_index():
+            loads.append(None)
+            await asyncio.sleep(0.01)
+            return sample_facilities
+
+        care_facility_repository.get_all_for_search_index = get_all_for_search_index
+        service = CareFacilityService(
+            repository=care_facility_repository,
+            contact_request_repository=None,
+            posthog=mock_posthog,
+            search_index=CareFacilitySearchIndex(),
+        )
+
+        results = await asyncio.gather(
+            *(
+                service.find_best_match(10050, "stationary_care", BackgroundTasks())
+                for _ in range(10)
+            )
+        )
+
+        assert len(loads) == 1
+        assert {result.name for result in results} == {"North"}
+
+    async def test_writes_during_a_load_are_replayed(
+        self, care_facility_repository, sample_facilities, mock_posthog
+    ):
+        index = CareFacilitySearchIndex()
+        north, south = sample_facilities[:2]
+        moved = build_facility("Moved", 10050)
+
+        async def get_all_for_search_index():
+            # Read before these writes commit
+            snapshot = list(sample_facilities)
+            index.upsert(moved)
+            index.remove(north.id)
+            return snapshot
+
+        care_facility_repository.get_all_for_search_index = get_all_for_search_index
+        service = CareFacilityService(
+            repository=care_facility_repository,
+            contact_request_repository=None,
+            posthog=mock_posthog,
+            search_index=index,
+        )
+
+        result = await service.find_best_match(
+            10050, "stationary_care", BackgroundTasks()
+        )
+
+        assert result.name == "Moved"
+        results = index.search("stationary_care", 10000, 200)
+        assert [r.name for r in results] == ["Moved", "South"]
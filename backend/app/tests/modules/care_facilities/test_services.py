@@ -2,22 +2,51 @@ from uuid import uuid4
 
 import pytest
 from fastapi import BackgroundTasks
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.modules.care_facilities.repository import CareFacilityRepository
-from app.modules.care_facilities.schemas import CareFacilitySearchResponse
+from app.modules.care_facilities.repository import AsyncCareFacilityRepository
+from app.modules.care_facilities.schemas import (
+    CareFacilitySearchResponse,
+    CareFacilityUpdate,
+)
 from app.modules.care_facilities.services import CareFacilityService
-from app.tests.fixtures import db_engine, db_session  # noqa
+from app.tests.fixtures import (  # noqa
+    async_db_engine,
+    async_db_session,
+    build_facility,
+)
 
 
 @pytest.fixture
-async def care_facility_repository(db_session):  # noqa: F811
-    return CareFacilityRepository(db=db_session)
+async def care_facility_repository(async_db_session):  # noqa: F811
+    return AsyncCareFacilityRepository(db=async_db_session)
 
 
 @pytest.fixture
-async def care_facility_service(care_facility_repository):
-    return CareFacilityService(repository=care_facility_repository)
+def mock_posthog():
+    """Create a mock analytics client that records tracked events"""
+
+    class MockPosthogAnalytics:
+        def __init__(self):
+            self.events = []
+
+        def track_event(self, uid, event_name, properties=None, aggregate=False):
+            self.events.append((uid, event_name, properties))
+
+    return MockPosthogAnalytics()
+
+
+@pytest.fixture
+async def care_facility_service(care_facility_repository, mock_posthog):
+    return CareFacilityService(
+        repository=care_facility_repository,
+        contact_request_repository=None,
+        posthog=mock_posthog,
+    )
 
 
 @pytest.fixture
@@ -284,6 +313,261 @@ class TestCareFacilityService:
             zip_code, care_type, facility_id, facility_name
         )
 
+    async def test_get_by_slug_uses_cache(
+        self,
+        care_facility_repository,
+        mock_posthog,
+        async_db_session,  # noqa: F811
+    ):
+        # Arrange
+        async_db_session.add(build_facility("Cached Facility", 10050))
+        await async_db_session.commit()
+        cache = TTLCache("test_service_slug_cache", max_size=10, ttl_seconds=60)
+        service = CareFacilityService(
+            repository=care_facility_repository,
+            contact_request_repository=None,
+            posthog=mock_posthog,
+            slug_cache=cache,
+        )
+
+        # Act
+        first = await service.get_by_slug("cached-facility")
+        second = await service.get_by_slug("cached-facility")
+
+        # Assert
+        assert first.name == "Cached Facility"
+        assert second is first
+        assert cache.stats()["hits"] == 1
+        assert await service.get_by_slug("missing") is None
+
+    async def test_get_by_slug_cache_invalidated_on_update(
+        self,
+        care_facility_repository,
+        mock_posthog,
+        async_db_session,  # noqa: F811
+    ):
+        # Arrange
+        from app.modules.care_facilities.cache import care_facility_slug_cache
+
+        facility = build_facility(
+            "Old Name", 10050, care_types=("day_care",), slug="invalidated-facility"
+        )
+        async_db_session.add(facility)
+        await async_db_session.commit()
+        service = CareFacilityService(
+            repository=care_facility_repository,
+            contact_request_repository=None,
+            posthog=mock_posthog,
+            slug_cache=care_facility_slug_cache,
+        )
+        await service.get_by_slug("invalidated-facility")
+
+        # Act
+        await care_facility_repository.update(
+            facility.id, CareFacilityUpdate(name="New Name", slug="renamed-facility")
+        )
+
+        # Assert
+        assert care_facility_slug_cache.get("invalidated-facility") is None
+        assert (await service.get_by_slug("renamed-facility")).name == "New Name"
+        assert await service.get_by_slug("invalidated-facility") is None
+
+    async def test_find_best_match_payload_uses_cache(
+        self,
+        care_facility_repository,
+        mock_posthog,
+        async_db_session,  # noqa: F811
+    ):
+        # Arrange
+        from app.modules.care_facilities.cache import care_facility_search_cache
+
+        facility = build_facility("Cached Match", 10050, care_types=("day_care",))
+        async_db_session.add(facility)
+        await async_db_session.commit()
+        care_facility_search_cache.clear()
+        service = CareFacilityService(
+            repository=care_facility_repository,
+            contact_request_repository=None,
+            posthog=mock_posthog,
+            search_cache=care_facility_search_cache,
+        )
+        background_tasks = BackgroundTasks()
+
+        # Act
+        first = await service.find_best_match_payload(
+            10060, "day_care", background_tasks
+        )
+        second = await service.find_best_match_payload(
+            10060, "day_care", background_tasks
+        )
+        await care_facility_repository.update(
+            facility.id, CareFacilityUpdate(name="Renamed")
+        )
+        third = await service.find_best_match_payload(
+            10060, "day_care", background_tasks
+        )
+
+        # Assert
+        expected = await service.find_best_match(10060, "day_care", BackgroundTasks())
+        assert second is first
+        assert b'"Cached Match"' in first.body
+        assert third.body == expected.model_dump_json().encode()
+        assert care_facility_search_cache.stats()["hits"] == 1
+        # Cache hits are tracked like any other search
+        assert len(background_tasks.tasks) == 3
+
+    async def test_capacity_updates_evict_only_affected_searches(
+        self,
+        care_facility_repository,
+        mock_posthog,
+        async_db_session,  # noqa: F811
+    ):
+        # Arrange
+        from app.modules.care_facilities.cache import care_facility_search_cache
+
+        near, far = (
+            build_facility(
+                name,
+                zip_code,
+                care_types=("day_care",),
+                available_capacity=available_capacity,
+            )
+            for name, zip_code, available_capacity in (
+                ("Near", 10050, True),
+                ("Far", 50050, False),
+            )
+        )
+        async_db_session.add_all([near, far])
+        await async_db_session.commit()
+        care_facility_search_cache.clear()
+        service = CareFacilityService(
+            repository=care_facility_repository,
+            contact_request_repository=None,
+            posthog=mock_posthog,
+            search_cache=care_facility_search_cache,
+        )
+        for zip_code in (10060, 50060, 90000):
+            await service.find_best_match_payload(
+                zip_code, "day_care", BackgroundTasks(), "distance"
+            )
+
+        def cached_zip_codes():
+            return sorted(key[1] for key in care_facility_search_cache._entries)
+
+        # Act: "Far" may now be the match of zip codes near it
+        await care_facility_repository.update_many(
+            {far.id: {"available_capacity": True}}
+        )
+
+        # Assert
+        assert cached_zip_codes() == [10060, 90000]
+
+        # Act: "Near" was the match of 10060
+        await care_facility_repository.update_many(
+            {near.id: {"available_capacity": False}}
+        )
+
+        # Assert
+        assert cached_zip_codes() == [90000]
+
+        # Act: a move affects the searches it was the nearest facility of, and
+        # those near its new location
+        for zip_code in (10060, 50060):
+            await service.find_best_match_payload(
+                zip_code, "day_care", BackgroundTasks(), "distance"
+            )
+        await care_facility_repository.update(
+            near.id,
+            CareFacilityUpdate(zip_code=90050, from_zip_code=90000, to_zip_code=90100),
+        )
+
+        # Assert
+        assert cached_zip_codes() == [50060]
+
+    async def test_replica_service_fills_caches_from_primary(
+        self,
+        care_facility_repository,
+        mock_posthog,
+        async_db_session,  # noqa: F811
+    ):
+        # Arrange: the facility is on the primary, not yet on the lagging replica
+        async_db_session.add(
+            build_facility("New Facility", 10050, care_types=("day_care",))
+        )
+        await async_db_session.commit()
+        replica_engine = create_async_engine("sqlite+aiosqlite://")
+        async with replica_engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        slug_cache = TTLCache("test_replica_slug_cache", max_size=10, ttl_seconds=60)
+        search_cache = TTLCache(
+            "test_replica_search_cache", max_size=10, ttl_seconds=60
+        )
+
+        async with AsyncSession(replica_engine) as replica_session:
+            service = CareFacilityService(
+                repository=AsyncCareFacilityRepository(db=replica_session),
+                contact_request_repository=None,
+                posthog=mock_posthog,
+                slug_cache=slug_cache,
+                search_cache=search_cache,
+                primary_repository=care_facility_repository,
+            )
+
+            # Act
+            facility = await service.get_by_slug("new-facility")
+            match = await service.find_best_match_payload(
+                10050, "day_care", BackgroundTasks()
+            )
+        await replica_engine.dispose()
+
+        # Assert
+        assert facility.name == "New Facility"
+        assert slug_cache.get("new-facility").response is facility
+        # Searches of the replica are served, but never cached
+        assert match is None
+        assert search_cache.stats()["size"] == 0
+
+    async def test_list_facilities_pages(
+        self,
+        care_facility_service,
+        async_db_session,  # noqa: F811
+    ):
+        # Arrange
+        for i in range(5):
+            async_db_session.add(
+                build_facility(
+                    f"Listed Facility {i}",
+                    10000 + i,
+                    care_types=("day_care",) if i else (),
+                )
+            )
+        await async_db_session.commit()
+
+        # Act
+        first = await care_facility_service.list_facilities("day_care", limit=3)
+        last = await care_facility_service.list_facilities(
+            "day_care", cursor=first.next_cursor, limit=3
+        )
+        streamed = [
+            f.zip_code
+            async for f in care_facility_service.stream_facilities(
+                "day_care", max_zip_code=10003
+            )
+        ]
+
+        # Assert
+        assert len(first.items) == 3
+        assert first.next_cursor == first.items[-1].id
+        assert len(last.items) == 1
+        assert last.next_cursor is None
+        assert {f.zip_code for f in first.items + last.items} == {
+            10001,
+            10002,
+            10003,
+            10004,
+        }
+        assert sorted(streamed) == [10001, 10002, 10003]
+
 
 def async_mock(return_value=None):
     """Helper function to create an async mock"""
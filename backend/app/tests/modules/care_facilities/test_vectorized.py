@@ -0,0 +1,109 @@
+import random
+from uuid import UUID
+
+import pytest
+
+from app.modules.care_facilities.search_index import CareFacilitySearchIndex
+from app.tests.fixtures import build_facility
+
+pytest.importorskip("numpy")
+
+CARE_TYPES = ("stationary_care", "day_care", "ambulatory_care")
+
+
+def random_facilities(count, seed=3):
+    rng = random.Random(seed)
+    facilities = []
+    for i in range(count):
+        zip_code = rng.randint(0, 99_999)
+        care_types = rng.sample(CARE_TYPES, rng.randint(1, 3))
+        facilities.append(
+            build_facility(
+                f"Facility {i}",
+                # Few distinct zip codes, so ties are common
+                zip_code - zip_code % 50,
+                care_types=care_types,
+                available_capacity=rng.random() < 0.2,
+                id=UUID(int=rng.getrandbits(128)),
+                from_zip_code=max(0, zip_code - rng.randint(0, 3_000)),
+                to_zip_code=min(99_999, zip_code + rng.randint(0, 3_000)),
+            )
+        )
+    return facilities
+
+
+@pytest.fixture
+def indexes():
+    facilities = random_facilities(2_000)
+    index = CareFacilitySearchIndex()
+    vectorized = CareFacilitySearchIndex(vectorized=True)
+    index.load(facilities)
+    vectorized.load(facilities)
+    return index, vectorized, facilities
+
+
+def best_match(results):
+    available = next((r for r in results if r.available_capacity), None)
+    return available, results[0] if results else None
+
+
+def ranking(best_match):
+    """Distances and zip codes only, facilities in the same zip code are tied"""
+    return tuple((r.distance, r.zip_code) if r else None for r in best_match)
+
+
+class TestVectorizedScorer:
+    def test_matches_search_index(self, indexes):
+        index, vectorized, _ = indexes
+        rng = random.Random(5)
+
+        for _ in range(200):
+            zip_code = rng.randint(0, 99_999)
+            care_type = rng.choice(CARE_TYPES)
+            k = rng.choice([1, 3, 10])
+            assert ranking(
+                vectorized.best_match_vectorized(care_type, zip_code, 3000)
+            ) == ranking(best_match(index.search(care_type, zip_code, 3000)))
+            assert ranking(
+                vectorized.best_match_vectorized(care_type, zip_code, None)
+            ) == ranking(best_match(index.search_service_area(care_type, zip_code)))
+            assert vectorized.top_vectorized(
+                care_type, zip_code, k, 3000
+            ) == index.search_top(care_type, zip_code, 3000, k)
+            assert vectorized.top_vectorized(
+                care_type, zip_code, k, None
+            ) == index.search_service_area_top(care_type, zip_code, k)
+
+    def test_capacity_changes_applied_in_place(self, indexes):
+        index, vectorized, facilities = indexes
+        vectorized.best_match_vectorized("day_care", 50_000, 3000)
+        scorer = vectorized._scorer
+
+        for facility in facilities[:500]:
+            facility.available_capacity = not facility.available_capacity
+        index.upsert_many(facilities[:500])
+        vectorized.upsert_many(facilities[:500])
+
+        assert vectorized._scorer is scorer
+        for zip_code in range(0, 100_000, 997):
+            assert vectorized.top_vectorized(
+                "day_care", zip_code, 5, 3000
+            ) == index.search_top("day_care", zip_code, 3000, 5)
+
+    def test_other_changes_rebuild_the_scorer(self, indexes):
+        index, vectorized, facilities = indexes
+        vectorized.best_match_vectorized("day_care", 50_000, 3000)
+
+        moved = facilities[0]
+        moved.zip_code = 50_001
+        moved.has_day_care = moved.available_capacity = True
+        vectorized.upsert(moved)
+
+        assert vectorized._scorer is None
+        available, _ = vectorized.best_match_vectorized("day_care", 50_001, 0)
+        assert available.id == moved.id
+        vectorized.remove(moved.id)
+        index.remove(moved.id)
+        assert ranking(
+            vectorized.best_match_vectorized("day_care", 50_001, 0)
+        ) == ranking(best_match(index.search("day_care", 50_001, 0)))
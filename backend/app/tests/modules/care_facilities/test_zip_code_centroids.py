@@ -0,0 +1,64 @@
+import io
+
+from sqlmodel import select
+
+from app.modules.care_facilities.models import CareFacility, ZipCodeCentroid
+from app.modules.care_facilities.zip_code_centroids import (
+    load_zip_code_centroids,
+    read_centroids,
+)
+from app.tests.fixtures import build_facility, db_engine, db_session  # noqa
+
+GEONAMES_DUMP = (
+    "DE\t01067\tDresden\tSachsen\tSN\t\t00\tKreisfreie Stadt Dresden\t14612\t51.06\t13.72\t4\n"
+    "DE\t01067\tDresden Mitte\tSachsen\tSN\t\t00\tKreisfreie Stadt Dresden\t14612\t51.04\t13.74\t4\n"
+    "DE\t10115\tBerlin\tBerlin\tBE\t\t00\tBerlin, Stadt\t11000\t52.53\t13.38\t4\n"
+    "GB\tEC1A\tLondon\tEngland\tENG\t\t\t\t\t51.52\t-0.10\t4\n"
+)
+
+
+class TestZipCodeCentroids:
+    def test_read_csv(self):
+        lines = io.StringIO("zip_code,latitude,longitude\n10115,52.53,13.38\n")
+
+        centroids = list(read_centroids(lines, "csv"))
+
+        assert [c.model_dump() for c in centroids] == [
+            {"zip_code": 10115, "latitude": 52.53, "longitude": 13.38}
+        ]
+
+    def test_read_geonames_averages_places(self):
+        centroids = {
+            c.zip_code: (round(c.latitude, 6), round(c.longitude, 6))
+            for c in read_centroids(io.StringIO(GEONAMES_DUMP), "geonames")
+        }
+
+        # Non-numeric postal codes are skipped
+        assert centroids == {1067: (51.05, 13.73), 10115: (52.53, 13.38)}
+
+    def test_load_backfills_facility_coordinates(self, db_session):  # noqa: F811
+        with_coordinates = build_facility(
+            "Located", 10115, care_types=("day_care",), latitude=1.0, longitude=2.0
+        )
+        without_coordinates = build_facility(
+            "Unlocated", 10115, care_types=("day_care",)
+        )
+        db_session.add_all([with_coordinates, without_coordinates])
+        db_session.commit()
+
+        loaded = load_zip_code_centroids(
+            db_session, read_centroids(io.StringIO(GEONAMES_DUMP), "geonames")
+        )
+        # Loading again replaces the centroids
+        load_zip_code_centroids(
+            db_session, [ZipCodeCentroid(zip_code=1067, latitude=0, longitude=0)]
+        )
+
+        assert loaded == 2
+        db_session.expire_all()
+        facilities = {
+            f.slug: (f.latitude, f.longitude)
+            for f in db_session.exec(select(CareFacility)).all()
+        }
+        assert facilities == {"located": (1.0, 2.0), "unlocated": (52.53, 13.38)}
+        assert db_session.get(ZipCodeCentroid, 1067).latitude == 0